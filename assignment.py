@@ -0,0 +1,198 @@
+import heapq
+import math
+
+import numpy as np
+
+from common_types import Coordinates
+from spatial_index import PieceIndex
+
+DEFAULT_MAX_EXACT_SIZE = 200
+"""The default amount of pieces up to which assignments are solved exactly."""
+
+_GREEDY_CANDIDATES = 32
+# Up to this amount of (source, target) pairs, the cheapest targets of each
+# source are found by computing all the costs. Beyond it, a spatial index is used,
+# unless the targets have more than _MAX_SPATIAL_COST_GROUPS distinct extra costs.
+_DENSE_ELEMENTS = 1 << 22
+_MAX_SPATIAL_COST_GROUPS = 16
+
+
+def solve_assignment(costs):
+    """Solves the minimum total cost assignment problem, with the Hungarian algorithm.
+
+    costs is an (n, m) array. Returns a list of (row, column) pairs, which
+    assigns each row (if n <= m) or each column (otherwise) exactly once.
+    """
+    n, m = costs.shape
+    if n > m:
+        return [(row, column) for column, row in solve_assignment(costs.T)]
+    if n == 0:
+        return []
+    costs = costs.astype(np.float64)
+    # The shortest augmenting path variant, with 1-based potentials and with
+    # column 0 as a virtual column. column_row[j] is the row assigned to column j.
+    row_potentials = np.zeros(n + 1)
+    column_potentials = np.zeros(m + 1)
+    column_row = np.zeros(m + 1, dtype=np.int64)
+    previous_column = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        column_row[0] = row
+        column = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = column_row[column]
+            slack = costs[current_row - 1] - row_potentials[current_row] - column_potentials[1:]
+            free = ~used[1:]
+            improved = free & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            previous_column[1:][improved] = column
+            free_slack = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(free_slack)) + 1
+            delta = free_slack[next_column - 1]
+            row_potentials[column_row[used]] += delta
+            column_potentials[used] -= delta
+            min_slack[~used] -= delta
+            column = next_column
+            if column_row[column] == 0:
+                break
+        while column != 0:
+            previous = previous_column[column]
+            column_row[column] = column_row[previous]
+            column = previous
+    return sorted((int(column_row[column]) - 1, column - 1) for column in range(1, m + 1) if column_row[column])
+
+
+def assign_targets(sources, targets, target_costs=None, max_exact_size=DEFAULT_MAX_EXACT_SIZE):
+    """Assigns each source to a distinct target, minimizing the total cost.
+
+    sources and targets are sequences of Coordinates. The cost of assigning a
+    source to a target is their L1 distance, plus target_costs[target] if
+    target_costs (a sequence of numbers, one per target) is given.
+
+    Only the len(sources) cheapest targets of each source are considered, which
+    does not change the optimal total cost. The problem is solved exactly if
+    there are at most max_exact_size sources, and greedily (cheapest pair first)
+    otherwise. On large problems the cheapest targets are found with a spatial
+    index, so the full cost matrix is never computed.
+
+    Returns a list of (source index, target index) pairs.
+    """
+    if len(sources) == 0 or len(targets) == 0:
+        return []
+    source_positions = np.array([(source.x, source.y) for source in sources], dtype=np.int64)
+    target_positions = np.array([(target.x, target.y) for target in targets], dtype=np.int64)
+    extra_costs = np.zeros(len(targets)) if target_costs is None else np.asarray(target_costs, dtype=np.float64)
+    if len(sources) > max_exact_size:
+        return _greedy_assign_targets(source_positions, target_positions, extra_costs)
+
+    # A source is never assigned to a target outside its n cheapest ones, since at
+    # most n - 1 of them are taken by the other sources.
+    candidates = np.unique(_cheapest_targets(source_positions, target_positions, extra_costs, len(sources)))
+    costs = _costs(source_positions, target_positions[candidates], extra_costs[candidates])
+    return [(source, int(candidates[target])) for source, target in solve_assignment(costs)]
+
+
+def _greedy_assign_targets(source_positions, target_positions, extra_costs):
+    """Assigns sources to targets greedily, cheapest pair first.
+
+    Each source starts with its _GREEDY_CANDIDATES cheapest targets, and finds
+    twice as many whenever all of its candidates are taken by other sources.
+    """
+    candidates = _cheapest_targets(source_positions, target_positions, extra_costs, _GREEDY_CANDIDATES)
+    # The candidates of each source, sorted by cost, and the index of the next one.
+    candidate_lists = [_sorted_by_cost(source_positions[source], target_positions, extra_costs, source_candidates)
+                       for source, source_candidates in enumerate(candidates)]
+    next_candidates = [0] * len(source_positions)
+    heap = [(candidate_list[0][0], source) for source, candidate_list in enumerate(candidate_lists)]
+    heapq.heapify(heap)
+    used_targets = np.zeros(len(target_positions), dtype=bool)
+    result = []
+    while heap and len(result) < len(target_positions):
+        _, source = heapq.heappop(heap)
+        candidate_list = candidate_lists[source]
+        target = candidate_list[next_candidates[source]][1]
+        if not used_targets[target]:
+            used_targets[target] = True
+            result.append((source, target))
+            continue
+        next_candidates[source] += 1
+        candidate_count = len(candidate_list)
+        while next_candidates[source] == len(candidate_list):
+            # There is a free target, since fewer sources than targets were assigned.
+            candidate_count *= 2
+            source_candidates = _cheapest_targets(source_positions[source:source + 1], target_positions,
+                                                  extra_costs, candidate_count)[0]
+            source_candidates = source_candidates[~used_targets[source_candidates]]
+            candidate_list = candidate_lists[source] = _sorted_by_cost(source_positions[source], target_positions,
+                                                                       extra_costs, source_candidates)
+            next_candidates[source] = 0
+        heapq.heappush(heap, (candidate_list[next_candidates[source]][0], source))
+    return sorted(result)
+
+
+def _sorted_by_cost(source_position, target_positions, extra_costs, targets):
+    """Returns a list of the (cost, target) of the given targets, sorted by cost."""
+    costs = np.abs(target_positions[targets] - source_position).sum(axis=1) + extra_costs[targets]
+    return sorted(zip(costs.tolist(), targets.tolist()))
+
+
+def _cheapest_targets(source_positions, target_positions, extra_costs, k):
+    """Returns an (n, min(k, m)) array of the indices of the k cheapest targets of each source."""
+    if (len(source_positions) * len(target_positions) <= _DENSE_ELEMENTS or
+            len(np.unique(extra_costs)) > _MAX_SPATIAL_COST_GROUPS):
+        return _cheapest_targets_dense(source_positions, target_positions, extra_costs, k)
+    return _cheapest_targets_spatial(source_positions, target_positions, extra_costs, k)
+
+
+def _cheapest_targets_dense(source_positions, target_positions, extra_costs, k):
+    """Finds the cheapest targets by computing all the costs, a chunk of sources at a time."""
+    target_count = len(target_positions)
+    k = min(k, target_count)
+    chunk_size = max(1, _DENSE_ELEMENTS // target_count)
+    result = []
+    for start in range(0, len(source_positions), chunk_size):
+        costs = _costs(source_positions[start:start + chunk_size], target_positions, extra_costs)
+        if k < target_count:
+            result.append(np.argpartition(costs, k - 1, axis=1)[:, :k].copy())
+        else:
+            result.append(np.broadcast_to(np.arange(target_count), costs.shape))
+    return np.concatenate(result)
+
+
+def _cheapest_targets_spatial(source_positions, target_positions, extra_costs, k):
+    """Finds the cheapest targets with a spatial index of the targets of each extra cost."""
+    k = min(k, len(target_positions))
+    target_xs = target_positions[:, 0].tolist()
+    target_ys = target_positions[:, 1].tolist()
+    extra_cost_list = extra_costs.tolist()
+    area = ((target_positions[:, 0].max() - target_positions[:, 0].min() + 1) *
+            (target_positions[:, 1].max() - target_positions[:, 1].min() + 1))
+    groups = []
+    for extra_cost in np.unique(extra_costs).tolist():
+        indices = np.flatnonzero(extra_costs == extra_cost).tolist()
+        # Cells of about k / 4 targets each, so a query visits few cells and entries.
+        cell_size = max(1, int(round(math.sqrt(k / 4 * area / len(indices)))))
+        groups.append((extra_cost, PieceIndex(((index, target_xs[index], target_ys[index], None, None)
+                                               for index in indices), cell_size)))
+    result = []
+    for x, y in source_positions.tolist():
+        center = Coordinates(x, y)
+        candidates = []
+        for extra_cost, index in groups:
+            # Groups are sorted by extra cost, and every target of this group costs
+            # at least its extra cost.
+            if len(candidates) >= k and candidates[k - 1][0] <= extra_cost:
+                break
+            candidates.extend((abs(target_xs[target] - x) + abs(target_ys[target] - y) + extra_cost_list[target],
+                               target)
+                              for target in index.nearest(center, k))
+            candidates.sort()
+        result.append([target for _, target in candidates[:k]])
+    return np.array(result, dtype=np.int64).reshape(len(result), k)
+
+
+def _costs(source_positions, target_positions, extra_costs):
+    return (np.abs(source_positions[:, None, 0] - target_positions[None, :, 0]) +
+            np.abs(source_positions[:, None, 1] - target_positions[None, :, 1]) + extra_costs[None, :])
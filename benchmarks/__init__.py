@@ -0,0 +1,6 @@
+"""Benchmarks of the tactical and strategic APIs.
+
+`python -m benchmarks` runs the main hot paths on synthetic games of several
+scales. Each focused benchmark is a module runnable from the repository root,
+e.g. `python -m benchmarks.bench_logger`.
+"""
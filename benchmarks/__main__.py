@@ -0,0 +1,122 @@
+"""Runs the hot paths of the tactical and strategic APIs on synthetic games of several scales.
+
+Reports the best time of each hot path over a few repetitions, and its peak
+memory (measured in a separate run, since tracing slows allocations down). The
+TurnContext of each run is constructed beforehand, so only its first use (e.g.
+building its board) counts towards the hot path.
+Usage: `python -m benchmarks [--scales small medium ...]`.
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_turn_data
+import simple_strategic
+import simple_tactical
+from strategy_state import StrategyState
+from tactical_api import PIECE_TYPES, Logger, TurnContext
+
+SCALES = {
+    'small': (50, 50),
+    'medium': (200, 200),
+    'large': (500, 500),
+    'extreme': (1000, 1000),
+}
+"""Maps the name of each scale to its board (width, height)."""
+
+_SIGHTINGS_SAMPLE_SIZE = 100
+
+
+def _new_context(turn_data):
+    return TurnContext(turn_data, Logger(None))
+
+
+def _no_setup(turn_data):
+    return turn_data
+
+
+def _tiles_of_country(context):
+    for country in context.all_countries:
+        context.get_tiles_of_country(country)
+
+
+def _sightings(context):
+    piece_ids = sorted(context.my_pieces)[:_SIGHTINGS_SAMPLE_SIZE]
+    for piece_id in piece_ids:
+        context.get_sighings_of_piece(piece_id)
+
+
+def _sorted_tiles_for_attack(context):
+    simple_strategic.get_sorted_tiles_for_attack(simple_tactical.get_strategic_implementation(context))
+
+
+def _do_turn(context):
+    # Without a turn budget, so every phase runs on every machine.
+    simple_strategic.do_turn(simple_tactical.get_strategic_implementation(context, StrategyState(turn_budget=None)))
+    context.get_result()
+
+
+def _measure(setup, function, turn_data, repeat):
+    """Returns the best time of function over repeat runs, and its peak memory in a separate run.
+
+    function is called with the result of setup(turn_data), which is not measured.
+    """
+    best_time = None
+    for _ in range(repeat):
+        argument = setup(turn_data)
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    argument = setup(turn_data)
+    tracemalloc.start()
+    function(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best_time, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', nargs='+', choices=SCALES, default=['small', 'medium', 'large'])
+    parser.add_argument('--countries', type=int, default=3)
+    parser.add_argument('--piece-density', type=float, default=0.05,
+                        help='The amount of pieces per tile.')
+    parser.add_argument('--piece-mix', nargs='+', default=[], metavar='TYPE=WEIGHT',
+                        help='Relative weights of piece types (default: an even mix).')
+    parser.add_argument('--money-fraction', type=float, default=0.5,
+                        help='The fraction of tiles with a known amount of money.')
+    parser.add_argument('--max-money', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    piece_mix = None
+    if args.piece_mix:
+        piece_mix = {}
+        for item in args.piece_mix:
+            piece_type, weight = item.split('=')
+            if piece_type not in PIECE_TYPES:
+                parser.error('unknown piece type: %s' % piece_type)
+            piece_mix[piece_type] = float(weight)
+
+    for scale in args.scales:
+        width, height = SCALES[scale]
+        pieces = int(width * height * args.piece_density)
+        turn_data = make_turn_data(width, height, args.countries, pieces, args.seed, piece_mix,
+                                   money_fraction=args.money_fraction, max_money=args.max_money)
+        print('%s: %dx%d board, %d countries, %d pieces' % (scale, width, height, args.countries, pieces))
+        hot_paths = (
+            ('TurnContext()', _no_setup, _new_context),
+            ('get_tiles_of_country', _new_context, _tiles_of_country),
+            ('get_sighings_of_piece x%d' % _SIGHTINGS_SAMPLE_SIZE, _new_context, _sightings),
+            ('get_sorted_tiles_for_attack', _new_context, _sorted_tiles_for_attack),
+            ('do_turn', _new_context, _do_turn),
+        )
+        for name, setup, function in hot_paths:
+            best_time, peak = _measure(setup, function, turn_data, args.repeat)
+            print('  %-32s %10.1f ms %10.1f MiB' % (name, best_time * 1000, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Benchmarks tank-to-target assignment, as done by simple_strategic.do_turn.
+
+Compares handing out the shuffled targets in order (the previous do_turn loop)
+with assignment.assign_targets. Since a tank moves one tile per turn, the
+distance of a tank from its target is the amount of turns until it captures it.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from assignment import assign_targets
+from benchmarks.synthetic import make_turn_data
+from common_types import Coordinates
+from tactical_api import Board, NO_OWNER
+
+
+def _report(name, elapsed, tanks, targets, pairs):
+    distances = [abs(tanks[tank].x - targets[target].x) + abs(tanks[tank].y - targets[target].y)
+                 for tank, target in pairs]
+    print('%-12s %8.1f ms   turns to capture: mean %6.1f   max %4d' % (
+        name, elapsed * 1000, sum(distances) / len(distances), max(distances)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=200)
+    parser.add_argument('--tanks', type=int, nargs='+', default=[10, 50, 150, 400])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    board = Board(make_turn_data(args.size, args.size, pieces=0, seed=args.seed))
+    rng = random.Random(args.seed)
+    my_tiles = [Coordinates(int(x), int(y)) for y, x in zip(*np.nonzero(board.owner == 0))]
+    enemy_tiles = [Coordinates(int(x), int(y)) for y, x in zip(*np.nonzero(board.owner > 0))]
+    unclaimed_tiles = [Coordinates(int(x), int(y)) for y, x in zip(*np.nonzero(board.owner == NO_OWNER))]
+    rng.shuffle(enemy_tiles)
+    rng.shuffle(unclaimed_tiles)
+    targets = enemy_tiles + unclaimed_tiles
+    target_costs = [0] * len(enemy_tiles) + [2 * args.size] * len(unclaimed_tiles)
+
+    for tank_count in args.tanks:
+        print('%d tanks, %d targets' % (tank_count, len(targets)))
+        tanks = rng.sample(my_tiles, tank_count)
+        start = time.perf_counter()
+        pairs = list(zip(range(len(tanks)), range(len(targets))))
+        _report('in order', time.perf_counter() - start, tanks, targets, pairs)
+        start = time.perf_counter()
+        pairs = assign_targets(tanks, targets, target_costs)
+        _report('assignment', time.perf_counter() - start, tanks, targets, pairs)
+
+
+if __name__ == '__main__':
+    main()
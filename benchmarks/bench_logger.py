@@ -0,0 +1,90 @@
+"""Benchmarks Logger throughput against a local stand-in log server.
+
+Compares the previous behavior of opening a new connection for every log line
+(without reading the response), the same with the response read, the
+keep-alive connection of tactical_api.Logger, and its background batched mode
+(measured until all lines have been shipped).
+"""
+import argparse
+import http.client
+import http.server
+import json
+import threading
+import time
+
+from tactical_api import Logger
+
+
+class _LogHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LogServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The previous behavior drops connections without reading the response,
+        # which resets them on the server side.
+        pass
+
+
+def _log_with_new_connections(url, lines, read_response=False):
+    """The previous Logger.log behavior: a new connection per line."""
+    parsed_url = Logger(url)._parsed_url
+    for index in range(lines):
+        conn = http.client.HTTPConnection(parsed_url.hostname, parsed_url.port, timeout=Logger.TIMEOUT)
+        conn.request('POST', parsed_url.path, json.dumps({'data': 'line %d' % index}), Logger.REQUEST_HEADERS)
+        if read_response:
+            conn.getresponse().read()
+            conn.close()
+
+
+def _log_with_new_read_connections(url, lines):
+    _log_with_new_connections(url, lines, read_response=True)
+
+
+def _log_with_keep_alive(url, lines):
+    with Logger(url) as logger:
+        for index in range(lines):
+            logger.log('line %d' % index)
+
+
+def _log_in_background(url, lines):
+    with Logger(url, background=True) as logger:
+        for index in range(lines):
+            logger.log('line %d' % index)
+        logger.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=200)
+    args = parser.parse_args()
+
+    server = _LogServer(('127.0.0.1', 0), _LogHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:%d/log' % server.server_address[1]
+    try:
+        for name, function in (('new connection per line', _log_with_new_connections),
+                               ('new connection, read', _log_with_new_read_connections),
+                               ('keep-alive connection', _log_with_keep_alive),
+                               ('background batches', _log_in_background)):
+            start = time.perf_counter()
+            function(url, args.lines)
+            elapsed = time.perf_counter() - start
+            print('%-24s %10.0f lines/s' % (name, args.lines / elapsed))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
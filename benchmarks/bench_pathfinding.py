@@ -0,0 +1,102 @@
+"""Benchmarks the path finding engine on a large board with many moving pieces.
+
+Every piece is given a random goal, and moves one step towards it per turn.
+Compares the previous greedy coin-flip step, A* without a path cache, and A*
+with the path cache of pathfinding.PathFinder. Tile costs are derived from the
+tile owners, as in MyStrategicApi.tile_cost. The cache is measured both with
+fixed costs, and with the costs of random tiles changing every turn (as tile
+owners and threats do in real games), which changes the cost version.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import make_turn_data
+from common_types import Coordinates
+from pathfinding import PathFinder
+from tactical_api import Board
+
+
+def _greedy_step(start, goal):
+    """The previous move_piece_to_destination step."""
+    if random.random() < 0.5:
+        if goal.x != start.x:
+            return Coordinates(start.x + (1 if goal.x > start.x else -1), start.y)
+        elif goal.y != start.y:
+            return Coordinates(start.x, start.y + (1 if goal.y > start.y else -1))
+    else:
+        if goal.y != start.y:
+            return Coordinates(start.x, start.y + (1 if goal.y > start.y else -1))
+        elif goal.x != start.x:
+            return Coordinates(start.x + (1 if goal.x > start.x else -1), start.y)
+    return None
+
+
+def _run(name, step, pieces, turns, start_turn=None):
+    """Moves the pieces for turns turns. start_turn is called with the number of each turn before it."""
+    positions = {piece: start for piece, (start, _) in pieces.items()}
+    start_time = time.perf_counter()
+    for turn in range(turns):
+        if start_turn is not None:
+            start_turn(turn)
+        for piece, (_, goal) in pieces.items():
+            next_position = step(positions[piece], goal)
+            if next_position is not None:
+                positions[piece] = next_position
+    elapsed = time.perf_counter() - start_time
+    arrived = sum(positions[piece] == goal for piece, (_, goal) in pieces.items())
+    print('%-16s %8.1f ms/turn   %4d/%d arrived' % (name, elapsed * 1000 / turns, arrived, len(pieces)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=200)
+    parser.add_argument('--pieces', type=int, default=300)
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--changes', type=int, default=100,
+                        help='The amount of tiles whose cost changes every turn, in the changing costs run.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    board = Board(make_turn_data(args.size, args.size, pieces=0, seed=args.seed))
+    my_index = 0
+    costs = [[1 if owner == my_index else 2 if owner < 0 else 3 for owner in row] for row in board.owner.tolist()]
+
+    def tile_cost(x, y):
+        return costs[y][x]
+
+    rng = random.Random(args.seed)
+    pieces = {}
+    for piece in range(args.pieces):
+        start = Coordinates(rng.randrange(args.size), rng.randrange(args.size))
+        goal = Coordinates(min(args.size - 1, max(0, start.x + rng.randint(-args.turns, args.turns))),
+                           min(args.size - 1, max(0, start.y + rng.randint(-args.turns, args.turns))))
+        pieces[piece] = (start, goal)
+
+    random.seed(args.seed)
+    _run('greedy', _greedy_step, pieces, args.turns)
+    uncached = PathFinder()
+    _run('A* (no cache)', lambda start, goal: uncached.next_step(start, goal, args.size, args.size, tile_cost),
+         pieces, args.turns)
+    cached = PathFinder()
+    _run('A* (cached)', lambda start, goal: cached.next_step(start, goal, args.size, args.size, tile_cost, 0),
+         pieces, args.turns)
+    print('cached: %d searches, %d cache hits' % (cached.searches, cached.cache_hits))
+
+    # The cost version is the number of the turn, as the costs change every turn.
+    cost_version = [None]
+
+    def change_costs(turn):
+        for _ in range(args.changes):
+            costs[rng.randrange(args.size)][rng.randrange(args.size)] = rng.randint(1, 3)
+        cost_version[0] = turn
+
+    changing = PathFinder()
+    _run('A* (changing)',
+         lambda start, goal: changing.next_step(start, goal, args.size, args.size, tile_cost, cost_version[0]),
+         pieces, args.turns, change_costs)
+    print('changing: %d searches, %d cache hits' % (changing.searches, changing.cache_hits))
+
+
+if __name__ == '__main__':
+    main()
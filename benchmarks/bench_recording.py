@@ -0,0 +1,59 @@
+"""Benchmarks recording a simulated game, and seeking in its replay.
+
+Reports the size of the recording against the size of the same turns as JSON,
+the time of recording each turn, and the time of rebuilding random turns.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import recording
+import simulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=200)
+    parser.add_argument('--height', type=int, default=200)
+    parser.add_argument('--countries', type=int, default=3)
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--keyframe-interval', type=int, default=recording.DEFAULT_KEYFRAME_INTERVAL)
+    parser.add_argument('--seeks', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    countries = ['country%d' % index for index in range(args.countries)]
+    game = simulator.Simulator(args.width, args.height, countries, args.seed)
+    path = os.path.join(tempfile.mkdtemp(), 'game.rec')
+    json_size = 0
+    record_time = 0
+    with recording.Recorder(path, args.keyframe_interval) as recorder:
+        for _ in range(args.turns):
+            turn_data = game.get_turn_data(countries[0])
+            json_size += len(json.dumps(turn_data))
+            start = time.perf_counter()
+            recorder.record_turn(turn_data)
+            record_time += time.perf_counter() - start
+            game.step()
+    print('recording: %d turns, %.1f KiB (%.1f KiB as JSON), %.2f ms per turn' %
+          (args.turns, os.path.getsize(path) / 1024, json_size / 1024, record_time / args.turns * 1000))
+
+    rng = random.Random(args.seed)
+    with recording.Replay(path) as replay:
+        start = time.perf_counter()
+        for _ in range(args.seeks):
+            replay.get_context(rng.randrange(len(replay)))
+        seek_time = (time.perf_counter() - start) / args.seeks
+        start = time.perf_counter()
+        for turn in range(len(replay)):
+            replay.get_turn_data(turn)
+        sequential_time = (time.perf_counter() - start) / len(replay)
+    os.remove(path)
+    print('replay: %.2f ms per random seek, %.2f ms per turn in order' % (seek_time * 1000, sequential_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
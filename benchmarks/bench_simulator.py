@@ -0,0 +1,58 @@
+"""Benchmarks full local games, with the simulator standing in for the server.
+
+The first country plays simple_strategic, and the others stay idle. Reports the
+amount of turns simulated per minute.
+"""
+import argparse
+import time
+
+import simple_strategic
+import simple_tactical
+import simulator
+from strategy_state import StrategyState
+from tactical_api import Logger, TurnContext
+
+
+def _make_simple_strategic_player():
+    """Returns a player of simple_strategic, with a StrategyState of its own for a single game."""
+    # Without a turn budget, so every phase runs on every machine.
+    state = StrategyState(turn_budget=None)
+
+    def player(turn_data):
+        context = TurnContext(turn_data, Logger(None))
+        simple_strategic.do_turn(simple_tactical.get_strategic_implementation(context, state))
+        return context.get_result()
+
+    return player
+
+
+def _make_idle_player():
+    return _play_idle
+
+
+def _play_idle(turn_data):
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=40)
+    parser.add_argument('--height', type=int, default=30)
+    parser.add_argument('--countries', type=int, default=3)
+    parser.add_argument('--turns', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    countries = ['country%d' % index for index in range(args.countries)]
+    for name, make_player in (('idle', _make_idle_player), ('simple_strategic', _make_simple_strategic_player)):
+        game = simulator.Simulator(args.width, args.height, countries, args.seed)
+        players = {country: _play_idle for country in countries}
+        players[countries[0]] = make_player()
+        start = time.perf_counter()
+        winner = simulator.play(game, players, args.turns)
+        elapsed = time.perf_counter() - start
+        print('%-17s %5d turns %10.0f turns/min   winner: %s' % (name, game.turn, game.turn / elapsed * 60, winner))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Benchmarks the threat map on a large board with many moving enemy pieces.
+
+Every turn, a fraction of the enemy pieces moves one tile. Compares computing
+the threat map from scratch with updating it incrementally.
+"""
+import argparse
+import random
+import time
+
+from threat import ThreatMap
+
+_PIECE_TYPES = ('tank', 'artillery', 'helicopter', 'airplane', 'antitank', 'bunker', 'spy', 'builder')
+
+
+def _move_pieces(rng, pieces, size, moving_fraction):
+    pieces = dict(pieces)
+    for piece_id in rng.sample(list(pieces), int(len(pieces) * moving_fraction)):
+        x, y, piece_type = pieces[piece_id]
+        pieces[piece_id] = (min(max(x + rng.choice((-1, 1)), 0), size - 1), y, piece_type)
+    return pieces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--pieces', type=int, default=5000)
+    parser.add_argument('--moving', type=float, default=0.05, help='The fraction of pieces moving each turn.')
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pieces = {str(piece_id): (rng.randrange(args.size), rng.randrange(args.size), rng.choice(_PIECE_TYPES))
+              for piece_id in range(args.pieces)}
+    turns = [pieces]
+    for _ in range(args.turns - 1):
+        turns.append(_move_pieces(rng, turns[-1], args.size, args.moving))
+
+    print('%dx%d board, %d pieces, %d%% moving per turn' % (args.size, args.size, args.pieces, args.moving * 100))
+    for name, max_incremental_fraction in (('full', -1), ('incremental', 1)):
+        threat_map = ThreatMap(max_incremental_fraction=max_incremental_fraction)
+        threat_map.update(args.size, args.size, turns[0])
+        start = time.perf_counter()
+        for turn in turns[1:]:
+            threat_map.update(args.size, args.size, turn)
+        elapsed = time.perf_counter() - start
+        print('%-12s %8.2f ms/turn' % (name, elapsed * 1000 / (len(turns) - 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Benchmarks TurnContext construction on a synthetic large turn.
+
+Reports the construction time, the time for building every tile and piece
+object, and the peak memory of both.
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_turn_data
+from tactical_api import Logger, TurnContext
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=300)
+    parser.add_argument('--height', type=int, default=300)
+    parser.add_argument('--pieces', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    turn_data = make_turn_data(args.width, args.height, pieces=args.pieces)
+    for _ in range(args.repeat):
+        construct_time, build_time = _construct(turn_data)
+        print('construct %7.1f ms   build all objects %7.1f ms' % (construct_time * 1000, build_time * 1000))
+    # Tracing slows allocations down, so memory is measured in a separate run.
+    tracemalloc.start()
+    _construct(turn_data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('peak memory %.1f MiB' % (peak / 2 ** 20))
+
+
+def _construct(turn_data):
+    """Returns the time for constructing a TurnContext, and for building all its objects."""
+    start = time.perf_counter()
+    context = TurnContext(turn_data, Logger(None))
+    constructed = time.perf_counter()
+    for piece in context.all_pieces.values():
+        pass
+    return constructed - start, time.perf_counter() - constructed
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""A seeded generator of synthetic turn data, for benchmarks and tests."""
+import copy
+import random
+
+from tactical_api import PIECE_TYPES
+
+
+def make_turn_data(width, height, countries=3, pieces=1000, seed=0, piece_mix=None, unclaimed_fraction=0.1,
+                   money_fraction=0.5, max_money=20):
+    """Returns a synthetic turn_data dict, as the server sends to a country.
+
+    The board is split into vertical stripes, one per country, with a fraction
+    of unclaimed tiles scattered around. pieces pieces are placed on random
+    tiles, and belong to the country owning their tile (or to a random country on
+    unclaimed tiles). The turn data is for the first country.
+
+    piece_mix maps piece types to their relative weights, and defaults to an
+    even mix of all the piece types. money_fraction of the tiles have a known
+    amount of money, uniformly distributed in [0, max_money).
+    """
+    rng = random.Random(seed)
+    if piece_mix is None:
+        piece_mix = {piece_type: 1 for piece_type in PIECE_TYPES}
+    piece_types = list(piece_mix)
+    piece_weights = [piece_mix[piece_type] for piece_type in piece_types]
+    country_names = ['country%d' % index for index in range(countries)]
+    tiles = []
+    for x in range(width):
+        owner = country_names[x * countries // width]
+        for y in range(height):
+            tiles.append({
+                'coordinate': {'x': x, 'y': y},
+                'country': owner if rng.random() >= unclaimed_fraction else None,
+                'money': rng.randrange(max_money) if rng.random() < money_fraction else None,
+                'pieces': [],
+            })
+    for piece_id, piece_type in enumerate(rng.choices(piece_types, piece_weights, k=pieces)):
+        tile = tiles[rng.randrange(len(tiles))]
+        tile['pieces'].append(make_piece_dict(rng, str(piece_id), piece_type,
+                                              tile['country'] or rng.choice(country_names)))
+    return {
+        'width': width,
+        'height': height,
+        'country': country_names[0],
+        'all_countries': country_names,
+        'tiles': tiles,
+    }
+
+
+def make_turns(count, width, height, countries=3, pieces=100, seed=0, changed_tiles=10):
+    """Returns a list of count synthetic turn_data dicts of consecutive turns.
+
+    The first turn is make_turn_data(width, height, countries, pieces, seed).
+    Every next turn changes the owner and money of changed_tiles random tiles,
+    moves the pieces of a random tile into another one, and sometimes drops a
+    tile or shuffles the order of the tiles.
+    """
+    rng = random.Random(seed)
+    turn_data = make_turn_data(width, height, countries, pieces, seed)
+    turns = [turn_data]
+    for _ in range(count - 1):
+        turn_data = copy.deepcopy(turn_data)
+        tiles = turn_data['tiles']
+        for tile_dict in rng.sample(tiles, changed_tiles):
+            tile_dict['country'] = rng.choice(turn_data['all_countries'] + [None])
+            tile_dict['money'] = rng.choice([None, rng.randrange(20)])
+        source, destination = rng.sample(tiles, 2)
+        destination['pieces'].extend(source['pieces'])
+        source['pieces'] = []
+        if rng.random() < 0.3:
+            tiles.pop(rng.randrange(len(tiles)))
+        if rng.random() < 0.3:
+            rng.shuffle(tiles)
+        turns.append(turn_data)
+    return turns
+
+
+def make_piece_dict(rng, piece_id, piece_type, country):
+    """Returns a synthetic piece dict with the fields of the given piece type."""
+    piece_dict = {'id': piece_id, 'type': piece_type, 'country': country}
+    if piece_type in ('airplane', 'helicopter'):
+        piece_dict['inAir'] = rng.random() < 0.5
+        if piece_dict['inAir']:
+            piece_dict['timeInAir'] = rng.randrange(5)
+    elif piece_type == 'irondome':
+        piece_dict['isDefending'] = rng.random() < 0.5
+    elif piece_type == 'builder':
+        piece_dict['money'] = rng.randrange(30)
+    return piece_dict
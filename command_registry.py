@@ -0,0 +1,158 @@
+from collections import deque, namedtuple
+import sys
+
+from strategic_api import CommandStatus
+
+DEFAULT_TERMINAL_TURNS = 10
+"""The default amount of turns for which finished commands are kept."""
+
+CommandId = namedtuple('CommandId', ['kind', 'number'])
+CommandId.__doc__ = "The identifier of a command in a CommandRegistry."
+CommandId.kind.__doc__ = 'The kind of the command (e.g. "attack").'
+CommandId.number.__doc__ = 'A number unique to the command within its registry.'
+
+
+class _Entry(object):
+    __slots__ = ('status', 'piece_id', 'target', 'finished_turn')
+
+    def __init__(self, status, piece_id, target):
+        self.status = status
+        self.piece_id = piece_id
+        self.target = target
+        self.finished_turn = None
+
+
+class CommandRegistry(object):
+    """Keeps the statuses of commands given to pieces, across turns.
+
+    Each piece executes at most one command at a time. Finished (succeeded or
+    failed) commands are kept for terminal_turns turns, after which their status
+    is evicted. Commands of pieces that no longer exist are failed automatically
+    by next_turn(), so the registry never grows beyond the live commands and the
+    recently finished ones.
+
+    This class exports the following fields:
+    * turn: The number of the current turn, counting calls to next_turn().
+    * issued_count: The amount of commands issued so far.
+    * evicted_count: The amount of finished commands evicted so far.
+    * swept_count: The amount of commands failed since their piece was gone.
+    """
+
+    def __init__(self, terminal_turns=DEFAULT_TERMINAL_TURNS):
+        super(CommandRegistry, self).__init__()
+        self._terminal_turns = terminal_turns
+        self._entries = {}
+        # Maps a piece ID to the ID of the command it executes.
+        self._piece_commands = {}
+        # (finished turn, command ID) of finished commands, by order of finishing.
+        self._finished = deque()
+        self.turn = 0
+        self.issued_count = 0
+        self.evicted_count = 0
+        self.swept_count = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, command_id):
+        return command_id in self._entries
+
+    def issue(self, kind, piece_id, estimated_turns, target=None):
+        """Issues a new command of the given kind to a piece, and returns its CommandId.
+
+        A command the piece is already executing fails. target is any value
+        describing the command (e.g. its destination), see get_target().
+        """
+        old_command_id = self._piece_commands.get(piece_id)
+        if old_command_id is not None:
+            self.fail(old_command_id)
+        command_id = CommandId(kind, self.issued_count)
+        self.issued_count += 1
+        self._entries[command_id] = _Entry(CommandStatus.in_progress(command_id, 0, estimated_turns),
+                                           piece_id, target)
+        self._piece_commands[piece_id] = command_id
+        return command_id
+
+    def get_status(self, command_id):
+        """Returns the CommandStatus of a command, or None if it is unknown or evicted."""
+        entry = self._entries.get(command_id)
+        return None if entry is None else entry.status
+
+    def get_target(self, command_id):
+        """Returns the target the command was issued with, or None if it is unknown."""
+        entry = self._entries.get(command_id)
+        return None if entry is None else entry.target
+
+    def get_piece_command(self, piece_id):
+        """Returns the ID of the command the given piece executes, or None."""
+        return self._piece_commands.get(piece_id)
+
+    def get_piece_commands(self, kind=None):
+        """Returns a dict mapping piece IDs to the IDs of the commands they execute.
+
+        The commands may optionally be filtered by kind.
+        """
+        return {piece_id: command_id for piece_id, command_id in self._piece_commands.items()
+                if kind is None or command_id.kind == kind}
+
+    def progress(self, command_id):
+        """Records another turn of progress of an in-progress command."""
+        entry = self._entries[command_id]
+        entry.status = CommandStatus.in_progress(command_id, entry.status.elapsed_turns + 1,
+                                                 entry.status.estimated_turns - 1)
+
+    def succeed(self, command_id):
+        """Marks a command as succeeded."""
+        self._finish(command_id, CommandStatus.success(command_id))
+
+    def fail(self, command_id):
+        """Marks a command as failed."""
+        self._finish(command_id, CommandStatus.failed(command_id))
+
+    def _finish(self, command_id, status):
+        entry = self._entries[command_id]
+        if entry.finished_turn is not None:
+            return
+        entry.status = status
+        entry.finished_turn = self.turn
+        self._finished.append((self.turn, command_id))
+        if self._piece_commands.get(entry.piece_id) == command_id:
+            del self._piece_commands[entry.piece_id]
+
+    def next_turn(self, live_piece_ids):
+        """Advances to the next turn.
+
+        The commands of pieces missing from live_piece_ids (any container of piece
+        IDs) fail, and commands finished more than terminal_turns turns ago are
+        evicted.
+        """
+        self.turn += 1
+        for piece_id, command_id in list(self._piece_commands.items()):
+            if piece_id not in live_piece_ids:
+                self.fail(command_id)
+                self.swept_count += 1
+        while self._finished and self.turn - self._finished[0][0] > self._terminal_turns:
+            _, command_id = self._finished.popleft()
+            del self._entries[command_id]
+            self.evicted_count += 1
+
+    def stats(self):
+        """Returns a dict of statistics about the registry.
+
+        The dict contains the amounts of entries, of commands in progress and of
+        finished commands, the counters of this class, and the approximate amount
+        of memory used by the registry, in bytes.
+        """
+        memory = (sys.getsizeof(self._entries) + sys.getsizeof(self._piece_commands) +
+                  sys.getsizeof(self._finished))
+        for command_id, entry in self._entries.items():
+            memory += sys.getsizeof(command_id) + sys.getsizeof(entry) + sys.getsizeof(entry.status)
+        return {
+            'entries': len(self._entries),
+            'in_progress': len(self._piece_commands),
+            'finished': len(self._finished),
+            'issued': self.issued_count,
+            'evicted': self.evicted_count,
+            'swept': self.swept_count,
+            'memory_bytes': memory,
+        }
@@ -0,0 +1,167 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+
+
+class _NullTimer(object):
+    """The timer returned while metrics are disabled, which does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    __slots__ = ('_metrics', '_name', '_start')
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._metrics.add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Metrics(object):
+    """Per-turn performance metrics: timers, counters, and optional profiling.
+
+    Metrics are disabled by default, in which case timer() returns a shared
+    no-op context manager and count() returns immediately. Once enabled, the
+    times and counts of a turn are collected into a record, which is finished by
+    end_turn(), kept in last_record and appended as a JSON line to the export
+    file, if there is one.
+
+    Every profile_every-th turn may be profiled with cProfile, in which case its
+    stats are dumped to profile_directory/turn-<number>.prof, and every
+    trace_memory_every-th turn may be traced with tracemalloc, in which case its
+    peak memory is added to the record.
+
+    This class exports the following fields:
+    * enabled: Whether metrics are collected.
+    * turn: The number of the current turn, counting calls to start_turn().
+    * last_record: The record of the last finished turn, or None.
+    """
+
+    def __init__(self):
+        super(Metrics, self).__init__()
+        self.enabled = False
+        self.turn = 0
+        self.last_record = None
+        self._export_file = None
+        self._profile_every = 0
+        self._trace_memory_every = 0
+        self._profile_directory = '.'
+        self._record = None
+        self._turn_start = None
+        self._profile = None
+        self._tracing_memory = False
+
+    def enable(self, export_path=None, profile_every=0, trace_memory_every=0, profile_directory='.'):
+        """Starts collecting metrics.
+
+        export_path is the path of a JSON lines file to which the turn records are
+        appended, or None. profile_every and trace_memory_every are turn
+        intervals, where 0 disables profiling or memory tracing.
+        """
+        self.disable()
+        self.enabled = True
+        if export_path is not None:
+            self._export_file = open(export_path, 'a')
+        self._profile_every = profile_every
+        self._trace_memory_every = trace_memory_every
+        self._profile_directory = profile_directory
+
+    def disable(self):
+        """Stops collecting metrics, finishing the current turn first."""
+        if not self.enabled:
+            return
+        if self._turn_start is not None or self._record is not None:
+            self.end_turn()
+        self.enabled = False
+        if self._export_file is not None:
+            self._export_file.close()
+            self._export_file = None
+
+    def timer(self, name):
+        """Returns a context manager, which adds the time spent inside it to the named timer."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        """Adds the given amount of seconds to the named timer."""
+        if not self.enabled:
+            return
+        timers = self._get_record()['timers']
+        timers[name] = timers.get(name, 0) + seconds
+
+    def count(self, name, amount=1):
+        """Adds amount to the named counter."""
+        if not self.enabled:
+            return
+        counters = self._get_record()['counters']
+        counters[name] = counters.get(name, 0) + amount
+
+    def start_turn(self):
+        """Starts a new turn, finishing the current one if it was not finished."""
+        if not self.enabled:
+            return
+        if self._turn_start is not None:
+            self.end_turn()
+        self.turn += 1
+        self._turn_start = time.perf_counter()
+        if self._trace_memory_every and self.turn % self._trace_memory_every == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing_memory = True
+            tracemalloc.reset_peak()
+        if self._profile_every and self.turn % self._profile_every == 0:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def end_turn(self):
+        """Finishes the current turn, and exports its record."""
+        if not self.enabled:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(os.path.join(self._profile_directory, 'turn-%d.prof' % self.turn))
+            self._profile = None
+        record = self._get_record()
+        if self._turn_start is not None:
+            record['timers']['turn'] = time.perf_counter() - self._turn_start
+            self._turn_start = None
+        if self._trace_memory_every and self.turn % self._trace_memory_every == 0 and tracemalloc.is_tracing():
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            if self._tracing_memory:
+                tracemalloc.stop()
+                self._tracing_memory = False
+        self.last_record = record
+        self._record = None
+        if self._export_file is not None:
+            self._export_file.write(json.dumps(record) + '\n')
+            self._export_file.flush()
+
+    def _get_record(self):
+        if self._record is None:
+            self._record = {'turn': self.turn, 'timers': {}, 'counters': {}}
+        return self._record
+
+
+metrics = Metrics()
+"""The metrics of this process, used by all the instrumented code."""
@@ -0,0 +1,362 @@
+import heapq
+from collections import OrderedDict
+import math
+
+import numpy as np
+
+from common_types import Coordinates
+
+DEFAULT_MAX_CACHED_PATHS = 1024
+"""The default amount of goals whose paths are cached."""
+
+DEFAULT_REPLAN_FACTOR = 2
+"""The default factor by which the cost of a cached path may grow before it is searched again."""
+
+_NEIGHBOR_OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def uniform_cost(x, y):
+    """A tile cost function, in which entering any tile costs 1."""
+    return 1
+
+
+class PathFinder(object):
+    """Finds shortest paths over the game board, and caches them.
+
+    Paths are searched with A*, over tiles connected up, down, left and right.
+    The cost of a path is given by a tile cost function, called with the (x, y)
+    of each tile entered, and returning either the cost of entering it (at least
+    1), or None if the tile may not be entered. The goal may always be entered.
+
+    Found paths are cached per goal. Since every tile on a shortest path
+    continues along the same path, a piece that keeps the same goal reuses its
+    path on the following turns, without searching again. Tile costs may change
+    between turns, so cost_version is any hashable value that changes whenever
+    they do. When it changes, the rest of a cached path is checked against the
+    new costs, and is kept unless one of its tiles may no longer be entered, or
+    its cost grew by more than replan_factor. Changes elsewhere on the board
+    therefore do not drop cached paths, and pieces do not change course on every
+    small change of cost.
+
+    This class exports the following fields:
+    * searches: The amount of searches done so far.
+    * cache_hits: The amount of next_step calls answered from the cache.
+    """
+
+    def __init__(self, max_cached_paths=DEFAULT_MAX_CACHED_PATHS, replan_factor=DEFAULT_REPLAN_FACTOR):
+        super(PathFinder, self).__init__()
+        self._max_cached_paths = max_cached_paths
+        self._replan_factor = replan_factor
+        # Maps a goal to a dict mapping (x, y) to a list of the next (x, y) on a
+        # path to the goal, the cost of entering it when the path was searched, and
+        # the cost version in which the rest of the path was last known to be good.
+        self._next_steps = OrderedDict()
+        self.searches = 0
+        self.cache_hits = 0
+
+    def find_path(self, start, goal, width, height, tile_cost=uniform_cost):
+        """Returns a shortest path from start to goal, or None if there is none.
+
+        The path is a list of Coordinates, starting after start and ending at goal.
+        """
+        path = self._search((start.x, start.y), (goal.x, goal.y), width, height, tile_cost)
+        return None if path is None else [Coordinates(x, y) for x, y in path[1:]]
+
+    def next_step(self, start, goal, width, height, tile_cost=uniform_cost, cost_version=None):
+        """Returns the Coordinates of the next tile on a shortest path to goal.
+
+        None is returned if start is the goal, or if the goal can not be reached.
+        If cost_version is None, the path is not cached.
+        """
+        start = (start.x, start.y)
+        goal = (goal.x, goal.y)
+        if start == goal:
+            return None
+        if cost_version is None:
+            path = self._search(start, goal, width, height, tile_cost)
+            return None if path is None else Coordinates(*path[1])
+
+        next_steps = self._next_steps.get(goal)
+        if next_steps is not None:
+            self._next_steps.move_to_end(goal)
+            step = next_steps.get(start)
+            if step is not None and (step[2] == cost_version or
+                                     self._revalidate(next_steps, start, goal, tile_cost, cost_version)):
+                self.cache_hits += 1
+                return Coordinates(*step[0])
+        path = self._search(start, goal, width, height, tile_cost)
+        if path is None:
+            return None
+        if next_steps is None:
+            next_steps = self._next_steps[goal] = {}
+            if len(self._next_steps) > self._max_cached_paths:
+                self._next_steps.popitem(last=False)
+        for node, next_node in zip(path, path[1:]):
+            step_cost = tile_cost(*next_node)
+            if next_node == goal:
+                step_cost = step_cost or 1
+            next_steps[node] = [next_node, step_cost, cost_version]
+        return Coordinates(*path[1])
+
+    def _revalidate(self, next_steps, start, goal, tile_cost, cost_version):
+        """Returns True if the cached path from start to goal is still good under the current tile costs.
+
+        If it is, the rest of the path is marked as good for cost_version.
+        """
+        old_cost = 0
+        new_cost = 0
+        node = start
+        steps = []
+        while node != goal:
+            step = next_steps[node]
+            steps.append(step)
+            next_node = step[0]
+            step_cost = tile_cost(*next_node)
+            if next_node == goal:
+                step_cost = step_cost or 1
+            elif step_cost is None:
+                return False
+            old_cost += step[1]
+            new_cost += step_cost
+            node = next_node
+        if new_cost > old_cost * self._replan_factor:
+            return False
+        for step in steps:
+            step[2] = cost_version
+        return True
+
+    def clear(self):
+        """Drops all the cached paths."""
+        self._next_steps.clear()
+
+    def _search(self, start, goal, width, height, tile_cost):
+        """A* from start to goal. Returns the list of (x, y) from start to goal, or None."""
+        self.searches += 1
+        goal_x, goal_y = goal
+        if not (0 <= goal_x < width and 0 <= goal_y < height):
+            return None
+        costs = {start: 0}
+        previous = {start: None}
+        # The heuristic is the L1 distance, which is admissible since every tile
+        # costs at least 1. Ties are broken in favor of the deeper node.
+        open_heap = [(abs(start[0] - goal_x) + abs(start[1] - goal_y), 0, start)]
+        while open_heap:
+            _, negative_cost, node = heapq.heappop(open_heap)
+            cost = -negative_cost
+            if node == goal:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = previous[node]
+                path.reverse()
+                return path
+            if cost > costs[node]:
+                continue
+            x, y = node
+            for offset_x, offset_y in _NEIGHBOR_OFFSETS:
+                neighbor_x = x + offset_x
+                neighbor_y = y + offset_y
+                if not (0 <= neighbor_x < width and 0 <= neighbor_y < height):
+                    continue
+                neighbor = (neighbor_x, neighbor_y)
+                if neighbor == goal:
+                    step_cost = tile_cost(neighbor_x, neighbor_y) or 1
+                else:
+                    step_cost = tile_cost(neighbor_x, neighbor_y)
+                    if step_cost is None:
+                        continue
+                neighbor_cost = cost + step_cost
+                if neighbor_cost < costs.get(neighbor, neighbor_cost + 1):
+                    costs[neighbor] = neighbor_cost
+                    previous[neighbor] = node
+                    heapq.heappush(open_heap, (neighbor_cost + abs(neighbor_x - goal_x) + abs(neighbor_y - goal_y),
+                                               -neighbor_cost, neighbor))
+        return None
+
+
+IMPASSABLE = 0
+"""A tile cost, in a DistanceField cost array, of a tile that may not be entered."""
+
+
+class DistanceField(object):
+    """The cheapest cost of reaching a set of target tiles, from every tile.
+
+    The field is computed once, with a single multi-source Dijkstra search from
+    all the targets, after which any amount of pieces may read their distance and
+    next step in O(1).
+
+    costs is a (height, width) integer array of the cost of entering each tile
+    (at least 1), or IMPASSABLE. targets is a (height, width) boolean array. A
+    target may always be entered, at a cost of at least 1.
+
+    update() takes new costs and targets, and only recomputes the tiles whose
+    cheapest path has become more expensive, or that may now be reached more
+    cheaply. This is much cheaper than a full computation when few tiles change.
+    """
+
+    def __init__(self, costs, targets):
+        super(DistanceField, self).__init__()
+        self.height, self.width = costs.shape
+        self.costs = costs.copy()
+        self.targets = targets.copy()
+        self._enter_costs = self._get_enter_costs(costs, targets)
+        size = self.width * self.height
+        # Flat (y * width + x) lists of the cheapest cost to a target, and of the
+        # flat index of the next tile on the cheapest path (or -1).
+        self._distances = [math.inf] * size
+        self._next = [-1] * size
+        self._propagate([(0, index, -1) for index in np.flatnonzero(targets).tolist()])
+
+    @staticmethod
+    def _get_enter_costs(costs, targets):
+        return np.where(targets, np.maximum(costs, 1), costs).ravel()
+
+    def distance(self, coordinates):
+        """Returns the cost of reaching the closest target from coordinates.
+
+        math.inf is returned if no target can be reached.
+        """
+        return self._distances[coordinates.y * self.width + coordinates.x]
+
+    def next_step(self, coordinates):
+        """Returns the Coordinates of the next tile towards the closest target.
+
+        None is returned if coordinates is a target, or if no target can be
+        reached.
+        """
+        next_index = self._next[coordinates.y * self.width + coordinates.x]
+        if next_index < 0:
+            return None
+        return Coordinates(next_index % self.width, next_index // self.width)
+
+    def update(self, costs, targets):
+        """Updates the field for new costs and targets arrays, of the same shape."""
+        old_enter_costs = self._enter_costs
+        enter_costs = self._get_enter_costs(costs, targets)
+        removed_targets = np.flatnonzero(self.targets & ~targets)
+        added_targets = np.flatnonzero(targets & ~self.targets)
+        self.costs = costs.copy()
+        self.targets = targets.copy()
+        self._enter_costs = enter_costs
+        old_impassable = old_enter_costs == IMPASSABLE
+        new_impassable = enter_costs == IMPASSABLE
+        more_expensive = np.flatnonzero(new_impassable | (~old_impassable & (enter_costs > old_enter_costs)))
+        cheaper = np.flatnonzero(~new_impassable & (old_impassable | (enter_costs < old_enter_costs)))
+        if not (len(removed_targets) or len(added_targets) or len(more_expensive) or len(cheaper)):
+            return
+
+        # Tiles whose cheapest path starts at a removed target, or enters a tile
+        # that became more expensive, are invalidated and reached again. The
+        # distance of any other tile can only decrease.
+        next_tiles = np.array(self._next)
+        invalid = self._subtrees(next_tiles, np.concatenate(
+            [removed_targets, np.flatnonzero(np.isin(next_tiles, more_expensive))]))
+        distances = self._distances
+        for index in invalid:
+            distances[index] = math.inf
+            self._next[index] = -1
+
+        enter_costs = enter_costs.tolist()
+        heap = [(0, index, -1) for index in added_targets.tolist()]
+        for index in invalid:
+            for neighbor in self._neighbors(index):
+                if enter_costs[neighbor] != IMPASSABLE and distances[neighbor] != math.inf:
+                    heap.append((distances[neighbor] + enter_costs[neighbor], index, neighbor))
+        for index in cheaper.tolist():
+            if distances[index] != math.inf:
+                for neighbor in self._neighbors(index):
+                    heap.append((distances[index] + enter_costs[index], neighbor, index))
+        self._propagate(heap)
+
+    @staticmethod
+    def _subtrees(next_tiles, roots):
+        """Returns the given roots and all the tiles whose cheapest path passes through them."""
+        order = np.argsort(next_tiles, kind='stable')
+        sorted_next_tiles = next_tiles[order]
+        result = set(roots.tolist())
+        pending = list(result)
+        while pending:
+            index = pending.pop()
+            start, end = np.searchsorted(sorted_next_tiles, (index, index + 1))
+            for child in order[start:end].tolist():
+                if child not in result:
+                    result.add(child)
+                    pending.append(child)
+        return result
+
+    def _neighbors(self, index):
+        x = index % self.width
+        if x > 0:
+            yield index - 1
+        if x < self.width - 1:
+            yield index + 1
+        if index >= self.width:
+            yield index - self.width
+        if index < (self.height - 1) * self.width:
+            yield index + self.width
+
+    def _propagate(self, heap):
+        """Runs Dijkstra from the given (distance, index, next index) entries.
+
+        The search goes backwards: a tile is reached from a neighbor by entering
+        that neighbor.
+        """
+        distances = self._distances
+        next_tiles = self._next
+        enter_costs = self._enter_costs
+        if not isinstance(enter_costs, list):
+            enter_costs = enter_costs.tolist()
+        heapq.heapify(heap)
+        while heap:
+            distance, index, next_index = heapq.heappop(heap)
+            if distance >= distances[index]:
+                continue
+            distances[index] = distance
+            next_tiles[index] = next_index
+            enter_cost = enter_costs[index]
+            if enter_cost == IMPASSABLE:
+                continue
+            for neighbor in self._neighbors(index):
+                if distance + enter_cost < distances[neighbor]:
+                    heapq.heappush(heap, (distance + enter_cost, neighbor, index))
+
+
+class DistanceFieldService(object):
+    """Caches DistanceFields by name, across turns.
+
+    A cached field is updated incrementally when its costs or targets change, and
+    is recomputed from scratch only when the board size changes.
+
+    This class exports the following fields:
+    * full_computations: The amount of fields computed from scratch so far.
+    * incremental_updates: The amount of incremental field updates so far.
+    """
+
+    def __init__(self):
+        super(DistanceFieldService, self).__init__()
+        self._fields = {}
+        self.full_computations = 0
+        self.incremental_updates = 0
+
+    def get(self, name, costs, targets):
+        """Returns the DistanceField of the given name, for the given costs and targets.
+
+        See DistanceField for the expected costs and targets arrays.
+        """
+        field = self._fields.get(name)
+        if field is None or field.costs.shape != costs.shape:
+            field = self._fields[name] = DistanceField(costs, targets)
+            self.full_computations += 1
+        elif not (np.array_equal(field.costs, costs) and np.array_equal(field.targets, targets)):
+            field.update(costs, targets)
+            self.incremental_updates += 1
+        return field
+
+    def retain(self, keep):
+        """Drops the cached fields whose names keep (a function of a name) returns False for."""
+        for name in [name for name in self._fields if not keep(name)]:
+            del self._fields[name]
+
+    def clear(self):
+        """Drops all the cached fields."""
+        self._fields.clear()
@@ -0,0 +1,365 @@
+"""A compact binary recording of games, and its memory-mapped replay.
+
+A recording holds the turn_data of every turn a TurnContext received, and the
+command dicts it returned. Every turn is a zlib-compressed block of columns:
+one row per tile and one row per piece. Every keyframe_interval-th turn is a
+keyframe, holding all the tiles of its turn. The other turns only hold the
+tiles that changed since the previous turn (delta encoding).
+
+File layout (all integers are little endian):
+* MAGIC.
+* One block per turn: its compressed length (uint32), whether it is a keyframe
+  (uint8), and its compressed bytes.
+* An index, written by Recorder.close(): INDEX_MAGIC, the offset of the block
+  of each turn (uint64), and a trailer of the offset of the offsets (uint64),
+  the amount of turns (uint32) and INDEX_MAGIC.
+
+Only the known fields of tiles and pieces are kept (those read by tactical_api),
+and the order of tiles is kept only if it changes between turns. Piece IDs are
+kept as strings or integers, as they were given. All the other fields of
+turn_data are kept as JSON.
+"""
+import json
+import mmap
+import struct
+import zlib
+
+import numpy as np
+
+from tactical_api import PIECE_TYPES, PIECE_TYPE_INDEX, TurnContext
+
+MAGIC = b'PYWREC02'
+INDEX_MAGIC = b'PYWIDX01'
+DEFAULT_KEYFRAME_INTERVAL = 32
+"""The default amount of turns between keyframes."""
+
+_BLOCK_HEADER = struct.Struct('<IB')
+_INDEX_TRAILER = struct.Struct('<QI8s')
+_META_LENGTH = struct.Struct('<I')
+_ABSENT = -1
+
+# The columns of a block, in order: (name, dtype, table), where table is one of
+# 'tiles', 'removed', 'order' or 'pieces', and determines the column length.
+_COLUMNS = (
+    ('tile_x', np.int32, 'tiles'),
+    ('tile_y', np.int32, 'tiles'),
+    ('tile_country', np.int32, 'tiles'),
+    ('tile_money', np.int32, 'tiles'),
+    ('tile_piece_count', np.int32, 'tiles'),
+    ('removed_x', np.int32, 'removed'),
+    ('removed_y', np.int32, 'removed'),
+    ('order_x', np.int32, 'order'),
+    ('order_y', np.int32, 'order'),
+    ('piece_type', np.uint8, 'pieces'),
+    ('piece_country', np.int32, 'pieces'),
+    ('piece_in_air', np.int8, 'pieces'),
+    ('piece_time_in_air', np.int32, 'pieces'),
+    ('piece_is_defending', np.int8, 'pieces'),
+    ('piece_money', np.int32, 'pieces'),
+    ('piece_id_length', np.int32, 'pieces'),
+    ('piece_id_is_int', np.int8, 'pieces'),
+)
+
+
+def _optional(value):
+    return _ABSENT if value is None else int(value)
+
+
+class Recorder(object):
+    """Records turns into a file. See the module documentation for the format.
+
+    record_turn() is called with the turn_data of each turn, and
+    record_commands() with its command dicts. TurnContext does both, if it is
+    given a recorder. close() must be called in order to write the index, which
+    the replay uses for seeking.
+    """
+
+    def __init__(self, path, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        super(Recorder, self).__init__()
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._keyframe_interval = keyframe_interval
+        self._offsets = []
+        # The turn waiting for its commands, and the tile dicts (by position) and
+        # tile order of the last written turn.
+        self._pending_turn = None
+        self._pending_commands = []
+        self._previous_tiles = None
+        self._previous_order = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record_turn(self, turn_data):
+        """Records the turn_data of a new turn."""
+        self._flush()
+        self._pending_turn = turn_data
+        self._pending_commands = []
+
+    def record_commands(self, command_dicts):
+        """Records the command dicts of the current turn."""
+        self._pending_commands.extend(command_dicts)
+
+    def close(self):
+        """Writes the last turn and the index, and closes the file."""
+        if self._file is None:
+            return
+        self._flush()
+        self._file.write(INDEX_MAGIC)
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._offsets, dtype='<u8').tobytes())
+        self._file.write(_INDEX_TRAILER.pack(index_offset, len(self._offsets), INDEX_MAGIC))
+        self._file.close()
+        self._file = None
+
+    def _flush(self):
+        if self._pending_turn is None:
+            return
+        turn_data = self._pending_turn
+        self._pending_turn = None
+        keyframe = len(self._offsets) % self._keyframe_interval == 0
+
+        tiles = {}
+        order = []
+        for tile_dict in turn_data['tiles']:
+            position = (tile_dict['coordinate']['x'], tile_dict['coordinate']['y'])
+            tiles[position] = tile_dict
+            order.append(position)
+        if keyframe:
+            changed = order
+            removed = []
+            keep_order = False
+        else:
+            previous_tiles = self._previous_tiles
+            changed = [position for position in order if previous_tiles.get(position) != tiles[position]]
+            removed = [position for position in previous_tiles if position not in tiles]
+            keep_order = order != [position for position in self._previous_order if position in tiles] + \
+                [position for position in order if position not in previous_tiles]
+        self._previous_tiles = tiles
+        self._previous_order = order
+
+        country_names = list(turn_data['all_countries'])
+        country_index = {country: index for index, country in enumerate(country_names)}
+        columns = {name: [] for name, _, _ in _COLUMNS}
+        piece_ids = []
+        for position in changed:
+            tile_dict = tiles[position]
+            columns['tile_x'].append(position[0])
+            columns['tile_y'].append(position[1])
+            columns['tile_country'].append(self._country(tile_dict['country'], country_names, country_index))
+            columns['tile_money'].append(_optional(tile_dict['money']))
+            columns['tile_piece_count'].append(len(tile_dict['pieces']))
+            for piece_dict in tile_dict['pieces']:
+                piece_id = str(piece_dict['id']).encode('utf-8')
+                piece_ids.append(piece_id)
+                columns['piece_id_length'].append(len(piece_id))
+                columns['piece_id_is_int'].append(isinstance(piece_dict['id'], int))
+                columns['piece_type'].append(PIECE_TYPE_INDEX[piece_dict['type']])
+                columns['piece_country'].append(self._country(piece_dict['country'], country_names, country_index))
+                columns['piece_in_air'].append(_optional(piece_dict.get('inAir')))
+                columns['piece_time_in_air'].append(_optional(piece_dict.get('timeInAir')))
+                columns['piece_is_defending'].append(_optional(piece_dict.get('isDefending')))
+                columns['piece_money'].append(_optional(piece_dict.get('money')))
+        for x, y in removed:
+            columns['removed_x'].append(x)
+            columns['removed_y'].append(y)
+        if keep_order:
+            for x, y in order:
+                columns['order_x'].append(x)
+                columns['order_y'].append(y)
+        meta = {
+            'turn_data': {key: value for key, value in turn_data.items() if key != 'tiles'},
+            'countries': country_names,
+            'commands': self._pending_commands,
+            'lengths': {'tiles': len(changed), 'removed': len(removed), 'order': len(order) if keep_order else 0,
+                        'pieces': len(piece_ids)},
+        }
+
+        meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+        parts = [_META_LENGTH.pack(len(meta_bytes)), meta_bytes]
+        for name, dtype, _ in _COLUMNS:
+            parts.append(np.array(columns[name], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+        parts.append(b''.join(piece_ids))
+        block = zlib.compress(b''.join(parts))
+        self._offsets.append(self._file.tell())
+        self._file.write(_BLOCK_HEADER.pack(len(block), keyframe))
+        self._file.write(block)
+
+    @staticmethod
+    def _country(country, country_names, country_index):
+        if country is None:
+            return _ABSENT
+        index = country_index.get(country)
+        if index is None:
+            index = country_index[country] = len(country_names)
+            country_names.append(country)
+        return index
+
+
+class Replay(object):
+    """Reads a recording, by memory-mapping its file.
+
+    Any turn is found in O(1) through the index, and is rebuilt from the last
+    keyframe before it, without parsing any earlier turn. Reading the turns in
+    order decodes each block once. A recording without an index (e.g. of a
+    process that was killed) is scanned once on opening instead.
+    """
+
+    def __init__(self, path):
+        super(Replay, self).__init__()
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError('%s is not a game recording' % path)
+        self._offsets = self._read_index()
+        # The last rebuilt turn, its meta dict, its tile dicts by position and its tile order.
+        self._cached_turn = None
+        self._cached_meta = None
+        self._cached_tiles = None
+        self._cached_order = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _read_index(self):
+        if len(self._map) >= len(MAGIC) + _INDEX_TRAILER.size:
+            index_offset, turns, magic = _INDEX_TRAILER.unpack_from(self._map, len(self._map) - _INDEX_TRAILER.size)
+            if magic == INDEX_MAGIC:
+                return np.frombuffer(self._map, dtype='<u8', count=turns, offset=index_offset).tolist()
+        offsets = []
+        offset = len(MAGIC)
+        while offset + _BLOCK_HEADER.size <= len(self._map):
+            if self._map[offset:offset + len(INDEX_MAGIC)] == INDEX_MAGIC:
+                break
+            length, _ = _BLOCK_HEADER.unpack_from(self._map, offset)
+            if offset + _BLOCK_HEADER.size + length > len(self._map):
+                break
+            offsets.append(offset)
+            offset += _BLOCK_HEADER.size + length
+        return offsets
+
+    def _is_keyframe(self, turn):
+        return _BLOCK_HEADER.unpack_from(self._map, self._offsets[turn])[1]
+
+    def _read_block(self, turn):
+        """Returns the meta dict and the columns of the block of the given turn."""
+        offset = self._offsets[turn]
+        length, _ = _BLOCK_HEADER.unpack_from(self._map, offset)
+        start = offset + _BLOCK_HEADER.size
+        data = zlib.decompress(self._map[start:start + length])
+        meta_length, = _META_LENGTH.unpack_from(data, 0)
+        position = _META_LENGTH.size + meta_length
+        meta = json.loads(data[_META_LENGTH.size:position].decode('utf-8'))
+        columns = {}
+        for name, dtype, table in _COLUMNS:
+            dtype = np.dtype(dtype).newbyteorder('<')
+            count = meta['lengths'][table]
+            columns[name] = np.frombuffer(data, dtype=dtype, count=count, offset=position).tolist()
+            position += count * dtype.itemsize
+        columns['piece_ids'] = data[position:]
+        return meta, columns
+
+    def get_commands(self, turn):
+        """Returns the command dicts recorded for the given turn."""
+        meta, _ = self._read_block(turn)
+        return meta['commands']
+
+    def get_turn_data(self, turn):
+        """Returns the turn_data of the given turn.
+
+        The tile dicts are shared with later calls, and must not be modified.
+        """
+        if turn < 0:
+            turn += len(self)
+        if not 0 <= turn < len(self):
+            raise IndexError('turn %d is not in the recording' % turn)
+        keyframe = turn
+        while keyframe > 0 and not self._is_keyframe(keyframe):
+            keyframe -= 1
+        if self._cached_turn is not None and keyframe <= self._cached_turn <= turn:
+            start = self._cached_turn + 1
+        else:
+            start = keyframe
+            self._cached_tiles = None
+        for current in range(start, turn + 1):
+            self._cached_meta = self._apply_block(current)
+        self._cached_turn = turn
+        turn_data = dict(self._cached_meta['turn_data'])
+        turn_data['tiles'] = [self._cached_tiles[position] for position in self._cached_order]
+        return turn_data
+
+    def get_context(self, turn, logger=None, **kwargs):
+        """Returns a new TurnContext of the given turn."""
+        return TurnContext(self.get_turn_data(turn), logger, **kwargs)
+
+    def _apply_block(self, turn):
+        """Applies the block of the given turn to the cached tiles, and returns its meta dict."""
+        meta, columns = self._read_block(turn)
+        countries = meta['countries']
+        if self._cached_tiles is None:
+            self._cached_tiles = {}
+            self._cached_order = []
+        tiles = self._cached_tiles
+        for position in zip(columns['removed_x'], columns['removed_y']):
+            del tiles[position]
+        piece_ids = columns['piece_ids']
+        piece_index = 0
+        id_offset = 0
+        new_positions = []
+        for x, y, country, money, piece_count in zip(columns['tile_x'], columns['tile_y'], columns['tile_country'],
+                                                     columns['tile_money'], columns['tile_piece_count']):
+            pieces = []
+            for index in range(piece_index, piece_index + piece_count):
+                id_length = columns['piece_id_length'][index]
+                piece_id = piece_ids[id_offset:id_offset + id_length].decode('utf-8')
+                piece_dict = {
+                    'id': int(piece_id) if columns['piece_id_is_int'][index] else piece_id,
+                    'type': PIECE_TYPES[columns['piece_type'][index]],
+                    'country': self._country(columns['piece_country'][index], countries),
+                }
+                id_offset += id_length
+                in_air = columns['piece_in_air'][index]
+                if in_air != _ABSENT:
+                    piece_dict['inAir'] = bool(in_air)
+                time_in_air = columns['piece_time_in_air'][index]
+                if time_in_air != _ABSENT:
+                    piece_dict['timeInAir'] = time_in_air
+                is_defending = columns['piece_is_defending'][index]
+                if is_defending != _ABSENT:
+                    piece_dict['isDefending'] = bool(is_defending)
+                money_value = columns['piece_money'][index]
+                if money_value != _ABSENT:
+                    piece_dict['money'] = money_value
+                pieces.append(piece_dict)
+            piece_index += piece_count
+            position = (x, y)
+            if position not in tiles:
+                new_positions.append(position)
+            tiles[position] = {
+                'coordinate': {'x': x, 'y': y},
+                'country': self._country(country, countries),
+                'money': None if money == _ABSENT else money,
+                'pieces': pieces,
+            }
+        if columns['order_x']:
+            self._cached_order = list(zip(columns['order_x'], columns['order_y']))
+        elif columns['removed_x'] or new_positions:
+            self._cached_order = [position for position in self._cached_order if position in tiles] + new_positions
+        return meta
+
+    @staticmethod
+    def _country(index, countries):
+        return None if index == _ABSENT else countries[index]
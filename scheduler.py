@@ -0,0 +1,130 @@
+import math
+import time
+
+from instrumentation import metrics
+
+DEFAULT_TURN_BUDGET = 0.5
+"""The default amount of seconds a turn may take."""
+
+RAN = 'ran'
+FALLBACK = 'fallback'
+SKIPPED = 'skipped'
+
+
+class _Phase(object):
+    __slots__ = ('name', 'function', 'priority', 'fallback', 'order', 'duration')
+
+    def __init__(self, name, function, priority, fallback, order):
+        self.name = name
+        self.function = function
+        self.priority = priority
+        self.fallback = fallback
+        self.order = order
+        # The amount of seconds the phase took when it last ran, or None.
+        self.duration = None
+
+
+class TurnScheduler(object):
+    """Runs the phases of a turn within a time budget.
+
+    Phases are registered once, and run on every turn by decreasing priority
+    (and by registration order among equal priorities). A phase is called with
+    the arguments given to run(), followed by a dict mapping the names of the
+    phases that have already run in this turn to their results.
+
+    A phase is skipped if the budget is used up, or if the time it took when it
+    last ran is more than the remaining budget. That time is halved whenever the
+    phase is skipped, so slow phases are eventually retried. A skipped phase with
+    a fallback calls it instead, with the same arguments followed by the result
+    of the last time the phase ran (or None), and the fallback's return value is
+    used as the result of the phase in this turn.
+
+    Phases that do incremental (anytime) work may check remaining() or
+    expired(), or iterate with while_time_left(), in order to stop once the
+    budget is used up.
+
+    This class exports the following fields:
+    * budget: The amount of seconds a turn may take, or None if turns are not
+              limited, in which case every phase runs (e.g. for reproducible
+              local games). May be changed between turns.
+    * last_outcomes: A dict mapping the name of each phase to RAN, FALLBACK or
+                     SKIPPED, for the last turn.
+    """
+
+    def __init__(self, budget=DEFAULT_TURN_BUDGET, clock=time.perf_counter):
+        super(TurnScheduler, self).__init__()
+        self.budget = budget
+        self._clock = clock
+        self._phases = []
+        self._previous_results = {}
+        self._deadline = None
+        self._started = False
+        self._stopped = False
+        self.last_outcomes = {}
+
+    def register(self, name, function, priority=0, fallback=None):
+        """Registers a phase. See the class documentation for the arguments of function and fallback."""
+        self._phases.append(_Phase(name, function, priority, fallback, len(self._phases)))
+        self._phases.sort(key=lambda phase: (-phase.priority, phase.order))
+
+    def start_turn(self):
+        """Starts the budget of a new turn. Work done from now on counts towards it."""
+        self._deadline = None if self.budget is None else self._clock() + self.budget
+        self._started = True
+        self._stopped = False
+
+    def remaining(self):
+        """Returns the amount of seconds left in the budget of this turn (possibly negative)."""
+        if self.budget is None:
+            return math.inf
+        if self._deadline is None:
+            return self.budget
+        return self._deadline - self._clock()
+
+    def expired(self):
+        """Returns True iff the budget of this turn is used up."""
+        return self.remaining() <= 0
+
+    def while_time_left(self, iterable):
+        """Yields the items of iterable, until the budget of this turn is used up."""
+        for item in iterable:
+            if self.expired():
+                return
+            yield item
+
+    def stop(self):
+        """Skips the rest of the phases of this turn, without calling their fallbacks."""
+        self._stopped = True
+
+    def run(self, *args):
+        """Runs the phases of this turn, starting the turn unless start_turn() was called.
+
+        Returns the dict mapping the name of each phase to its result.
+        """
+        if not self._started:
+            self.start_turn()
+        results = {}
+        outcomes = {}
+        for phase in self._phases:
+            if self._stopped:
+                outcomes[phase.name] = SKIPPED
+                continue
+            remaining = self.remaining()
+            if remaining > 0 and (phase.duration is None or phase.duration <= remaining):
+                start = self._clock()
+                with metrics.timer('phase.' + phase.name):
+                    results[phase.name] = self._previous_results[phase.name] = phase.function(*args, results)
+                phase.duration = self._clock() - start
+                outcomes[phase.name] = RAN
+                continue
+            if phase.duration is not None:
+                phase.duration /= 2
+            if phase.fallback is not None:
+                results[phase.name] = phase.fallback(*args, self._previous_results.get(phase.name))
+                outcomes[phase.name] = FALLBACK
+            else:
+                outcomes[phase.name] = SKIPPED
+        self.last_outcomes = outcomes
+        self._deadline = None
+        self._started = False
+        return results
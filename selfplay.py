@@ -0,0 +1,176 @@
+"""Plays many local games in parallel, for tuning strategies.
+
+Every game is played on the simulator in a worker process, with a seed of its
+own. Every country has a StrategyState of its own, so no state is shared between
+countries or games. Turns have no time budget, so every phase of every turn
+runs regardless of the machine load. The first country (the challenger) may override module
+constants of simple_tactical and simple_strategic, e.g.
+`--set simple_tactical.BUILD_BUILDER_MONEY=25`, in which case it loads its own
+copies of these modules. The results table compares it with the other countries.
+Usage: `python selfplay.py [--games 100] [--set MODULE.NAME=VALUE ...]`.
+"""
+import argparse
+import ast
+import collections
+import concurrent.futures
+import importlib
+import importlib.util
+import random
+import sys
+import time
+
+import numpy as np
+
+import simulator
+from strategy_state import StrategyState
+from tactical_api import Logger, TurnContext
+
+STRATEGY_MODULES = ('simple_tactical', 'simple_strategic')
+"""The modules whose constants may be overridden, in the order of their imports."""
+
+GameResult = collections.namedtuple('GameResult', ['seed', 'winner', 'turns', 'cpu_times', 'played_turns'])
+"""The result of a single game.
+
+winner is None if nobody won within the turn limit. cpu_times maps each country
+to the CPU seconds of all its turns, and played_turns to the amount of its turns.
+"""
+
+
+def load_strategy(overrides=None):
+    """Returns fresh copies of STRATEGY_MODULES, as a dict mapping their names to them.
+
+    overrides maps 'MODULE.NAME' to a value, which is set on the copy of MODULE
+    before the game starts. The copies are not kept in sys.modules.
+    """
+    modules = {}
+    saved_modules = {name: sys.modules.get(name) for name in STRATEGY_MODULES}
+    try:
+        for name in STRATEGY_MODULES:
+            spec = importlib.util.find_spec(name)
+            module = importlib.util.module_from_spec(spec)
+            # Later modules import the copies of earlier ones.
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+            modules[name] = module
+    finally:
+        for name, module in saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    for key, value in (overrides or {}).items():
+        module_name, _, attribute = key.rpartition('.')
+        if module_name not in modules or not hasattr(modules[module_name], attribute):
+            raise ValueError('unknown strategy setting: %s' % key)
+        setattr(modules[module_name], attribute, value)
+    return modules
+
+
+def _make_player(modules, cpu_times, played_turns, country):
+    strategic_module = modules['simple_strategic']
+    tactical_module = modules['simple_tactical']
+    state = StrategyState(turn_budget=None)
+
+    def player(turn_data):
+        start = time.process_time()
+        context = TurnContext(turn_data, Logger(None))
+        strategic_module.do_turn(tactical_module.get_strategic_implementation(context, state))
+        result = context.get_result()
+        cpu_times[country] += time.process_time() - start
+        played_turns[country] += 1
+        return result
+
+    return player
+
+
+def play_game(seed, width, height, countries, turns, challenger_overrides=None):
+    """Plays a single game with the given seed, and returns its GameResult.
+
+    Every country plays simple_strategic, and the first one uses
+    challenger_overrides (see load_strategy).
+    """
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    game = simulator.Simulator(width, height, countries, seed)
+    cpu_times = {country: 0.0 for country in countries}
+    played_turns = {country: 0 for country in countries}
+    baseline_modules = {name: importlib.import_module(name) for name in STRATEGY_MODULES}
+    challenger_modules = load_strategy(challenger_overrides) if challenger_overrides else baseline_modules
+    players = {country: _make_player(challenger_modules if index == 0 else baseline_modules, cpu_times, played_turns,
+                                     country)
+               for index, country in enumerate(countries)}
+    winner = simulator.play(game, players, turns)
+    return GameResult(seed, winner, game.turn, cpu_times, played_turns)
+
+
+def run_games(games, seed=0, workers=None, width=40, height=30, countries=3, turns=500, challenger_overrides=None):
+    """Plays games games in a pool of worker processes, and returns their GameResults by seed.
+
+    The seed of game i is seed + i, so every game is reproducible with
+    play_game(). workers defaults to the amount of CPUs.
+    """
+    country_names = ['country%d' % index for index in range(countries)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_game, seed + index, width, height, country_names, turns, challenger_overrides)
+                   for index in range(games)]
+        return sorted((future.result() for future in futures), key=lambda result: result.seed)
+
+
+def format_results(results):
+    """Returns a table of the win rate, turns to win and CPU time per turn of each country."""
+    countries = list(results[0].cpu_times)
+    lines = ['%-12s %6s %9s %14s %14s' % ('country', 'wins', 'win rate', 'turns to win', 'CPU ms/turn')]
+    for country in countries:
+        win_turns = [result.turns for result in results if result.winner == country]
+        played_turns = sum(result.played_turns[country] for result in results)
+        cpu_time = sum(result.cpu_times[country] for result in results)
+        lines.append('%-12s %6d %8.1f%% %14s %14.2f' % (
+            country + (' *' if country == countries[0] else ''), len(win_turns), 100.0 * len(win_turns) / len(results),
+            '%.1f' % (sum(win_turns) / len(win_turns)) if win_turns else '-',
+            1000 * cpu_time / played_turns if played_turns else 0))
+    draws = sum(1 for result in results if result.winner is None)
+    lines.append('%-12s %6d %8.1f%%' % ('no winner', draws, 100.0 * draws / len(results)))
+    lines.append('* the challenger')
+    return '\n'.join(lines)
+
+
+def _parse_setting(text):
+    key, separator, value = text.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError('expected MODULE.NAME=VALUE, got %s' % text)
+    try:
+        return key, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        raise argparse.ArgumentTypeError('invalid value: %s' % value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='The amount of worker processes (default: the amount of CPUs).')
+    parser.add_argument('--width', type=int, default=40)
+    parser.add_argument('--height', type=int, default=30)
+    parser.add_argument('--countries', type=int, default=3)
+    parser.add_argument('--turns', type=int, default=500,
+                        help='The maximal amount of turns of a game.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--set', type=_parse_setting, nargs='+', default=[], metavar='MODULE.NAME=VALUE',
+                        help='Module constants of the challenger (the first country).')
+    args = parser.parse_args()
+
+    challenger_overrides = dict(args.set)
+    # Fails early on unknown settings, rather than in every worker.
+    try:
+        load_strategy(challenger_overrides)
+    except ValueError as error:
+        parser.error(str(error))
+    start = time.perf_counter()
+    results = run_games(args.games, args.seed, args.workers, args.width, args.height, args.countries, args.turns,
+                        challenger_overrides)
+    print(format_results(results))
+    print('%d games in %.1f seconds' % (len(results), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
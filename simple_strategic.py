@@ -1,47 +1,85 @@
-import random
+import numpy as np
+
 from simple_tactical import MyStrategicApi
 import common_types
-
-game_turn = 0
-
+from instrumentation import metrics
+from scheduler import TurnScheduler
+import tactical_api
 
 def get_sorted_tiles_for_attack(strategic: MyStrategicApi):
-    unclaimed_tiles = []
-    enemy_tiles = []
-    for x in range(strategic.get_game_width()):
-        for y in range(strategic.get_game_height()):
-            coordinate = common_types.Coordinates(x, y)
-            danger = strategic.estimate_tile_danger(coordinate)
-            if danger == 1:
-                unclaimed_tiles.append(coordinate)
-            elif danger == 2:
-                enemy_tiles.append(coordinate)
-
-    random.shuffle(unclaimed_tiles)
-    random.shuffle(enemy_tiles)
+    enemy_tiles, unclaimed_tiles = get_tiles_for_attack(strategic)
     return enemy_tiles + unclaimed_tiles
 
 
-def do_turn(strategic: MyStrategicApi):
-    global game_turn
-    game_turn += 1
-    strategic.next_turn()
+def get_tiles_for_attack(strategic: MyStrategicApi):
+    """Returns the shuffled lists of enemy tiles and of unclaimed tiles."""
+    board = strategic.context.board
+    unclaimed_tiles = board.owner == tactical_api.NO_OWNER
+    enemy_tiles = ~unclaimed_tiles & ~board.country_mask(strategic.context.my_country)
+    return _shuffled_coordinates(enemy_tiles), _shuffled_coordinates(unclaimed_tiles)
+
+
+def _shuffled_coordinates(mask):
+    ys, xs = np.nonzero(mask)
+    order = np.random.permutation(len(xs))
+    return list(map(common_types.Coordinates, xs[order].tolist(), ys[order].tolist()))
+
+
+def _find_targets(strategic, results):
+    return get_tiles_for_attack(strategic)
+
+
+def _reuse_targets(strategic, previous_targets):
+    """Attacks the targets of the previous turn which are not ours yet, if there is no time to find new ones."""
+    if previous_targets is None:
+        return [], []
+    mine = strategic.context.board.country_mask(strategic.context.my_country).tolist()
+    return tuple([tile for tile in tiles if not mine[tile.y][tile.x]] for tiles in previous_targets)
 
-    tiles_for_attack = get_sorted_tiles_for_attack(strategic)
-    if len(tiles_for_attack) == 0:
+
+def _attack_targets(strategic, results):
+    enemy_tiles, unclaimed_tiles = results['targets']
+    if len(enemy_tiles) + len(unclaimed_tiles) == 0:
+        strategic.state.scheduler.stop()
         return
-    attacking_pieces = strategic.report_attacking_pieces()
-    tile_index = 0
-    for piece, command_id in attacking_pieces.items():
-        if piece.type == 'tank':
-            if command_id is not None:
-                continue
-            strategic.attack(piece, tiles_for_attack[tile_index], 1)
-            tile_index += 1
-            if tile_index >= len(tiles_for_attack):
-                break
-        elif piece.type == 'antitank':
-            strategic.anti_tank_wander(piece.id)
-    for piece in strategic.context.my_pieces.values():
-        if piece.type == "builder":
-            strategic.move_builder_to_destination(piece)
+    idle_tanks = [piece for piece, command_id in strategic.report_attacking_pieces().items()
+                  if piece.type == 'tank' and command_id is None]
+    # Unclaimed tiles cost more than crossing the whole board, so enemy tiles are
+    # always attacked first.
+    unclaimed_tile_cost = strategic.get_game_width() + strategic.get_game_height()
+    strategic.assign_attacks(idle_tanks, enemy_tiles + unclaimed_tiles, 1,
+                             [0] * len(enemy_tiles) + [unclaimed_tile_cost] * len(unclaimed_tiles))
+
+
+def _move_builders(strategic, results):
+    builders = strategic.context.my_pieces_by_type['builder'].values()
+    for piece in strategic.state.scheduler.while_time_left(builders):
+        strategic.move_builder_to_destination(piece)
+
+
+def _wander_antitanks(strategic, results):
+    antitanks = strategic.context.my_pieces_by_type['antitank']
+    for antitank_id in strategic.state.scheduler.while_time_left(antitanks):
+        strategic.anti_tank_wander(antitank_id)
+
+
+def make_scheduler(budget):
+    """Returns a new TurnScheduler of the phases of a turn, with the given budget (see TurnScheduler)."""
+    scheduler = TurnScheduler(budget)
+    scheduler.register('targets', _find_targets, 3, _reuse_targets)
+    scheduler.register('attacks', _attack_targets, 2)
+    scheduler.register('builders', _move_builders, 1)
+    scheduler.register('antitanks', _wander_antitanks, 0)
+    return scheduler
+
+
+def do_turn(strategic: MyStrategicApi):
+    state = strategic.state
+    if state.scheduler is None:
+        state.scheduler = make_scheduler(state.turn_budget)
+    state.scheduler.budget = state.turn_budget
+    with metrics.timer('do_turn'):
+        state.scheduler.start_turn()
+        strategic.next_turn()
+        state.scheduler.run(strategic)
+        state.end_turn()
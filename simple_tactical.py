@@ -1,129 +1,179 @@
+from collections import Counter
+import hashlib
+
+import numpy as np
+
+import assignment
 import common_types
-from strategic_api import CommandStatus, StrategicApi, StrategicPiece
+from instrumentation import metrics
+import pathfinding
+from strategic_api import MemoizingStrategicApi, StrategicPiece, memoize_per_turn
+from strategy_state import StrategyState
 import tactical_api
 import random
 
-tank_to_coordinate_to_attack = {}
-tank_to_attacking_command = {}
-commands = []
-builder_next_piece = {}
-builder_defending_artillery = {}
-following_unit = {}
-
-
-def move_piece_to_destination(piece, dest):
-    """Returns False if the piece is in destination."""
-    piece_coordinate = piece.tile.coordinates
-
-    if random.random() < 0.5:
-        if dest.x < piece_coordinate.x:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x - 1, piece_coordinate.y)
-        elif dest.x > piece_coordinate.x:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x + 1, piece_coordinate.y)
-        elif dest.y < piece_coordinate.y:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x, piece_coordinate.y - 1)
-        elif dest.y > piece_coordinate.y:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x, piece_coordinate.y + 1)
-        else:
-            return False
-    else:
-        if dest.y > piece_coordinate.y:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x, piece_coordinate.y + 1)
-        elif dest.y < piece_coordinate.y:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x, piece_coordinate.y - 1)
-        elif dest.x > piece_coordinate.x:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x + 1, piece_coordinate.y)
-        elif dest.x < piece_coordinate.x:
-            new_coordinate = common_types.Coordinates(piece_coordinate.x - 1, piece_coordinate.y)
-        else:
-            return False
+BUILD_BUILDER_MONEY = 20
+"""The money a builder needs in order to build its first piece, a builder."""
+BUILD_ARMY_MONEY = 8
+"""The money a builder needs in order to build each of its next pieces, an artillery and then tanks."""
+MAX_INTELLIGENCE_AGE = 5
+"""The amount of turns after which what is known about a tile out of sight is missing intelligence."""
+MAX_ATTACK_DELAY = 10
+"""The amount of turns an attacking tank may fall behind its estimate before its attack fails."""
+MIN_SHARED_TARGET_TANKS = 2
+"""The amount of tanks attacking the same target, from which they share a distance field to it."""
+
+default_state = StrategyState()
+"""The state of strategies created without one. May be replaced, e.g. by strategy_state.restore()."""
+
+
+def move_piece_to_destination(strategic, piece, dest):
+    """Returns False if the piece is in destination, or can not reach it."""
+    new_coordinate = strategic.next_step(piece, dest)
+    if new_coordinate is None:
+        return False
     piece.move(new_coordinate)
     return True
 
 
-def move_tank_to_destination(tank, dest):
-    """Returns True if the tank's mission is complete."""
-    command_id = tank_to_attacking_command[tank.id]
-    if dest is None:
-        commands[int(command_id)] = CommandStatus.failed(command_id)
+def move_tank_to_destination(strategic, tank, command_id):
+    """Moves the tank towards the destination of its attack command, and attacks it.
+
+    The attack fails if the destination can not be reached, or if the tank is
+    more than MAX_ATTACK_DELAY turns behind the estimate of the command, e.g.
+    since it keeps going back and forth next to an enemy.
+    """
+    registry = strategic.state.registry
+    destination = registry.get_target(command_id)
+    if (common_types.distance(tank.tile.coordinates, destination) >
+            registry.get_status(command_id).estimated_turns + MAX_ATTACK_DELAY):
+        registry.fail(command_id)
         return
-    tank_coordinate = tank.tile.coordinates
-    if dest.x < tank_coordinate.x:
-        new_coordinate = common_types.Coordinates(tank_coordinate.x - 1, tank_coordinate.y)
-    elif dest.x > tank_coordinate.x:
-        new_coordinate = common_types.Coordinates(tank_coordinate.x + 1, tank_coordinate.y)
-    elif dest.y < tank_coordinate.y:
-        new_coordinate = common_types.Coordinates(tank_coordinate.x, tank_coordinate.y - 1)
-    elif dest.y > tank_coordinate.y:
-        new_coordinate = common_types.Coordinates(tank_coordinate.x, tank_coordinate.y + 1)
-    else:
+    new_coordinate = strategic.next_step(tank, destination)
+    if new_coordinate is None:
+        if tank.tile.coordinates != destination:
+            # The destination can not be reached.
+            registry.fail(command_id)
+            return
         tank.attack()
-        commands[int(command_id)] = CommandStatus.success(command_id)
-        del tank_to_attacking_command[tank.id]
-        return True
+        registry.succeed(command_id)
+        return
     tank.move(new_coordinate)
-    prev_command = commands[int(command_id)]
-    commands[int(command_id)] = CommandStatus.in_progress(command_id,
-                                                          prev_command.elapsed_turns + 1,
-                                                          prev_command.estimated_turns - 1)
-    return False
-
-
-class MyStrategicApi(StrategicApi):
-    def __init__(self, *args, **kwargs):
-        super(MyStrategicApi, self).__init__(*args, **kwargs)
-        to_remove = set()
-        for tank_id, destination in tank_to_coordinate_to_attack.items():
-            tank = self.context.my_pieces.get(tank_id)
-            if tank is None:
-                to_remove.add(tank_id)
-                continue
-            if move_tank_to_destination(tank, destination):
-                to_remove.add(tank_id)
-        for tank_id in to_remove:
-            del tank_to_coordinate_to_attack[tank_id]
+    registry.progress(command_id)
+
+
+class MyStrategicApi(MemoizingStrategicApi):
+    """A strategy whose state across turns is kept in a StrategyState.
+
+    state defaults to default_state, which is shared by all the strategies
+    created without a state.
+    """
+
+    def __init__(self, context, state=None):
+        with metrics.timer('strategic_init'):
+            super(MyStrategicApi, self).__init__(context)
+            self.state = default_state if state is None else state
+            # The targets of attacks that are shared by at least MIN_SHARED_TARGET_TANKS
+            # tanks, as of the last next_turn().
+            self._shared_targets = frozenset()
+            self._new_turn()
+
+    def _new_turn(self):
+        self._path_cost_version = None
+        self._threat_map_updated = False
+        self._world_model_board_version = None
+        self._board_danger = None
+        self._board_danger_version = None
+
+    def next_turn(self):
+        """Starts the turn: updates the command statuses and moves the attacking tanks.
+
+        Commands of pieces that are gone fail, see CommandRegistry.next_turn.
+        Tanks attacking the same target move along a shared distance field to it,
+        instead of searching a path each (see next_step).
+        """
+        with metrics.timer('next_turn'):
+            self.state.next_turn()
+            registry = self.state.registry
+            registry.next_turn(self.context.my_pieces)
+            attack_commands = registry.get_piece_commands('attack')
+            target_counts = Counter(registry.get_target(command_id) for command_id in attack_commands.values())
+            self._shared_targets = frozenset(target for target, count in target_counts.items()
+                                             if count >= MIN_SHARED_TARGET_TANKS)
+            self.state.distance_fields.retain(lambda name: name[0] != 'attack' or name[1] in self._shared_targets)
+            for tank_id, command_id in attack_commands.items():
+                move_tank_to_destination(self, self.context.my_pieces[tank_id], command_id)
+
+    def tile_cost(self, x, y):
+        """Returns the cost of moving into the tile at (x, y), for path finding."""
+        return 1 + int(self.estimate_board_danger()[y, x])
+
+    def next_step(self, piece, destination):
+        """Returns the next tile on a cheapest path of piece to destination.
+
+        None is returned if the piece is already in destination, or if it can not
+        reach it. Paths are cached across turns, and are kept as long as the tile
+        dangers along them do not grow too much (see pathfinding.PathFinder).
+        Destinations shared by several attacking tanks are reached through a
+        distance field instead (see get_attack_field).
+        """
+        if destination in self._shared_targets:
+            return self.get_attack_field(destination).next_step(piece.tile.coordinates)
+        self._sync_turn()
+        if self._path_cost_version is None:
+            danger = self.estimate_board_danger()
+            self._path_cost_version = (danger.shape, hashlib.blake2b(danger.tobytes(), digest_size=16).digest())
+        return self.state.path_finder.next_step(piece.tile.coordinates, destination, self.context.game_width,
+                                                self.context.game_height, self.tile_cost, self._path_cost_version)
 
     def get_piece_by_id(self, piece_id):
-        for piece in self.context.all_pieces:
-            if piece.id == piece_id:
-                return piece
-        return None
+        return self.context.all_pieces.get(piece_id)
 
     def attack(self, piece, destination, radius):
         tank = self.context.my_pieces[piece.id]
         if not tank or tank.type != 'tank':
             return None
 
-        if piece.id in tank_to_attacking_command:
-            old_command_id = int(tank_to_attacking_command[piece.id])
-            commands[old_command_id] = CommandStatus.failed(old_command_id)
+        return self.state.registry.issue('attack', piece.id, common_types.distance(tank.tile.coordinates, destination),
+                                         destination)
+
+    def report_attack_command_status(self, command_id):
+        return self.state.registry.get_status(command_id)
 
-        command_id = str(len(commands))
-        attacking_command = CommandStatus.in_progress(command_id, 0,
-                                                      common_types.distance(tank.tile.coordinates, destination))
-        tank_to_coordinate_to_attack[piece.id] = destination
-        tank_to_attacking_command[piece.id] = command_id
-        commands.append(attacking_command)
+    def assign_attacks(self, pieces, targets, radius=1, target_costs=None):
+        """Attacks the given targets with the given pieces, minimizing the total distance.
 
-        return command_id
+        pieces is a sequence of `StrategicPiece`s and targets is a sequence of
+        `Coordinates`. Each piece attacks at most one target and vice versa, such
+        that the total distance is minimal (see assignment.assign_targets).
+        target_costs optionally adds a cost to each target.
+
+        Returns a dict mapping each piece that was given a target to its command ID.
+        """
+        pieces = list(pieces)
+        positions = [self.context.my_pieces[piece.id].tile.coordinates for piece in pieces]
+        return {pieces[piece_index]: self.attack(pieces[piece_index], targets[target_index], radius)
+                for piece_index, target_index in assignment.assign_targets(positions, targets, target_costs)}
 
     def move_builder_to_destination(self, builder):
         """Returns True if the tank's mission is complete."""
+        builder_next_piece = self.state.builder_next_piece
+        builder_defending_artillery = self.state.builder_defending_artillery
         if builder.id not in builder_next_piece:
             builder_next_piece[builder.id] = 0
-        if builder_next_piece[builder.id] == 0 and builder.money >= 20:
+        if builder_next_piece[builder.id] == 0 and builder.money >= BUILD_BUILDER_MONEY:
             builder.build_builder()
             builder_next_piece[builder.id] += 1
             return
-        if builder_next_piece[builder.id] == 1 and builder.money >= 8:
+        if builder_next_piece[builder.id] == 1 and builder.money >= BUILD_ARMY_MONEY:
             builder.build_artillery()
-            for piece in self.context.get_sightings(builder.id):
+            for piece in self.context.get_sighings_of_piece(builder.id):
                 if piece.type == "artillery" and piece.tile.coordinates == builder.tile.coordinates:
                     builder_defending_artillery[builder.id] = piece.id
                     break
             builder_next_piece[builder.id] += 1
             return
-        elif builder_next_piece[builder.id] > 1 and builder.money >= 8:
+        elif builder_next_piece[builder.id] > 1 and builder.money >= BUILD_ARMY_MONEY:
             builder.build_tank()
             return
 
@@ -132,9 +182,14 @@ class MyStrategicApi(StrategicApi):
             artillery = self.get_piece_by_id(builder_defending_artillery[builder.id])
             if artillery is None:
                 del builder_defending_artillery[builder.id]
-        if builder.tile.money > 0 and builder.tile.country == self.context.my_country:
+        if (builder.tile.money or 0) > 0 and builder.tile.country == self.context.my_country:
             builder.collect_money(min(builder.tile.money, 5))
-        else:
+            return
+
+        # Head to the closest tile of ours with money, or wander around if there is
+        # none.
+        destination = self.get_money_field().next_step(builder.tile.coordinates)
+        if destination is None:
             locations = [
                 common_types.Coordinates(builder.tile.coordinates.x - 1, builder.tile.coordinates.y),
                 common_types.Coordinates(builder.tile.coordinates.x + 1, builder.tile.coordinates.y),
@@ -147,53 +202,133 @@ class MyStrategicApi(StrategicApi):
             ]
             if len(locations) == 0:
                 return
-            random.shuffle(locations)
-            for loc in locations:
-                if self.context.tiles[loc].money > 0:
-                    if artillery:
-                        artillery.move(builder.tile.coordinates)
-                    builder.move(loc)
-                    return
-
-            if artillery:
-                artillery.move(builder.tile.coordinates)
-            builder.move(locations[0])
-
-    def closest_of_type(self, coord, piece_type):
-        pieces = [piece for piece in self.context.my_pieces.values() if piece.type == piece_type]
-        sorted_pieces = sorted(pieces, key=lambda piece: tactical_api.distance(piece.tile.coordinates, coord))
-        return sorted_pieces
+            destination = random.choice(locations)
+        if artillery:
+            artillery.move(builder.tile.coordinates)
+        builder.move(destination)
+
+    @memoize_per_turn()
+    def get_money_field(self):
+        """Returns the distance field to our tiles with money, through our tiles only.
+
+        The field is built once per turn, and shared by all the builders.
+        """
+        board = self.context.board
+        my_tiles = board.country_mask(self.context.my_country)
+        costs = np.where(my_tiles, 1, pathfinding.IMPASSABLE).astype(np.int32)
+        return self.state.distance_fields.get(('my money',), costs, my_tiles & (board.money > 0))
+
+    @memoize_per_turn()
+    def get_tile_costs(self):
+        """Returns a (height, width) array of the cost of entering every tile, as in tile_cost, for distance fields."""
+        return 1 + np.maximum(self.estimate_board_danger(), 0)
+
+    @memoize_per_turn()
+    def get_attack_field(self, target):
+        """Returns the distance field to target, with the costs of get_tile_costs.
+
+        The field is kept across turns, and is updated incrementally for as long as
+        target is shared by several attacking tanks.
+        """
+        board = self.context.board
+        targets = np.zeros((board.height, board.width), dtype=bool)
+        targets[target.y, target.x] = True
+        return self.state.distance_fields.get(('attack', target), self.get_tile_costs(), targets)
+
+    @memoize_per_turn()
+    def closest_of_type(self, coord, piece_type, k=None):
+        """Returns a tuple of our pieces of the given type, closest to coord first."""
+        return tuple(self.context.get_closest_pieces(coord, k, piece_type, self.context.my_country))
 
     def follow_piece(self, following_id, id_to_follow):
-        following_unit[following_id] = id_to_follow
+        self.state.following_unit[following_id] = id_to_follow
         if id_to_follow:
-            return move_piece_to_destination(self.context.my_pieces[following_id],
+            return move_piece_to_destination(self, self.context.my_pieces[following_id],
                                              self.context.my_pieces[id_to_follow].tile.coordinates)
 
     def is_border_tile(self, tile):
-        if tile not in self.context.get_tiles_of_country(self.context.my_country):
-            return False
-        elif self.context.tiles[(tile.coordinates.x + 1, tile.coordinates.y)].country != self.context.my_country or \
-                self.context.tiles[(tile.coordinates.x, tile.coordinates.y + 1)].country != self.context.my_country or \
-                self.context.tiles[(tile.coordinates.x - 1, tile.coordinates.y)].country != self.context.my_country or \
-                self.context.tiles[(tile.coordinates.x, tile.coordinates.y - 1)].country != self.context.my_country:
-            return True
-        else:
-            return False
+        return tile.coordinates in self.context.get_frontier_of_country(self.context.my_country)
 
     def anti_tank_wander(self, antitank_id):
-        my_tiles = self.context.get_tiles_of_country(self.context.my_country)
-        border_tiles = [tile for tile in my_tiles if self.is_border_tile(tile)]
-        return move_piece_to_destination(antitank_id, random.choice(border_tiles).coordinates)
+        border_tiles = self.context.get_frontier_of_country(self.context.my_country)
+        if len(border_tiles) == 0:
+            return False
+        return move_piece_to_destination(self, self.context.my_pieces[antitank_id],
+                                         random.choice(tuple(border_tiles)))
 
+    @memoize_per_turn()
     def estimate_tile_danger(self, destination):
-        tile = self.context.tiles[(destination.x, destination.y)]
-        if tile.country == self.context.my_country:
-            return 0
-        elif tile.country is None:
-            return 1
-        else:  # Enemy country
-            return 2
+        return int(self.estimate_board_danger()[destination.y, destination.x])
+
+    def estimate_board_danger(self):
+        """Returns a (height, width) array of estimate_tile_danger of every tile.
+
+        The danger of a tile is 0 if it is ours, 1 if it is not owned and 2 if it
+        is an enemy's, plus the threat of the enemy pieces around it (see
+        threat.ThreatMap), unless it was overridden by set_intelligence_for_attacks
+        or set_intelligence_for_defends. Tiles out of sight are judged by what was
+        last known about them (see world_model.WorldModel).
+
+        The array is computed once, and is recomputed only if the board, the world
+        model or the threat map change. It must not be modified.
+        """
+        board = self.context.board
+        world = self.get_world_model()
+        threats = self.get_threat_map()
+        version = (board.version, world.version, threats.version)
+        if self._board_danger is None or self._board_danger_version != version:
+            danger = np.full(world.owner.shape, 2, dtype=np.int32)  # Enemy country
+            danger[world.owner == tactical_api.NO_OWNER] = 1
+            danger[board.country_mask(self.context.my_country)] = 0
+            danger += threats.threat
+            for (x, y), tile_danger in threats.overrides.items():
+                if 0 <= x < board.width and 0 <= y < board.height:
+                    danger[y, x] = tile_danger
+            self._board_danger = danger
+            self._board_danger_version = version
+        return self._board_danger
+
+    def get_world_model(self):
+        """Returns the world model, updated with what is known in this turn."""
+        self._sync_turn()
+        world = self.state.world_model
+        board_version = self.context.board.version
+        if self._world_model_board_version != board_version:
+            world.update(self.context, self.state.turn)
+            self._world_model_board_version = board_version
+        return world
+
+    def get_threat_map(self):
+        """Returns the threat map, updated with the last known enemy pieces."""
+        self._sync_turn()
+        threat_map = self.state.threat_map
+        if not self._threat_map_updated:
+            enemies = set(self.context.all_countries) - {self.context.my_country}
+            pieces = {piece_id: piece for piece_id, piece in self.get_world_model().get_pieces(enemies).items()
+                      if piece[2] in threat_map.piece_types}
+            threat_map.update(self.context.game_width, self.context.game_height, pieces)
+            self._threat_map_updated = True
+        return threat_map
+
+    def report_missing_intelligence_for_pending_attacks(self):
+        """Returns the targets of pending attacks not seen in the last MAX_INTELLIGENCE_AGE turns."""
+        world = self.get_world_model()
+        registry = self.state.registry
+        targets = {registry.get_target(command_id) for command_id in registry.get_piece_commands('attack').values()}
+        return {target for target in targets
+                if world.get_age(target) is None or world.get_age(target) > MAX_INTELLIGENCE_AGE}
+
+    def set_intelligence_for_attacks(self, tiles):
+        for coordinates, danger in tiles.items():
+            self.state.threat_map.set_override(coordinates, danger)
+        self.clear_memos()
+        self._path_cost_version = None
+
+    def set_intelligence_for_defends(self, tiles):
+        for coordinates, danger in tiles.items():
+            self.state.threat_map.set_override(coordinates, danger)
+        self.clear_memos()
+        self._path_cost_version = None
 
     def get_game_height(self):
         return self.context.game_height
@@ -202,10 +337,9 @@ class MyStrategicApi(StrategicApi):
         return self.context.game_width
 
     def report_attacking_pieces(self):
-        return {StrategicPiece(piece_id, piece.type): tank_to_attacking_command.get(piece_id)
-                for piece_id, piece in self.context.my_pieces.items()
-                if piece.type == 'tank'}
+        return {StrategicPiece(piece_id, piece.type): self.state.registry.get_piece_command(piece_id)
+                for piece_id, piece in self.context.my_pieces_by_type['tank'].items()}
 
 
-def get_strategic_implementation(context):
-    return MyStrategicApi(context)
+def get_strategic_implementation(context, state=None):
+    return MyStrategicApi(context, state)
@@ -0,0 +1,447 @@
+"""A local, headless stand-in for the game server.
+
+The real game rules are not part of this repository, so the rules below are an
+approximation, tuned by the constants of this module. The simulator applies the
+command dicts of TurnContext.get_result(), and produces the turn_data of every
+country, with fog of war based on the sighting ranges of its pieces.
+"""
+import random
+
+import numpy as np
+
+import constants
+
+# The assumed format of the command dicts of TurnContext.get_result(), as
+# produced by the to_dict() of the commands module. Everything that depends on
+# this format is in this block and in _parse_command().
+TYPE_KEY = 'type'
+PIECE_ID_KEY = 'pieceId'
+DESTINATION_KEY = 'destination'
+AMOUNT_KEY = 'amount'
+PIECE_TYPE_KEY = 'pieceType'
+MOVE = 'move'
+TAKE_OFF = 'takeOff'
+LAND = 'land'
+MELEE_ATTACK = 'attack'
+REMOTE_ATTACK = 'remoteAttack'
+TURN_ON_PROTECTION = 'turnOnProtection'
+TURN_OFF_PROTECTION = 'turnOffProtection'
+TAKE_MONEY = 'takeMoney'
+THROW_MONEY = 'throwMoney'
+BUILD = 'build'
+
+PIECE_COSTS = {
+    'tank': 8,
+    'airplane': 20,
+    'artillery': 8,
+    'helicopter': 16,
+    'antitank': 10,
+    'irondome': 30,
+    'bunker': 10,
+    'spy': 10,
+    'tower': 12,
+    'satellite': 30,
+    'builder': 20,
+}
+"""The amount of money a builder needs for building a piece of each type."""
+
+MOVE_RANGES = {
+    'tank': 1,
+    'airplane': 3,
+    'artillery': 1,
+    'helicopter': 2,
+    'antitank': 1,
+    'irondome': 1,
+    'spy': 2,
+    'builder': 1,
+}
+"""The maximal L1 distance of a move, per piece type. Other types can not move.
+
+Flying pieces can only move while in the air.
+"""
+
+FLYING_TYPES = ('airplane', 'helicopter')
+MAX_TIME_IN_AIR = {'airplane': 10, 'helicopter': 15}
+"""The amount of turns a flying piece may stay in the air, after which it crashes."""
+
+ARTILLERY_RANGE = 3
+HELICOPTER_RANGE = 2
+IRON_DOME_RANGE = 3
+"""Remote attacks on tiles within this L1 distance from a defending iron dome fail."""
+
+START_TERRITORY_RADIUS = 3
+START_PIECES = {'builder': 2, 'tank': 2}
+START_BUILDER_MONEY = 20
+MONEY_FRACTION = 0.3
+MAX_TILE_MONEY = 10
+
+
+def _sighting_range(piece_type):
+    if piece_type == 'tower':
+        return constants.TOWER_SIGHTING_RANGE
+    if piece_type == 'satellite':
+        return constants.SATELLITE_SIGHTING_RANGE
+    return 1
+
+
+def _parse_command(command_dict):
+    """Returns the (type, piece ID, argument) of a command dict.
+
+    The argument is the destination (x, y), the amount or the piece type of the
+    command, or None.
+    """
+    destination = command_dict.get(DESTINATION_KEY)
+    if destination is not None:
+        argument = (destination['x'], destination['y'])
+    elif AMOUNT_KEY in command_dict:
+        argument = command_dict[AMOUNT_KEY]
+    else:
+        argument = command_dict.get(PIECE_TYPE_KEY)
+    return command_dict[TYPE_KEY], command_dict[PIECE_ID_KEY], argument
+
+
+class _Piece(object):
+    __slots__ = ('id', 'type', 'country', 'x', 'y', 'in_air', 'time_in_air', 'is_defending', 'money')
+
+    def __init__(self, piece_id, piece_type, country, x, y):
+        self.id = piece_id
+        self.type = piece_type
+        self.country = country
+        self.x = x
+        self.y = y
+        self.in_air = False
+        self.time_in_air = 0
+        self.is_defending = False
+        self.money = 0
+
+    def to_dict(self):
+        piece_dict = {'id': self.id, 'type': self.type, 'country': self.country}
+        if self.type in FLYING_TYPES:
+            piece_dict['inAir'] = self.in_air
+            if self.in_air:
+                piece_dict['timeInAir'] = self.time_in_air
+        elif self.type == 'irondome':
+            piece_dict['isDefending'] = self.is_defending
+        elif self.type == 'builder':
+            piece_dict['money'] = self.money
+        return piece_dict
+
+
+class Simulator(object):
+    """A local game between the given countries.
+
+    Every turn, get_turn_data() returns the turn_data of a country, and
+    set_commands() takes the command dicts it returns. step() then applies the
+    commands of all the countries, in phases: protection and flight changes,
+    money, builds, moves, remote attacks and melee attacks. Only the last command
+    of each piece in a turn is applied, and invalid commands are ignored.
+
+    The ownership of all the tiles is known to every country. The money and the
+    pieces of a tile are only known to countries that own it, or that have a
+    piece within sighting range of it.
+
+    This class exports the following fields:
+    * width, height, countries: The board size and the names of the countries.
+    * turn: The number of turns played so far.
+    * owner: A (height, width) array of the index of the country owning each tile
+             in countries, or -1.
+    * money: A (height, width) array of the money in each tile.
+    * pieces: A dict mapping piece IDs to the pieces in the game.
+    * ignored_commands: The amount of invalid commands ignored so far.
+    """
+
+    def __init__(self, width, height, countries, seed=0):
+        super(Simulator, self).__init__()
+        self.width = width
+        self.height = height
+        self.countries = list(countries)
+        self.turn = 0
+        self.ignored_commands = 0
+        self._rng = random.Random(seed)
+        self._country_index = {country: index for index, country in enumerate(self.countries)}
+        self._next_piece_id = 0
+        self._commands = {}
+
+        self.owner = np.full((height, width), -1, dtype=np.int16)
+        money = np.array([self._rng.randrange(MAX_TILE_MONEY) + 1 if self._rng.random() < MONEY_FRACTION else 0
+                          for _ in range(width * height)], dtype=np.int32)
+        self.money = money.reshape((height, width))
+        self.pieces = {}
+        # Maps (x, y) to the list of the pieces in the tile.
+        self._tile_pieces = {}
+        # Maps (x, y) to the (owner, tile dict) sent for the tile while not visible.
+        self._hidden_tile_dicts = {}
+
+        ys, xs = np.mgrid[0:height, 0:width]
+        for index, country in enumerate(self.countries):
+            center_x = (2 * index + 1) * width // (2 * len(self.countries))
+            center_y = height // 2
+            territory = np.abs(xs - center_x) + np.abs(ys - center_y) <= START_TERRITORY_RADIUS
+            self.owner[territory & (self.owner == -1)] = index
+            for piece_type, amount in START_PIECES.items():
+                for _ in range(amount):
+                    piece = self._add_piece(piece_type, country, center_x, center_y)
+                    if piece_type == 'builder':
+                        piece.money = START_BUILDER_MONEY
+
+    def _add_piece(self, piece_type, country, x, y):
+        piece = _Piece(str(self._next_piece_id), piece_type, country, x, y)
+        self._next_piece_id += 1
+        self.pieces[piece.id] = piece
+        self._tile_pieces.setdefault((x, y), []).append(piece)
+        return piece
+
+    def _remove_piece(self, piece):
+        del self.pieces[piece.id]
+        self._tile_pieces[(piece.x, piece.y)].remove(piece)
+
+    def _move_piece(self, piece, x, y):
+        self._tile_pieces[(piece.x, piece.y)].remove(piece)
+        piece.x = x
+        piece.y = y
+        self._tile_pieces.setdefault((x, y), []).append(piece)
+
+    def is_alive(self, country):
+        """Returns True iff the country owns any tile or piece."""
+        index = self._country_index[country]
+        return bool((self.owner == index).any()) or any(piece.country == country for piece in self.pieces.values())
+
+    def get_winner(self):
+        """Returns the only country still alive, or None."""
+        alive = [country for country in self.countries if self.is_alive(country)]
+        return alive[0] if len(alive) == 1 else None
+
+    def get_visibility(self, country):
+        """Returns a (height, width) boolean array of the tiles visible to the country."""
+        visible = self.owner == self._country_index[country]
+        ranges = {}
+        for piece in self.pieces.values():
+            if piece.country == country:
+                ranges.setdefault(_sighting_range(piece.type), []).append((piece.y, piece.x))
+        for sighting_range, positions in ranges.items():
+            seen = np.zeros_like(visible)
+            seen[tuple(zip(*positions))] = True
+            # Grows the seen tiles by one tile in every direction, sighting_range
+            # times, which covers every tile within that L1 distance.
+            for _ in range(sighting_range):
+                grown = seen.copy()
+                grown[1:, :] |= seen[:-1, :]
+                grown[:-1, :] |= seen[1:, :]
+                grown[:, 1:] |= seen[:, :-1]
+                grown[:, :-1] |= seen[:, 1:]
+                seen = grown
+            visible |= seen
+        return visible
+
+    def get_turn_data(self, country):
+        """Returns the turn_data of the country for the current turn."""
+        visible = self.get_visibility(country)
+        owner = self.owner.tolist()
+        money = self.money.tolist()
+        visible = visible.tolist()
+        countries = self.countries
+        tiles = []
+        for y in range(self.height):
+            for x in range(self.width):
+                tile_owner = owner[y][x]
+                if visible[y][x]:
+                    tiles.append({
+                        'coordinate': {'x': x, 'y': y},
+                        'country': countries[tile_owner] if tile_owner >= 0 else None,
+                        'money': money[y][x],
+                        'pieces': [piece.to_dict() for piece in self._tile_pieces.get((x, y), ())],
+                    })
+                    continue
+                hidden = self._hidden_tile_dicts.get((x, y))
+                if hidden is None or hidden[0] != tile_owner:
+                    hidden = self._hidden_tile_dicts[(x, y)] = (tile_owner, {
+                        'coordinate': {'x': x, 'y': y},
+                        'country': countries[tile_owner] if tile_owner >= 0 else None,
+                        'money': None,
+                        'pieces': [],
+                    })
+                tiles.append(hidden[1])
+        return {
+            'width': self.width,
+            'height': self.height,
+            'country': country,
+            'all_countries': list(self.countries),
+            'tiles': tiles,
+        }
+
+    def set_commands(self, country, command_dicts):
+        """Sets the commands of the country for the current turn."""
+        self._commands[country] = list(command_dicts)
+
+    def step(self):
+        """Applies the commands of all the countries, and advances to the next turn."""
+        # Maps a command type to the list of (piece, argument) of its commands.
+        commands = {}
+        for country, command_dicts in self._commands.items():
+            last_commands = {}
+            for command_dict in command_dicts:
+                command_type, piece_id, argument = _parse_command(command_dict)
+                piece = self.pieces.get(piece_id)
+                if piece is None or piece.country != country:
+                    self.ignored_commands += 1
+                    continue
+                if piece_id in last_commands:
+                    self.ignored_commands += 1
+                last_commands[piece_id] = (command_type, piece, argument)
+            for command_type, piece, argument in last_commands.values():
+                commands.setdefault(command_type, []).append((piece, argument))
+        self._commands = {}
+
+        for command_type, apply in ((TURN_ON_PROTECTION, self._turn_on_protection),
+                                    (TURN_OFF_PROTECTION, self._turn_off_protection),
+                                    (TAKE_OFF, self._take_off),
+                                    (LAND, self._land),
+                                    (TAKE_MONEY, self._take_money),
+                                    (THROW_MONEY, self._throw_money),
+                                    (BUILD, self._build),
+                                    (MOVE, self._move),
+                                    (REMOTE_ATTACK, self._remote_attack),
+                                    (MELEE_ATTACK, self._melee_attack)):
+            for piece, argument in commands.pop(command_type, ()):
+                if piece.id not in self.pieces or not apply(piece, argument):
+                    self.ignored_commands += 1
+        for pieces in commands.values():
+            self.ignored_commands += len(pieces)
+
+        for piece in list(self.pieces.values()):
+            if piece.in_air:
+                piece.time_in_air += 1
+                if piece.time_in_air > MAX_TIME_IN_AIR[piece.type]:
+                    self._remove_piece(piece)
+        self.turn += 1
+
+    def _owns(self, piece):
+        return self.owner[piece.y, piece.x] == self._country_index[piece.country]
+
+    def _turn_on_protection(self, piece, argument):
+        if piece.type != 'irondome':
+            return False
+        piece.is_defending = True
+        return True
+
+    def _turn_off_protection(self, piece, argument):
+        if piece.type != 'irondome':
+            return False
+        piece.is_defending = False
+        return True
+
+    def _take_off(self, piece, argument):
+        if piece.type not in FLYING_TYPES:
+            return False
+        if not piece.in_air:
+            piece.in_air = True
+            piece.time_in_air = 0
+        return True
+
+    def _land(self, piece, argument):
+        if piece.type not in FLYING_TYPES:
+            return False
+        piece.in_air = False
+        piece.time_in_air = 0
+        return True
+
+    def _take_money(self, piece, amount):
+        if piece.type != 'builder' or not self._owns(piece) or amount < 0:
+            return False
+        amount = min(amount, int(self.money[piece.y, piece.x]))
+        self.money[piece.y, piece.x] -= amount
+        piece.money += amount
+        return True
+
+    def _throw_money(self, piece, amount):
+        if piece.type != 'builder' or amount < 0:
+            return False
+        amount = min(amount, piece.money)
+        self.money[piece.y, piece.x] += amount
+        piece.money -= amount
+        return True
+
+    def _build(self, piece, piece_type):
+        cost = PIECE_COSTS.get(piece_type)
+        if piece.type != 'builder' or cost is None or piece.money < cost or not self._owns(piece):
+            return False
+        piece.money -= cost
+        self._add_piece(piece_type, piece.country, piece.x, piece.y)
+        return True
+
+    def _move(self, piece, destination):
+        x, y = destination
+        move_range = MOVE_RANGES.get(piece.type, 0)
+        if piece.type in FLYING_TYPES and not piece.in_air:
+            move_range = 0
+        if not (0 <= x < self.width and 0 <= y < self.height and
+                0 < abs(x - piece.x) + abs(y - piece.y) <= move_range):
+            return False
+        self._move_piece(piece, x, y)
+        return True
+
+    def _is_protected(self, country, x, y):
+        """Returns True iff a defending iron dome of the country protects the tile in (x, y)."""
+        for piece in self.pieces.values():
+            if (piece.type == 'irondome' and piece.is_defending and piece.country == country and
+                    abs(piece.x - x) + abs(piece.y - y) <= IRON_DOME_RANGE):
+                return True
+        return False
+
+    def _remote_attack(self, piece, destination):
+        x, y = destination
+        if piece.type == 'artillery':
+            attack_range = ARTILLERY_RANGE
+        elif piece.type == 'helicopter' and piece.in_air:
+            attack_range = HELICOPTER_RANGE
+        else:
+            return False
+        if not (0 <= x < self.width and 0 <= y < self.height and abs(x - piece.x) + abs(y - piece.y) <= attack_range):
+            return False
+        targets = [target for target in self._tile_pieces.get((x, y), ())
+                   if target.country != piece.country and not target.in_air]
+        # Bunkers shelter all the pieces of their tile.
+        if any(target.type == 'bunker' for target in targets):
+            return True
+        for target in targets:
+            if not self._is_protected(target.country, x, y):
+                self._remove_piece(target)
+        return True
+
+    def _melee_attack(self, piece, argument):
+        if piece.type == 'airplane':
+            if not piece.in_air:
+                return False
+            for target in list(self._tile_pieces.get((piece.x, piece.y), ())):
+                if target.country != piece.country and not target.in_air:
+                    self._remove_piece(target)
+            return True
+        if piece.type != 'tank':
+            return False
+        tile_pieces = self._tile_pieces.get((piece.x, piece.y), ())
+        enemies = [target for target in tile_pieces if target.country != piece.country and not target.in_air]
+        # Antitanks destroy attacking tanks.
+        if any(target.type == 'antitank' for target in enemies):
+            self._remove_piece(piece)
+            return True
+        for target in enemies:
+            self._remove_piece(target)
+        self.owner[piece.y, piece.x] = self._country_index[piece.country]
+        return True
+
+
+def play(simulator, players, turns):
+    """Plays turns turns, or until there is a winner, and returns the winner or None.
+
+    players maps each country to a function, called with the turn_data of the
+    country and returning its list of command dicts.
+    """
+    for _ in range(turns):
+        for country, player in players.items():
+            if simulator.is_alive(country):
+                simulator.set_commands(country, player(simulator.get_turn_data(country)))
+        simulator.step()
+        winner = simulator.get_winner()
+        if winner is not None:
+            return winner
+    return None
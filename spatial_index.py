@@ -0,0 +1,120 @@
+import heapq
+
+DEFAULT_CELL_SIZE = 8
+"""The default width and height (in tiles) of the buckets of a PieceIndex."""
+
+
+class PieceIndex(object):
+    """A spatial index of pieces, for L1 (Manhattan) distance queries.
+
+    Pieces are bucketed into square cells of cell_size x cell_size tiles, so
+    queries only visit the cells that may contain matching pieces.
+
+    entries is an iterable of (piece_id, x, y, piece_type, country) tuples. All
+    queries return piece IDs, and accept optional piece_type and country filters.
+    """
+
+    def __init__(self, entries, cell_size=DEFAULT_CELL_SIZE):
+        super(PieceIndex, self).__init__()
+        self._cell_size = cell_size
+        self._cells = {}
+        self._size = 0
+        for entry in entries:
+            _, x, y, _, _ = entry
+            self._cells.setdefault((x // cell_size, y // cell_size), []).append(entry)
+            self._size += 1
+        if self._cells:
+            cell_xs, cell_ys = zip(*self._cells)
+            self._min_cell = (min(cell_xs), min(cell_ys))
+            self._max_cell = (max(cell_xs), max(cell_ys))
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _matches(entry, piece_type, country):
+        return (piece_type is None or entry[3] == piece_type) and (country is None or entry[4] == country)
+
+    def _entries_in_cells(self, min_cell_x, min_cell_y, max_cell_x, max_cell_y):
+        for cell_x in range(min_cell_x, max_cell_x + 1):
+            for cell_y in range(min_cell_y, max_cell_y + 1):
+                yield from self._cells.get((cell_x, cell_y), ())
+
+    def within_radius(self, center, radius, piece_type=None, country=None):
+        """Returns the IDs of the pieces whose L1 distance from center is at most radius."""
+        cell_size = self._cell_size
+        result = []
+        for entry in self._entries_in_cells((center.x - radius) // cell_size, (center.y - radius) // cell_size,
+                                            (center.x + radius) // cell_size, (center.y + radius) // cell_size):
+            if (abs(entry[1] - center.x) + abs(entry[2] - center.y) <= radius and
+                    self._matches(entry, piece_type, country)):
+                result.append(entry[0])
+        return result
+
+    def in_rectangle(self, min_corner, max_corner, piece_type=None, country=None):
+        """Returns the IDs of the pieces inside the given rectangle.
+
+        min_corner and max_corner are Coordinates, and both are inclusive.
+        """
+        cell_size = self._cell_size
+        result = []
+        for entry in self._entries_in_cells(min_corner.x // cell_size, min_corner.y // cell_size,
+                                            max_corner.x // cell_size, max_corner.y // cell_size):
+            if (min_corner.x <= entry[1] <= max_corner.x and min_corner.y <= entry[2] <= max_corner.y and
+                    self._matches(entry, piece_type, country)):
+                result.append(entry[0])
+        return result
+
+    def nearest(self, center, k=None, piece_type=None, country=None):
+        """Returns the IDs of the k pieces closest to center, sorted by L1 distance.
+
+        If k is None, all the matching pieces are returned.
+        """
+        if not self._cells or k == 0:
+            return []
+        if k is None:
+            k = self._size
+        cell_size = self._cell_size
+        center_cell_x = center.x // cell_size
+        center_cell_y = center.y // cell_size
+        max_ring = max(abs(center_cell_x - self._min_cell[0]), abs(center_cell_x - self._max_cell[0]),
+                       abs(center_cell_y - self._min_cell[1]), abs(center_cell_y - self._max_cell[1]))
+        # A max-heap (by negated distance) of the best k candidates found so far.
+        best = []
+        for ring in range(max_ring + 1):
+            # Any tile in this ring is at least (ring - 1) * cell_size + 1 tiles away.
+            if len(best) == k and ring > 0 and -best[0][0] <= (ring - 1) * cell_size:
+                break
+            for cell in self._ring_cells(center_cell_x, center_cell_y, ring):
+                for entry in self._cells.get(cell, ()):
+                    if not self._matches(entry, piece_type, country):
+                        continue
+                    item = (-(abs(entry[1] - center.x) + abs(entry[2] - center.y)), entry[0])
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item[0] > best[0][0]:
+                        heapq.heapreplace(best, item)
+        return [piece_id for _, piece_id in sorted(best, key=lambda item: -item[0])]
+
+    @staticmethod
+    def _ring_cells(center_x, center_y, ring):
+        if ring == 0:
+            yield (center_x, center_y)
+            return
+        for cell_x in range(center_x - ring, center_x + ring + 1):
+            yield (cell_x, center_y - ring)
+            yield (cell_x, center_y + ring)
+        for cell_y in range(center_y - ring + 1, center_y + ring):
+            yield (center_x - ring, cell_y)
+            yield (center_x + ring, cell_y)
+
+
+def build_piece_index(piece_dicts, piece_positions, cell_size=DEFAULT_CELL_SIZE):
+    """Builds a PieceIndex from raw piece dicts and the (x, y) of their tiles.
+
+    Both piece_dicts and piece_positions are dicts keyed by piece ID.
+    """
+    return PieceIndex(((piece_id, piece_positions[piece_id][0], piece_positions[piece_id][1],
+                        piece_dict['type'], piece_dict['country'])
+                       for piece_id, piece_dict in piece_dicts.items()),
+                      cell_size)
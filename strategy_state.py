@@ -0,0 +1,132 @@
+"""The state a strategy keeps across turns, and its snapshots."""
+import os
+import pickle
+import tempfile
+
+import command_registry
+import pathfinding
+import scheduler
+import threat
+import world_model
+
+DEFAULT_SNAPSHOT_INTERVAL = 10
+"""The default amount of turns between snapshots."""
+
+
+class StrategyState(object):
+    """All the state of a strategy (see simple_tactical.MyStrategicApi) across turns.
+
+    A state can be saved into a compact binary snapshot and restored from it, so
+    a bot that restarts in the middle of a game resumes its in-flight commands.
+    Snapshots leave out the caches, which are rebuilt on demand. next_turn() and
+    end_turn() must be called at the start and at the end of every turn.
+
+    This class exports the following fields:
+    * turn: The number of the current turn, counting calls to next_turn().
+    * registry: The CommandRegistry of the commands given to pieces.
+    * builder_next_piece: Maps a builder ID to the amount of pieces it has built.
+    * builder_defending_artillery: Maps a builder ID to the ID of the artillery
+                                   that defends it.
+    * following_unit: Maps a piece ID to the ID of the piece it follows.
+    * threat_map: The threat.ThreatMap of the enemy pieces.
+    * world_model: The world_model.WorldModel of the last known board.
+    * path_finder: A pathfinding.PathFinder (a cache).
+    * distance_fields: A pathfinding.DistanceFieldService (a cache).
+    * scheduler: The scheduler.TurnScheduler of the turns, or None if it was not
+                 set yet. It is not snapshotted, and must be set again after a
+                 restore.
+    * turn_budget: The amount of seconds a turn may take (see
+                   scheduler.TurnScheduler.budget), or None if turns are not
+                   limited. It should be derived from the turn timeout of the
+                   server, and is turned off in local games.
+    """
+
+    _TRANSIENT_FIELDS = ('path_finder', 'distance_fields', 'scheduler')
+
+    def __init__(self, turn_budget=scheduler.DEFAULT_TURN_BUDGET):
+        super(StrategyState, self).__init__()
+        self.turn = 0
+        self.turn_budget = turn_budget
+        self.registry = command_registry.CommandRegistry()
+        self.builder_next_piece = {}
+        self.builder_defending_artillery = {}
+        self.following_unit = {}
+        self.threat_map = threat.ThreatMap()
+        self.world_model = world_model.WorldModel()
+        self._new_transient_fields()
+        self._snapshot_path = None
+        self._snapshot_interval = None
+
+    def _new_transient_fields(self):
+        self.path_finder = pathfinding.PathFinder()
+        self.distance_fields = pathfinding.DistanceFieldService()
+        self.scheduler = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._TRANSIENT_FIELDS:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._new_transient_fields()
+
+    def next_turn(self):
+        """Starts a new turn."""
+        self.turn += 1
+
+    def end_turn(self):
+        """Ends the current turn, and saves a snapshot if one is due (see enable_snapshots)."""
+        if self._snapshot_path is not None and self.turn % self._snapshot_interval == 0:
+            self.save(self._snapshot_path)
+
+    def enable_snapshots(self, path, interval=DEFAULT_SNAPSHOT_INTERVAL):
+        """Saves a snapshot into path every interval turns, from now on."""
+        self._snapshot_path = path
+        self._snapshot_interval = interval
+
+    def dumps(self):
+        """Returns a snapshot of this state, as bytes."""
+        return pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(snapshot):
+        """Returns the StrategyState of a snapshot returned by dumps()."""
+        state = pickle.loads(snapshot)
+        if not isinstance(state, StrategyState):
+            raise ValueError('not a strategy state snapshot')
+        return state
+
+    def save(self, path):
+        """Saves a snapshot of this state into path.
+
+        The snapshot is written into a temporary file, which then replaces path,
+        so path always holds a complete snapshot, even if the bot crashes.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+        try:
+            with os.fdopen(descriptor, 'wb') as temporary_file:
+                temporary_file.write(self.dumps())
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    @staticmethod
+    def load(path):
+        """Returns the StrategyState saved into path by save()."""
+        with open(path, 'rb') as snapshot_file:
+            return StrategyState.loads(snapshot_file.read())
+
+
+def restore(path, interval=DEFAULT_SNAPSHOT_INTERVAL):
+    """Returns the StrategyState saved into path, or a new one if there is none.
+
+    Either way, the returned state saves its snapshots into path every interval
+    turns.
+    """
+    state = StrategyState.load(path) if os.path.exists(path) else StrategyState()
+    state.enable_snapshots(path, interval)
+    return state
@@ -1,437 +1,1245 @@
-from collections import namedtuple
-import json
-import http.client
-from urllib.parse import urlparse
-
-import commands
-from common_types import Coordinates
-import constants
-
-def distance(a, b):
-    """Calculates the distance between the coordinates a and b."""
-    return abs(a.x - b.x) + abs(a.y - b.y)
-
-
-class BasePiece(object):
-    """Base class for game pieces.
-
-    This class exports the following fields:
-    * id: Piece ID, as assigned by the server.
-    * tile: The tile object of which this piece has been in, before this turn
-            began.
-    * type: Piece type (as a string).
-    * country: The name of the country of which this piece belongs to.
-    """
-
-    def __init__(self, context, tile, piece_dict):
-        super(BasePiece, self).__init__()
-        self._context = context
-        self.tile = tile
-        self.id = piece_dict['id']
-        self.type = piece_dict['type']
-        self.country = piece_dict['country']
-
-    def move(self, destination):
-        """Moves this piece to the destination tile.
-
-        destination is expected to have a type of either Coordinates or Tile.
-        """
-        if isinstance(destination, Tile):
-            destination = destination.coordinates
-        assert isinstance(destination, Coordinates)
-        self._context._commands.append(commands.MoveCommand(self.id, destination))
-
-
-class FlyingPiece(BasePiece):
-    """Base class for flying pieces.
-
-    This class exports the following fields:
-    * in_air: A boolean indicating weather this piece is currently flying (True)
-              or on the ground (False).
-    * time_in_air: An integer counting the amount of turns of which this piece
-                   has been flying, or None if this piece is on the ground.
-
-    See BasePiece for more fields.
-    """
-
-    def __init__(self, context, tile, piece_dict):
-        super(FlyingPiece, self).__init__(context, tile, piece_dict)
-        self.in_air = piece_dict['inAir']
-        self.time_in_air = piece_dict.get('timeInAir', None)
-
-    def take_off(self):
-        """Take off this piece.
-
-        If this piece is already in the air, this is a no-op.
-        """
-        self._context._commands.append(commands.TakeOffCommand(self.id))
-
-    def land(self):
-        """Land this piece.
-
-        If this piece is already on the ground, this is a no-op.
-        """
-        self._context._commands.append(commands.LandCommand(self.id))
-
-
-class Tank(BasePiece):
-    """Represents a game tank.
-
-    The value of its type field is "tank".
-
-    This class does not expose any fields, except those exposed by BasePiece.
-    """
-
-    def attack(self):
-        """Attacks the current game tile."""
-        self._context._commands.append(commands.MeleeAttackCommand(self.id))
-
-
-class Airplane(FlyingPiece):
-    """Represents a game airplane.
-
-    The value of its type field is "airplane".
-
-    This class does not expose any fields, except those exposed by BasePiece and
-    FlyingPiece.
-    """
-
-    def attack(self):
-        """Attacks the current game tile."""
-        self._context._commands.append(commands.MeleeAttackCommand(self.id))
-
-
-class Artillery(BasePiece):
-    """Represents a game artillery.
-
-    The value of its type field is "artillery".
-
-    This class does not expose any fields, except for those exposed by BasePiece.
-    """
-
-    def attack(self, destination):
-        """Attacks the destination using this artillery.
-
-        destination is expected to have a type of either Coordinates or Tile.
-        """
-        if isinstance(destination, Tile):
-            destination = destination.coordinates
-        assert isinstance(destination, Coordinates)
-        self._context._commands.append(commands.RemoteAttackCommand(self.id, destination))
-
-
-class Helicopter(FlyingPiece):
-    """Represents a game helicopter.
-
-    The value of its type field is "helicopter".
-
-    This class does not expose any fields, except those exposed by BasePiece and
-    FlyingPiece.
-    """
-
-    def attack(self, destination):
-        """Attacks the destination using this helicopter.
-
-        destination is expected to have a type of either Coordinates or Tile.
-        """
-        if isinstance(destination, Tile):
-            destination = destination.coordinates
-        assert isinstance(destination, Coordinates)
-        self._context._commands.append(commands.RemoteAttackCommand(self.id, destination))
-
-
-class Antitank(BasePiece):
-    """Represents a game anti-tank.
-
-    The value of its type field is "antitank".
-
-    This class does not expose any fields, except those exposed by BasePiece.
-    """
-    pass
-
-
-class IronDome(BasePiece):
-    """Represents a game iron dome.
-
-    This class exports the following fields:
-    * id_defending: Set to True if and only if the protection of this iron dome
-                    has been active before this turn began.
-
-    The value of its type field is "irondome".
-
-    Please refer to BasePiece for information about other exposed fields.
-    """
-
-    def __init__(self, context, tile, piece_dict):
-        super(IronDome, self).__init__(context, tile, piece_dict)
-        self.is_defending = piece_dict['isDefending']
-
-    def turn_on_protection(self):
-        """Turns on this iron dome protection."""
-        self._context._commands.append(commands.TurnOnProtection(self.id))
-
-    def turn_off_protection(self):
-        """Turns off this iron dome protection."""
-        self._context._commands.append(commands.TurnOffProtection(self.id))
-
-
-class Bunker(BasePiece):
-    """Represents a game bunker.
-
-    The value of its type field is "bunker".
-
-    This class does not expose any fields, except those exposed by BasePiece.
-    """
-    pass
-
-
-class Spy(BasePiece):
-    """Represents a game spy.
-
-    The value of its type field is "spy".
-
-    This class does not expose any fields, except those exposed by BasePiece.
-    """
-    pass
-
-
-class Tower(BasePiece):
-    """Represents a game tower.
-
-    The value of its type field is "tower".
-
-    This class does not expose any fields, except those exposed by BasePiece.
-    """
-    pass
-
-
-class Satellite(BasePiece):
-    """Represents a game satellite.
-
-    The value of its type field is "satellite".
-
-    This class does not expose any fields, except those exposed by BasePiece.
-    """
-    pass
-
-
-class Builder(BasePiece):
-    """Represents a game builder.
-
-    This class exposes the following fields:
-    * money: The amount of money this builder has, before this turn began.
-
-    The value of its type field is "builder".
-
-    Please refer to BasePiece for information about other exposed fields.
-    """
-
-    def __init__(self, context, tile, piece_dict):
-        super(Builder, self).__init__(context, tile, piece_dict)
-        self.money = piece_dict['money']
-
-    def collect_money(self, amount):
-        """Collects a certain amount of money from the current Tile."""
-        self._context._commands.append(commands.TakeMoneyCommand(self.id, amount))
-
-    def throw_money(self, amount):
-        """Throws a certain amount of money to the current Tile."""
-        self._context._commands.append(commands.ThrowMoneyCommand(self.id, amount))
-
-    def build_tank(self):
-        """Builds a new tank piece in the current tile."""
-        self._build('tank')
-
-    def build_airplane(self):
-        """Builds a new airplane piece in the current tile."""
-        self._build('airplane')
-
-    def build_artillery(self):
-        """Builds a new artillery piece in the current tile."""
-        self._build('artillery')
-
-    def build_helicopter(self):
-        """Builds a new helicopter piece in the current tile."""
-        self._build('helicopter')
-
-    def build_antitank(self):
-        """Builds a new anti-tank piece in the current tile."""
-        self._build('antitank')
-
-    def build_iron_dome(self):
-        """Builds a new iron dome piece in the current tile."""
-        self._build('irondome')
-
-    def build_bunker(self):
-        """Builds a new bunker piece in the current tile."""
-        self._build('bunker')
-
-    def build_spy(self):
-        """Builds a new spy piece in the current tile."""
-        self._build('spy')
-
-    def build_tower(self):
-        """Builds a new tower piece in the current tile."""
-        self._build('tower')
-
-    def build_satellite(self):
-        """Builds a new satellite piece in the current tile."""
-        self._build('satellite')
-
-    def build_builder(self):
-        """Builds a new builder piece in the current tile."""
-        self._build('builder')
-
-    def _build(self, piece_type):
-        self._context._commands.append(commands.BuildPieceCommand(self.id, piece_type))
-
-
-TYPE_TO_CLASS = {
-    'tank': Tank,
-    'airplane': Airplane,
-    'artillery': Artillery,
-    'helicopter': Helicopter,
-    'antitank': Antitank,
-    'irondome': IronDome,
-    'bunker': Bunker,
-    'spy': Spy,
-    'tower': Tower,
-    'satellite': Satellite,
-    'builder': Builder,
-}
-
-
-def _load_piece(context, tile, piece_dict):
-    return TYPE_TO_CLASS[piece_dict['type']](context, tile, piece_dict)
-
-
-class Tile(object):
-    """A land unit in the game.
-
-    This class exports the following fields:
-    * coordinates: The coordinates of this tile.
-    * money: The amount of money in this tile before the turn started, or None if
-             this amount is unknown to the current country.
-    * country: The name of the country owning this tile, or None if this tile is
-               not owned by any country.
-    * pieces: A list of pieces on this tile.
-    Note that the information here may be incomplete, depending on the visibility
-    of the current country on this tile.
-    """
-
-    def __init__(self, context, tile_dict):
-        super(Tile, self).__init__()
-        self.coordinates = Coordinates(**tile_dict['coordinate'])
-        self.money = tile_dict['money']
-        self.country = tile_dict['country']
-        self.pieces = [_load_piece(context, self, piece_dict) for piece_dict in tile_dict['pieces']]
-
-
-class TurnContext(object):
-    """Contains all the context of this turn.
-
-    Some useful fields:
-    * tiles: Maps coordinates (int, int) to a Tile object.
-    * my_pieces: Maps piece IDs to the actual piece, for pieces owned by our
-                 country.
-    * all_pieces: Same as my_pieces, but for all pieces known by this country.
-    * game_width: The width of the game.
-    * game_height: The height of the game.
-    * my_country: The name of my country.
-    * all_countries: The names of all countries in the game.
-    """
-
-    def __init__(self, turn_data, logger):
-        super(TurnContext, self).__init__()
-        self._turn_data = turn_data
-        self._logger = logger
-        self._commands = []
-        self.tiles = {(tile['coordinate']['x'], tile['coordinate']['y']): Tile(self, tile)
-                      for tile in turn_data['tiles']}
-        self.my_pieces = {}
-        self.all_pieces = {}
-        self.game_width = turn_data['width']
-        self.game_height = turn_data['height']
-        self.my_country = turn_data['country']
-        self.all_countries = turn_data['all_countries']
-        for tile in self.tiles.values():
-            for piece in tile.pieces:
-                if piece.country == self.my_country:
-                    self.my_pieces[piece.id] = piece
-                self.all_pieces[piece.id] = piece
-
-    def get_tiles_of_country(self, country_name):
-        """Returns the set of tile coordinates owned by the given country name.
-
-        If country_name is None, the returned coordinates are of tiles that do not
-        belong to any country.
-        """
-        return {tile.coordinates for tile in self.tiles.values()
-                if tile.country == country_name}
-
-    def get_sighings_of_piece(self, piece_id):
-        """Returns the sightings of the given piece.
-
-        This method returns a set of sighted pieces and their locations, as seen by
-        the given piece.
-
-        Note that the given piece MUST belong to my country in order for this
-        method to work.
-        """
-        piece = self.my_pieces[piece_id]
-        if isinstance(piece, Tower):
-            sighting_distance = constants.TOWER_SIGHTING_RANGE
-        elif isinstance(piece, Satellite):
-            sighting_distance = constants.SATELLITE_SIGHTING_RANGE
-        else:
-            sighting_distance = 1
-        result = set()
-        piece_coordinates = piece.tile.coordinates
-        for x in range(piece_coordinates.x - sighting_distance, piece_coordinates.x + sighting_distance):
-            for y in range(piece_coordinates.y + sighting_distance, piece_coordinates.y + sighting_distance):
-                tile = self.tiles.get((x, y))
-                if tile is None or distance(piece_coordinates, tile.coordinates) > sighting_distance:
-                    continue
-                result.update(tile.pieces)
-        return result
-
-    def get_commands_of_piece(self, piece_id):
-        """Returns the list of ordered commands given to the given piece.
-
-        Note that if the piece did not receive any command in this turn, or is not
-        owned by my country, or does not exist, an empty list is returned.
-        """
-        return [command for command in self._commands
-                if command.piece_id == piece_id]
-
-    def log(self, log_entry):
-        """Logs the given log entry to the main log of this country.
-
-        log_entry is expected to be a string, without a trailing new line character.
-        """
-        self._logger.log(log_entry)
-
-    def get_result(self):
-        return [command.to_dict() for command in self._commands]
-
-
-class Logger(object):
-    """Utility for logging stuff."""
-
-    TIMEOUT = 10
-    REQUEST_HEADERS = {
-        'Content-type': 'application/json'
-    }
-
-    def __init__(self, url):
-        self._parsed_url = urlparse(url) if url is not None else None
-
-    def log(self, log_entry):
-        """Logs the provided log entry.
-
-        log_entry is expected to be a string, without a trailing new line character.
-        """
-        if self._parsed_url is None:
-            return
-        conn = http.client.HTTPConnection(self._parsed_url.hostname, self._parsed_url.port, timeout=Logger.TIMEOUT)
-        conn.request('POST', self._parsed_url.path, json.dumps({'data': log_entry}), Logger.REQUEST_HEADERS)
\ No newline at end of file
+from collections import deque, namedtuple
+from collections.abc import Mapping
+import json
+import http.client
+import select
+import threading
+import time
+from types import MappingProxyType
+from urllib.parse import urlparse
+import weakref
+
+import numpy as np
+
+import commands
+from common_types import Coordinates
+import constants
+from instrumentation import metrics
+import spatial_index
+
+def distance(a, b):
+    """Calculates the distance between the coordinates a and b."""
+    return abs(a.x - b.x) + abs(a.y - b.y)
+
+
+class BasePiece(object):
+    """Base class for game pieces.
+
+    This class exports the following fields:
+    * id: Piece ID, as assigned by the server.
+    * tile: The tile object of which this piece has been in, before this turn
+            began.
+    * type: Piece type (as a string).
+    * country: The name of the country of which this piece belongs to.
+    """
+
+    __slots__ = ('_context', 'tile', 'id', 'type', 'country')
+
+    def __init__(self, context, tile, piece_dict):
+        super(BasePiece, self).__init__()
+        self._context = context
+        self.id = piece_dict['id']
+        self.type = piece_dict['type']
+        self._update(tile, piece_dict)
+
+    def _update(self, tile, piece_dict):
+        """Updates the fields of this piece from a newer piece dict."""
+        self.tile = tile
+        self.country = piece_dict['country']
+
+    def move(self, destination):
+        """Moves this piece to the destination tile.
+
+        destination is expected to have a type of either Coordinates or Tile.
+        """
+        if isinstance(destination, Tile):
+            destination = destination.coordinates
+        assert isinstance(destination, Coordinates)
+        self._context._commands.append(commands.MoveCommand(self.id, destination))
+
+
+class FlyingPiece(BasePiece):
+    """Base class for flying pieces.
+
+    This class exports the following fields:
+    * in_air: A boolean indicating weather this piece is currently flying (True)
+              or on the ground (False).
+    * time_in_air: An integer counting the amount of turns of which this piece
+                   has been flying, or None if this piece is on the ground.
+
+    See BasePiece for more fields.
+    """
+
+    __slots__ = ('in_air', 'time_in_air')
+
+    def _update(self, tile, piece_dict):
+        super(FlyingPiece, self)._update(tile, piece_dict)
+        self.in_air = piece_dict['inAir']
+        self.time_in_air = piece_dict.get('timeInAir', None)
+
+    def take_off(self):
+        """Take off this piece.
+
+        If this piece is already in the air, this is a no-op.
+        """
+        self._context._commands.append(commands.TakeOffCommand(self.id), self.in_air)
+
+    def land(self):
+        """Land this piece.
+
+        If this piece is already on the ground, this is a no-op.
+        """
+        self._context._commands.append(commands.LandCommand(self.id), self.in_air)
+
+
+class Tank(BasePiece):
+    """Represents a game tank.
+
+    The value of its type field is "tank".
+
+    This class does not expose any fields, except those exposed by BasePiece.
+    """
+
+    __slots__ = ()
+
+    def attack(self):
+        """Attacks the current game tile."""
+        self._context._commands.append(commands.MeleeAttackCommand(self.id))
+
+
+class Airplane(FlyingPiece):
+    """Represents a game airplane.
+
+    The value of its type field is "airplane".
+
+    This class does not expose any fields, except those exposed by BasePiece and
+    FlyingPiece.
+    """
+
+    __slots__ = ()
+
+    def attack(self):
+        """Attacks the current game tile."""
+        self._context._commands.append(commands.MeleeAttackCommand(self.id))
+
+
+class Artillery(BasePiece):
+    """Represents a game artillery.
+
+    The value of its type field is "artillery".
+
+    This class does not expose any fields, except for those exposed by BasePiece.
+    """
+
+    __slots__ = ()
+
+    def attack(self, destination):
+        """Attacks the destination using this artillery.
+
+        destination is expected to have a type of either Coordinates or Tile.
+        """
+        if isinstance(destination, Tile):
+            destination = destination.coordinates
+        assert isinstance(destination, Coordinates)
+        self._context._commands.append(commands.RemoteAttackCommand(self.id, destination))
+
+
+class Helicopter(FlyingPiece):
+    """Represents a game helicopter.
+
+    The value of its type field is "helicopter".
+
+    This class does not expose any fields, except those exposed by BasePiece and
+    FlyingPiece.
+    """
+
+    __slots__ = ()
+
+    def attack(self, destination):
+        """Attacks the destination using this helicopter.
+
+        destination is expected to have a type of either Coordinates or Tile.
+        """
+        if isinstance(destination, Tile):
+            destination = destination.coordinates
+        assert isinstance(destination, Coordinates)
+        self._context._commands.append(commands.RemoteAttackCommand(self.id, destination))
+
+
+class Antitank(BasePiece):
+    """Represents a game anti-tank.
+
+    The value of its type field is "antitank".
+
+    This class does not expose any fields, except those exposed by BasePiece.
+    """
+
+    __slots__ = ()
+
+
+class IronDome(BasePiece):
+    """Represents a game iron dome.
+
+    This class exports the following fields:
+    * id_defending: Set to True if and only if the protection of this iron dome
+                    has been active before this turn began.
+
+    The value of its type field is "irondome".
+
+    Please refer to BasePiece for information about other exposed fields.
+    """
+
+    __slots__ = ('is_defending',)
+
+    def _update(self, tile, piece_dict):
+        super(IronDome, self)._update(tile, piece_dict)
+        self.is_defending = piece_dict['isDefending']
+
+    def turn_on_protection(self):
+        """Turns on this iron dome protection."""
+        self._context._commands.append(commands.TurnOnProtection(self.id))
+
+    def turn_off_protection(self):
+        """Turns off this iron dome protection."""
+        self._context._commands.append(commands.TurnOffProtection(self.id))
+
+
+class Bunker(BasePiece):
+    """Represents a game bunker.
+
+    The value of its type field is "bunker".
+
+    This class does not expose any fields, except those exposed by BasePiece.
+    """
+
+    __slots__ = ()
+
+
+class Spy(BasePiece):
+    """Represents a game spy.
+
+    The value of its type field is "spy".
+
+    This class does not expose any fields, except those exposed by BasePiece.
+    """
+
+    __slots__ = ()
+
+
+class Tower(BasePiece):
+    """Represents a game tower.
+
+    The value of its type field is "tower".
+
+    This class does not expose any fields, except those exposed by BasePiece.
+    """
+
+    __slots__ = ()
+
+
+class Satellite(BasePiece):
+    """Represents a game satellite.
+
+    The value of its type field is "satellite".
+
+    This class does not expose any fields, except those exposed by BasePiece.
+    """
+
+    __slots__ = ()
+
+
+class Builder(BasePiece):
+    """Represents a game builder.
+
+    This class exposes the following fields:
+    * money: The amount of money this builder has, before this turn began.
+
+    The value of its type field is "builder".
+
+    Please refer to BasePiece for information about other exposed fields.
+    """
+
+    __slots__ = ('money',)
+
+    def _update(self, tile, piece_dict):
+        super(Builder, self)._update(tile, piece_dict)
+        self.money = piece_dict['money']
+
+    def collect_money(self, amount):
+        """Collects a certain amount of money from the current Tile."""
+        self._context._commands.append(commands.TakeMoneyCommand(self.id, amount))
+
+    def throw_money(self, amount):
+        """Throws a certain amount of money to the current Tile."""
+        self._context._commands.append(commands.ThrowMoneyCommand(self.id, amount))
+
+    def build_tank(self):
+        """Builds a new tank piece in the current tile."""
+        self._build('tank')
+
+    def build_airplane(self):
+        """Builds a new airplane piece in the current tile."""
+        self._build('airplane')
+
+    def build_artillery(self):
+        """Builds a new artillery piece in the current tile."""
+        self._build('artillery')
+
+    def build_helicopter(self):
+        """Builds a new helicopter piece in the current tile."""
+        self._build('helicopter')
+
+    def build_antitank(self):
+        """Builds a new anti-tank piece in the current tile."""
+        self._build('antitank')
+
+    def build_iron_dome(self):
+        """Builds a new iron dome piece in the current tile."""
+        self._build('irondome')
+
+    def build_bunker(self):
+        """Builds a new bunker piece in the current tile."""
+        self._build('bunker')
+
+    def build_spy(self):
+        """Builds a new spy piece in the current tile."""
+        self._build('spy')
+
+    def build_tower(self):
+        """Builds a new tower piece in the current tile."""
+        self._build('tower')
+
+    def build_satellite(self):
+        """Builds a new satellite piece in the current tile."""
+        self._build('satellite')
+
+    def build_builder(self):
+        """Builds a new builder piece in the current tile."""
+        self._build('builder')
+
+    def _build(self, piece_type):
+        self._context._commands.append(commands.BuildPieceCommand(self.id, piece_type))
+
+
+TYPE_TO_CLASS = {
+    'tank': Tank,
+    'airplane': Airplane,
+    'artillery': Artillery,
+    'helicopter': Helicopter,
+    'antitank': Antitank,
+    'irondome': IronDome,
+    'bunker': Bunker,
+    'spy': Spy,
+    'tower': Tower,
+    'satellite': Satellite,
+    'builder': Builder,
+}
+
+
+PIECE_TYPES = tuple(TYPE_TO_CLASS)
+"""All piece types, in the order used by the per-type arrays of Board."""
+
+PIECE_TYPE_INDEX = {piece_type: index for index, piece_type in enumerate(PIECE_TYPES)}
+"""Maps a piece type to its index in PIECE_TYPES."""
+
+
+def _load_piece(context, tile, piece_dict):
+    return TYPE_TO_CLASS[piece_dict['type']](context, tile, piece_dict)
+
+
+class Tile(object):
+    """A land unit in the game.
+
+    This class exports the following fields:
+    * coordinates: The coordinates of this tile.
+    * money: The amount of money in this tile before the turn started, or None if
+             this amount is unknown to the current country.
+    * country: The name of the country owning this tile, or None if this tile is
+               not owned by any country.
+    * pieces: A list of pieces on this tile.
+    Note that the information here may be incomplete, depending on the visibility
+    of the current country on this tile.
+    """
+
+    __slots__ = ('coordinates', 'money', 'country', 'pieces')
+
+    def __init__(self, context, tile_dict):
+        super(Tile, self).__init__()
+        self.coordinates = Coordinates(**tile_dict['coordinate'])
+        self._update(context, tile_dict)
+
+    def _update(self, context, tile_dict):
+        """Updates the fields of this tile from a newer tile dict."""
+        self.money = tile_dict['money']
+        self.country = tile_dict['country']
+        self.pieces = [context._piece_from_dict(self, piece_dict) for piece_dict in tile_dict['pieces']]
+
+
+NO_OWNER = -1
+"""Value of Board.owner for tiles that are not owned by any country."""
+
+UNKNOWN_MONEY = -1
+"""Value of Board.money for tiles whose amount of money is unknown."""
+
+
+class Board(object):
+    """A columnar view of the game board, built once per turn.
+
+    All arrays are indexed by [y, x]. This class exports the following fields:
+    * owner: A (height, width) array of the index of the country owning each
+             tile in TurnContext.all_countries, or NO_OWNER if the tile is not
+             owned by any country.
+    * money: A (height, width) array of the amount of money in each tile, or
+             UNKNOWN_MONEY if this amount is unknown to the current country.
+    * piece_count: A (height, width) array of the amount of pieces on each tile.
+    * piece_type_count: A (height, width, len(PIECE_TYPES)) array of the amount
+                        of pieces of each type on each tile. The last axis is
+                        indexed by PIECE_TYPE_INDEX.
+    * country_index: Maps a country name to its index in the owner array. If the
+                     countries change between turns, TurnContext.advance
+                     rebuilds the board.
+    * version: Incremented whenever the board changes, for caching values
+               computed from it.
+    Tiles missing from the turn data are treated as not owned, with an unknown
+    amount of money and no pieces.
+    """
+
+    def __init__(self, turn_data):
+        super(Board, self).__init__()
+        self.width = turn_data['width']
+        self.height = turn_data['height']
+        self.country_index = {country: index for index, country in enumerate(turn_data['all_countries'])}
+        shape = (self.height, self.width)
+        self.owner = np.full(shape, NO_OWNER, dtype=np.int16)
+        self.money = np.full(shape, UNKNOWN_MONEY, dtype=np.int32)
+        self.piece_count = np.zeros(shape, dtype=np.int32)
+        self.piece_type_count = np.zeros(shape + (len(PIECE_TYPES),), dtype=np.int32)
+        self.version = 0
+        self._fill(turn_data['tiles'])
+
+    def _fill(self, tile_dicts):
+        xs, ys, owners, moneys, counts = [], [], [], [], []
+        piece_xs, piece_ys, piece_types = [], [], []
+        for tile_dict in tile_dicts:
+            x = tile_dict['coordinate']['x']
+            y = tile_dict['coordinate']['y']
+            country = tile_dict['country']
+            money = tile_dict['money']
+            pieces = tile_dict['pieces']
+            xs.append(x)
+            ys.append(y)
+            owners.append(NO_OWNER if country is None else self.country_index[country])
+            moneys.append(UNKNOWN_MONEY if money is None else money)
+            counts.append(len(pieces))
+            for piece_dict in pieces:
+                piece_xs.append(x)
+                piece_ys.append(y)
+                piece_types.append(PIECE_TYPE_INDEX[piece_dict['type']])
+        self.owner[ys, xs] = owners
+        self.money[ys, xs] = moneys
+        self.piece_count[ys, xs] = counts
+        np.add.at(self.piece_type_count, (piece_ys, piece_xs, piece_types), 1)
+
+    def _update(self, positions, tile_dicts):
+        """Refreshes the given (x, y) positions from the given tile dicts.
+
+        tile_dicts maps (x, y) to tile dicts. Positions missing from it are reset
+        to a tile that is not owned, with an unknown amount of money and no pieces.
+        """
+        if not positions:
+            return
+        self.version += 1
+        xs, ys = zip(*positions)
+        self.owner[ys, xs] = NO_OWNER
+        self.money[ys, xs] = UNKNOWN_MONEY
+        self.piece_count[ys, xs] = 0
+        self.piece_type_count[ys, xs] = 0
+        self._fill([tile_dicts[position] for position in positions if position in tile_dicts])
+
+    def country_mask(self, country_name):
+        """Returns a boolean (height, width) mask of the tiles of the given country.
+
+        If country_name is None, the mask is of tiles that do not belong to any
+        country.
+        """
+        if country_name is None:
+            return self.owner == NO_OWNER
+        return self.owner == self.country_index[country_name]
+
+
+class _LazyMapping(Mapping):
+    """A read-only mapping whose values are built on first access.
+
+    keys is any container of the mapping keys, and loader is called with a key
+    in order to build its value. Built values are kept, so each value is built at
+    most once. values may contain already built values.
+    """
+
+    def __init__(self, keys, loader, values=None):
+        super(_LazyMapping, self).__init__()
+        self._keys = keys
+        self._loader = loader
+        self._values = {} if values is None else values
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        if key not in self._keys:
+            raise KeyError(key)
+        value = self._values[key] = self._loader(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def _is_flight_command(command):
+    return isinstance(command, (commands.TakeOffCommand, commands.LandCommand))
+
+
+class CommandBuffer(object):
+    """An ordered buffer of the commands given during a turn, indexed by piece ID.
+
+    When coalescing is enabled, superseded commands are dropped as new commands
+    are added: only the last move of each piece is kept, and of consecutive take
+    off and land commands of the same piece, only the last one is kept. If it
+    leaves the piece as it was before the command it replaces (e.g. an airplane on
+    the ground that takes off and lands), it is dropped as well. This requires knowing whether the piece was in the air at the
+    start of the turn, otherwise the last command is always kept.
+
+    This class exports the following fields:
+    * coalesce: Whether superseded commands are dropped.
+    * dropped_count: The amount of commands dropped so far.
+    """
+
+    def __init__(self, coalesce=False):
+        super(CommandBuffer, self).__init__()
+        self.coalesce = coalesce
+        self.dropped_count = 0
+        # All the commands in the order they were given, with None for dropped ones.
+        self._commands = []
+        # Maps piece IDs to the indexes of their commands that were not dropped.
+        self._piece_commands = {}
+        self._size = 0
+
+    def append(self, command, in_air=None):
+        """Adds a command to the buffer.
+
+        in_air is whether the piece of a take off or land command was in the air at
+        the start of the turn, or None if it is unknown.
+        """
+        piece_commands = self._piece_commands.setdefault(command.piece_id, [])
+        if self.coalesce and piece_commands:
+            if isinstance(command, commands.MoveCommand):
+                for index in [index for index in piece_commands
+                              if isinstance(self._commands[index], commands.MoveCommand)]:
+                    self._drop(piece_commands, index)
+            elif _is_flight_command(command) and _is_flight_command(self._commands[piece_commands[-1]]):
+                self._drop(piece_commands, piece_commands[-1])
+                if self._flight_state(piece_commands, in_air) == isinstance(command, commands.TakeOffCommand):
+                    # The command leaves the piece as it was before the dropped one.
+                    self.dropped_count += 1
+                    return
+        piece_commands.append(len(self._commands))
+        self._commands.append(command)
+        self._size += 1
+
+    def _flight_state(self, piece_commands, in_air):
+        """Returns whether a piece is in the air after the given commands, or None if it is unknown."""
+        for index in piece_commands:
+            if _is_flight_command(self._commands[index]):
+                in_air = isinstance(self._commands[index], commands.TakeOffCommand)
+        return in_air
+
+    def _drop(self, piece_commands, index):
+        piece_commands.remove(index)
+        self._commands[index] = None
+        self._size -= 1
+        self.dropped_count += 1
+
+    def get_commands_of_piece(self, piece_id):
+        """Returns the list of commands given to the given piece, in order."""
+        return [self._commands[index] for index in self._piece_commands.get(piece_id, ())]
+
+    def __iter__(self):
+        return (command for command in self._commands if command is not None)
+
+    def __len__(self):
+        return self._size
+
+
+TurnDelta = namedtuple('TurnDelta', ['changed_tiles', 'added_pieces', 'removed_pieces', 'changed_pieces'])
+TurnDelta.__doc__ = """The difference between two consecutive turns, as returned by TurnContext.advance.
+
+* changed_tiles: A frozenset of the Coordinates of tiles whose owner, money or
+                 pieces have changed.
+* added_pieces: A frozenset of IDs of pieces that were not known in the
+                previous turn.
+* removed_pieces: A frozenset of IDs of pieces that are no longer known.
+* changed_pieces: A frozenset of IDs of pieces known in both turns, that have
+                  moved or whose fields have changed.
+"""
+
+
+class TurnContext(object):
+    """Contains all the context of this turn.
+
+    Tile and piece objects are built lazily, on their first access, from the raw
+    turn data. A context may be advanced to the next turn using advance(), which
+    keeps the identity of the tiles and pieces that were already built.
+
+    Some useful fields:
+    * tiles: Maps coordinates (int, int) to a Tile object.
+    * my_pieces: Maps piece IDs to the actual piece, for pieces owned by our
+                 country.
+    * all_pieces: Same as my_pieces, but for all pieces known by this country.
+    * my_pieces_by_type: Maps a piece type to a mapping of piece IDs to pieces,
+                         for pieces of that type owned by our country.
+    * pieces_by_country: Maps a country name to a mapping of piece IDs to
+                         pieces, for known pieces owned by that country.
+    * pieces_by_country_and_type: Maps (country name, piece type) to a mapping of
+                                  piece IDs to pieces, for known pieces owned by
+                                  that country and of that type.
+    All the piece mappings are read-only views, and must not be modified.
+    * game_width: The width of the game.
+    * game_height: The height of the game.
+    * my_country: The name of my country.
+    * all_countries: The names of all countries in the game.
+    * board: A columnar view of the game board (see Board), for vectorized
+             queries over all tiles.
+    * piece_index: A spatial index of all the known pieces (see
+                   spatial_index.PieceIndex), for distance queries.
+    * command_buffer: The CommandBuffer of the commands given in this turn. If
+                      coalesce_commands is True, superseded commands are dropped
+                      from it (see CommandBuffer).
+    * last_delta: The TurnDelta of the last call to advance(), or None if this
+                  context has never been advanced.
+    * advance_count: The amount of calls to advance(), which identifies the turn
+                     of this context.
+    * override_count: The amount of calls to set_tile_country() in this turn.
+    If a recorder (see recording.Recorder) is given, the turn data of every turn
+    and the result of get_result() are recorded into it.
+    """
+
+    def __init__(self, turn_data, logger, coalesce_commands=False, recorder=None):
+        super(TurnContext, self).__init__()
+        self._logger = logger
+        self._coalesce_commands = coalesce_commands
+        self._recorder = recorder
+        self._board = None
+        # Maps an owner index (see Board.owner) to the set of Coordinates of its
+        # tiles, and to the set of Coordinates of its frontier tiles. Both are
+        # built on demand and kept up to date when ownership changes.
+        self._country_tiles = {}
+        self._frontiers = None
+        # Maps piece IDs to the piece objects built so far, across turns.
+        self._piece_objects = {}
+        self.last_delta = None
+        self.advance_count = 0
+        metrics.start_turn()
+        with metrics.timer('context'):
+            self._load_turn(turn_data, {})
+
+    def _load_turn(self, turn_data, built_tiles):
+        if self._recorder is not None:
+            self._recorder.record_turn(turn_data)
+        self._turn_data = turn_data
+        self._commands = CommandBuffer(self._coalesce_commands)
+        self._piece_index = None
+        # Positions whose ownership was changed by set_tile_country.
+        self._overridden_positions = set()
+        self.override_count = 0
+        self.game_width = turn_data['width']
+        self.game_height = turn_data['height']
+        self.my_country = turn_data['country']
+        self.all_countries = turn_data['all_countries']
+
+        # Maps (x, y) to the raw tile dict, and piece IDs to their raw dict and to
+        # the (x, y) of their tile. The piece positions are also grouped by country
+        # and by (country, type).
+        self._tile_dicts = {}
+        self._piece_dicts = {}
+        self._piece_positions = {}
+        countries = set(self.all_countries) | {self.my_country}
+        country_positions = {country: {} for country in countries}
+        country_and_type_positions = {(country, piece_type): {}
+                                      for country in countries for piece_type in PIECE_TYPES}
+        for tile_dict in turn_data['tiles']:
+            position = (tile_dict['coordinate']['x'], tile_dict['coordinate']['y'])
+            self._tile_dicts[position] = tile_dict
+            for piece_dict in tile_dict['pieces']:
+                piece_id = piece_dict['id']
+                country = piece_dict['country']
+                self._piece_dicts[piece_id] = piece_dict
+                self._piece_positions[piece_id] = position
+                country_positions.setdefault(country, {})[piece_id] = position
+                country_and_type_positions.setdefault((country, piece_dict['type']), {})[piece_id] = position
+
+        self._country_positions = country_positions
+        self._country_and_type_positions = country_and_type_positions
+        self.tiles = _LazyMapping(self._tile_dicts, self._load_tile, built_tiles)
+        self.all_pieces = _LazyMapping(self._piece_positions, self._load_piece)
+        self.pieces_by_country = MappingProxyType(
+            {country: _LazyMapping(positions, self._load_piece) for country, positions in country_positions.items()})
+        self.pieces_by_country_and_type = MappingProxyType(
+            {key: _LazyMapping(positions, self._load_piece) for key, positions in country_and_type_positions.items()})
+        self.my_pieces = self.pieces_by_country[self.my_country]
+        self.my_pieces_by_type = MappingProxyType(
+            {piece_type: self.pieces_by_country_and_type[(self.my_country, piece_type)]
+             for piece_type in PIECE_TYPES})
+        metrics.count('tiles', len(self._tile_dicts))
+        metrics.count('pieces', len(self._piece_dicts))
+
+    def advance(self, turn_data):
+        """Advances this context to the next turn, given its turn data.
+
+        Tiles and pieces that have already been built are updated in place, so
+        pieces that exist in both turns keep their identity. Commands given in the
+        previous turn are discarded.
+
+        Returns a TurnDelta describing what has changed since the previous turn.
+        """
+        metrics.start_turn()
+        self.advance_count += 1
+        with metrics.timer('context'):
+            return self._advance(turn_data)
+
+    def _advance(self, turn_data):
+        old_tile_dicts = self._tile_dicts
+        old_piece_dicts = self._piece_dicts
+        old_piece_positions = self._piece_positions
+        overridden_positions = self._overridden_positions
+        built_tiles = self.tiles._values
+        self._load_turn(turn_data, built_tiles)
+
+        changed_tiles = {position for position, tile_dict in self._tile_dicts.items()
+                         if old_tile_dicts.get(position) != tile_dict}
+        changed_tiles.update(position for position in old_tile_dicts if position not in self._tile_dicts)
+        changed_tiles.update(overridden_positions)
+        added_pieces = self._piece_dicts.keys() - old_piece_dicts.keys()
+        removed_pieces = old_piece_dicts.keys() - self._piece_dicts.keys()
+        changed_pieces = {piece_id for piece_id, piece_dict in self._piece_dicts.items()
+                          if piece_id in old_piece_dicts and
+                          (old_piece_dicts[piece_id] != piece_dict or
+                           old_piece_positions[piece_id] != self._piece_positions[piece_id])}
+
+        for piece_id in removed_pieces:
+            self._piece_objects.pop(piece_id, None)
+        for position in changed_tiles:
+            if position not in self._tile_dicts:
+                built_tiles.pop(position, None)
+            elif position in built_tiles:
+                built_tiles[position]._update(self, self._tile_dicts[position])
+        # Built pieces which moved into a tile that was not built yet.
+        for piece_id in changed_pieces:
+            piece = self._piece_objects.get(piece_id)
+            position = self._piece_positions[piece_id]
+            if piece is not None and piece.tile.coordinates != position:
+                self.tiles[position]
+
+        if self._board is not None:
+            if ((self._board.width, self._board.height) != (self.game_width, self.game_height) or
+                    list(self._board.country_index) != list(self.all_countries)):
+                # The owner indexes of the board no longer match the countries, so
+                # the board is rebuilt, with a newer version.
+                version = self._board.version
+                self._board = Board(turn_data)
+                self._board.version = version + 1
+                self._country_tiles = {}
+                self._frontiers = None
+            else:
+                for position in changed_tiles:
+                    tile_dict = self._tile_dicts.get(position)
+                    country = None if tile_dict is None else tile_dict['country']
+                    self._set_owner(position, self._owner_index(country))
+                self._board._update(list(changed_tiles), self._tile_dicts)
+
+        self.last_delta = TurnDelta(frozenset(Coordinates(*position) for position in changed_tiles),
+                                    frozenset(added_pieces), frozenset(removed_pieces),
+                                    frozenset(changed_pieces))
+        return self.last_delta
+
+    @property
+    def board(self):
+        if self._board is None:
+            self._board = Board(self._turn_data)
+        return self._board
+
+    @property
+    def command_buffer(self):
+        return self._commands
+
+    @property
+    def piece_index(self):
+        if self._piece_index is None:
+            self._piece_index = spatial_index.build_piece_index(self._piece_dicts, self._piece_positions)
+        return self._piece_index
+
+    def get_pieces_within_distance(self, coordinates, radius, piece_type=None, country=None):
+        """Returns a list of pieces whose distance from coordinates is at most radius.
+
+        The pieces may optionally be filtered by piece_type and country.
+        """
+        return [self.all_pieces[piece_id]
+                for piece_id in self.piece_index.within_radius(coordinates, radius, piece_type, country)]
+
+    def get_closest_pieces(self, coordinates, k=None, piece_type=None, country=None):
+        """Returns a list of the k pieces closest to coordinates, sorted by distance.
+
+        If k is None, all the matching pieces are returned. The pieces may
+        optionally be filtered by piece_type and country.
+        """
+        return [self.all_pieces[piece_id]
+                for piece_id in self.piece_index.nearest(coordinates, k, piece_type, country)]
+
+    def get_pieces_in_rectangle(self, min_corner, max_corner, piece_type=None, country=None):
+        """Returns a list of pieces inside the rectangle between the two given corners.
+
+        Both corners are Coordinates, and are inclusive. The pieces may optionally
+        be filtered by piece_type and country.
+        """
+        return [self.all_pieces[piece_id]
+                for piece_id in self.piece_index.in_rectangle(min_corner, max_corner, piece_type, country)]
+
+    def get_piece_positions(self, country, piece_type=None):
+        """Returns a read-only mapping of piece IDs to the (x, y) of their tiles.
+
+        The mapping contains the pieces of the given country, optionally filtered by
+        piece_type. Unlike pieces_by_country, no piece objects are built.
+        """
+        if piece_type is None:
+            positions = self._country_positions.get(country, {})
+        else:
+            positions = self._country_and_type_positions.get((country, piece_type), {})
+        return MappingProxyType(positions)
+
+    def _load_tile(self, position):
+        return Tile(self, self._tile_dicts[position])
+
+    def _load_piece(self, piece_id):
+        self.tiles[self._piece_positions[piece_id]]
+        return self._piece_objects[piece_id]
+
+    def _piece_from_dict(self, tile, piece_dict):
+        """Returns the piece object of the given piece dict, located in tile.
+
+        A piece object that was built in a previous turn is updated and reused.
+        """
+        piece = self._piece_objects.get(piece_dict['id'])
+        if piece is None or piece.type != piece_dict['type']:
+            piece = self._piece_objects[piece_dict['id']] = _load_piece(self, tile, piece_dict)
+        else:
+            piece._update(tile, piece_dict)
+        return piece
+
+    def _owner_index(self, country_name):
+        return NO_OWNER if country_name is None else self.board.country_index[country_name]
+
+    def get_tiles_of_country(self, country_name):
+        """Returns the set of tile coordinates owned by the given country name.
+
+        If country_name is None, the returned coordinates are of tiles that do not
+        belong to any country.
+
+        The returned set is maintained by this context, and must not be modified.
+        """
+        owner = self._owner_index(country_name)
+        tiles = self._country_tiles.get(owner)
+        if tiles is None:
+            ys, xs = np.nonzero(self.board.owner == owner)
+            tiles = self._country_tiles[owner] = {Coordinates(int(x), int(y)) for x, y in zip(xs, ys)}
+        return tiles
+
+    def get_frontier_of_country(self, country_name):
+        """Returns the set of frontier tile coordinates of the given country name.
+
+        A frontier tile is a tile owned by the country, with at least one adjacent
+        tile (up, down, left or right) that is not owned by it. The edges of the
+        board are not considered frontier by themselves.
+        If country_name is None, the returned coordinates are of tiles that do not
+        belong to any country.
+
+        The returned set is maintained by this context, and must not be modified.
+        """
+        if self._frontiers is None:
+            self._build_frontiers()
+        return self._frontiers.setdefault(self._owner_index(country_name), set())
+
+    def _build_frontiers(self):
+        owner = self.board.owner
+        differs = np.zeros(owner.shape, dtype=bool)
+        horizontal = owner[:, 1:] != owner[:, :-1]
+        vertical = owner[1:, :] != owner[:-1, :]
+        differs[:, 1:] |= horizontal
+        differs[:, :-1] |= horizontal
+        differs[1:, :] |= vertical
+        differs[:-1, :] |= vertical
+        self._frontiers = {}
+        ys, xs = np.nonzero(differs)
+        for x, y, tile_owner in zip(xs.tolist(), ys.tolist(), owner[ys, xs].tolist()):
+            self._frontiers.setdefault(tile_owner, set()).add(Coordinates(x, y))
+
+    def _is_frontier(self, x, y):
+        owner = self.board.owner
+        tile_owner = owner[y, x]
+        return ((x > 0 and owner[y, x - 1] != tile_owner) or
+                (x < self.game_width - 1 and owner[y, x + 1] != tile_owner) or
+                (y > 0 and owner[y - 1, x] != tile_owner) or
+                (y < self.game_height - 1 and owner[y + 1, x] != tile_owner))
+
+    def _set_owner(self, position, new_owner):
+        """Sets the owner index of the given (x, y), keeping the indexes up to date."""
+        x, y = position
+        owner = self.board.owner
+        old_owner = int(owner[y, x])
+        if old_owner == new_owner:
+            return
+        owner[y, x] = new_owner
+        self.board.version += 1
+        coordinates = Coordinates(x, y)
+        if old_owner in self._country_tiles:
+            self._country_tiles[old_owner].discard(coordinates)
+        if new_owner in self._country_tiles:
+            self._country_tiles[new_owner].add(coordinates)
+        if self._frontiers is None:
+            return
+        self._frontiers.get(old_owner, set()).discard(coordinates)
+        for neighbor_x, neighbor_y in ((x, y), (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if not (0 <= neighbor_x < self.game_width and 0 <= neighbor_y < self.game_height):
+                continue
+            frontier = self._frontiers.setdefault(int(owner[neighbor_y, neighbor_x]), set())
+            if self._is_frontier(neighbor_x, neighbor_y):
+                frontier.add(Coordinates(neighbor_x, neighbor_y))
+            else:
+                frontier.discard(Coordinates(neighbor_x, neighbor_y))
+
+    def set_tile_country(self, coordinates, country_name):
+        """Sets the owner of the tile in the given coordinates for the rest of this turn.
+
+        This is useful for taking into account an expected change of ownership
+        (e.g. a tile that is about to be conquered). The tile object, the board and
+        the country indexes are all updated.
+        """
+        position = (coordinates.x, coordinates.y)
+        self._set_owner(position, self._owner_index(country_name))
+        tile = self.tiles._values.get(position)
+        if tile is not None:
+            tile.country = country_name
+        self._overridden_positions.add(position)
+        self.override_count += 1
+
+    def get_sighings_of_piece(self, piece_id):
+        """Returns the sightings of the given piece.
+
+        This method returns a set of sighted pieces and their locations, as seen by
+        the given piece.
+
+        Note that the given piece MUST belong to my country in order for this
+        method to work.
+        """
+        piece = self.my_pieces[piece_id]
+        if isinstance(piece, Tower):
+            sighting_distance = constants.TOWER_SIGHTING_RANGE
+        elif isinstance(piece, Satellite):
+            sighting_distance = constants.SATELLITE_SIGHTING_RANGE
+        else:
+            sighting_distance = 1
+        return set(self.get_pieces_within_distance(piece.tile.coordinates, sighting_distance))
+
+    def get_commands_of_piece(self, piece_id):
+        """Returns the list of ordered commands given to the given piece.
+
+        Note that if the piece did not receive any command in this turn, or is not
+        owned by my country, or does not exist, an empty list is returned.
+        """
+        return self._commands.get_commands_of_piece(piece_id)
+
+    def log(self, log_entry):
+        """Logs the given log entry to the main log of this country.
+
+        log_entry is expected to be a string, without a trailing new line character.
+        """
+        self._logger.log(log_entry)
+
+    def get_result(self):
+        with metrics.timer('get_result'):
+            result = [command.to_dict() for command in self._commands]
+        metrics.count('commands', len(result))
+        if self._recorder is not None:
+            self._recorder.record_commands(result)
+        metrics.end_turn()
+        return result
+
+
+class _LogConnection(object):
+    """A keep-alive HTTP connection to the log server.
+
+    The connection is reused across posts, and re-opened if the server drops it.
+    """
+
+    def __init__(self, parsed_url):
+        super(_LogConnection, self).__init__()
+        self._parsed_url = parsed_url
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def post(self, body):
+        with self._lock:
+            self._post(body)
+
+    def _post(self, body):
+        # A kept-alive connection may have been dropped by the server since it was
+        # last used, in which case a new one is opened. The post is only retried
+        # (once, on a new connection) if sending the request failed: once it was
+        # sent, the server may have logged it even if reading the response fails,
+        # and retrying could log it twice.
+        if self._connection is not None and self._is_dropped():
+            self._close()
+        reused = self._connection is not None
+        if not reused:
+            self._connection = http.client.HTTPConnection(
+                self._parsed_url.hostname, self._parsed_url.port, timeout=Logger.TIMEOUT)
+        try:
+            self._connection.request('POST', self._parsed_url.path or '/', body, Logger.REQUEST_HEADERS)
+        except (http.client.HTTPException, OSError):
+            self._close()
+            if not reused:
+                raise
+            return self._post(body)
+        try:
+            response = self._connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            self._close()
+            raise
+        if response.will_close:
+            self._close()
+
+    def _is_dropped(self):
+        """Returns True iff the server closed the connection (it sends nothing between responses)."""
+        sock = self._connection.sock
+        return sock is None or bool(select.select([sock], [], [], 0)[0])
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class _LogShipper(object):
+    """Ships queued log entries to a _LogConnection from a background thread.
+
+    Entries are sent in batches of up to batch_size entries (see Logger for the
+    format), and an entry waits at most flush_interval seconds before its batch
+    is sent.
+    """
+
+    def __init__(self, connection, batch_size, flush_interval, max_queue_size, overflow):
+        super(_LogShipper, self).__init__()
+        if overflow not in (Logger.DROP_OLDEST, Logger.DROP_NEWEST, Logger.BLOCK):
+            raise ValueError('Unknown overflow policy: %r' % (overflow,))
+        self._connection = connection
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_queue_size = max_queue_size
+        self._overflow = overflow
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._sending = False
+        self._closing = False
+        self.shipped_count = 0
+        self.dropped_count = 0
+        self._thread = threading.Thread(target=self._run, name='log-shipper', daemon=True)
+        self._thread.start()
+
+    def put(self, log_entry):
+        """Queues a log entry. Entries put after close() are dropped."""
+        with self._condition:
+            if len(self._queue) >= self._max_queue_size and not self._closing:
+                if self._overflow == Logger.DROP_NEWEST:
+                    self.dropped_count += 1
+                    return
+                elif self._overflow == Logger.DROP_OLDEST:
+                    self._queue.popleft()
+                    self.dropped_count += 1
+                else:
+                    while len(self._queue) >= self._max_queue_size and not self._closing:
+                        self._condition.wait()
+            if self._closing:
+                # The background thread is gone (or going), so nothing would ship it.
+                self.dropped_count += 1
+                return
+            self._queue.append(log_entry)
+            self._condition.notify_all()
+
+    def flush(self):
+        """Waits until all the queued entries have been shipped (or dropped)."""
+        with self._condition:
+            self._condition.notify_all()
+            while (self._queue or self._sending) and self._thread.is_alive():
+                self._condition.wait()
+
+    def close(self):
+        """Ships the remaining entries and stops the background thread."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _next_batch(self):
+        with self._condition:
+            deadline = None
+            while len(self._queue) < self._batch_size and not self._closing:
+                if not self._queue:
+                    deadline = None
+                    self._condition.wait()
+                    continue
+                if deadline is None:
+                    deadline = time.monotonic() + self._flush_interval
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))]
+            self._sending = bool(batch)
+            # Wake up producers blocked on a full queue.
+            self._condition.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                self._connection.post(json.dumps([{'data': log_entry} for log_entry in batch]))
+                shipped = True
+            except (http.client.HTTPException, OSError):
+                shipped = False
+            with self._condition:
+                if shipped:
+                    self.shipped_count += len(batch)
+                else:
+                    self.dropped_count += len(batch)
+                self._sending = False
+                self._condition.notify_all()
+
+
+class Logger(object):
+    """Utility for logging stuff.
+
+    Log entries are sent over a single keep-alive HTTP connection, which is
+    reused across calls and re-opened if the server drops it.
+
+    If background is True, log() only queues the entry and returns immediately.
+    A background thread ships the queued entries in batches. A batch is posted
+    as a JSON list of the objects that would have been posted for each of its
+    entries, so the server keeps them as separate entries. When the queue is
+    full, the overflow policy decides whether the oldest entry is dropped
+    (DROP_OLDEST), the new entry is dropped (DROP_NEWEST), or log() blocks until
+    there is room (BLOCK). Entries of batches that fail to be sent are dropped
+    as well.
+
+    The logger is closed by close(), when leaving a with statement, or at
+    interpreter exit. Closing ships the queued entries, and closes the
+    connection.
+
+    This class exports the following fields:
+    * shipped_count: The amount of log entries sent so far.
+    * dropped_count: The amount of log entries dropped so far.
+    """
+
+    TIMEOUT = 10
+    REQUEST_HEADERS = {
+        'Content-type': 'application/json'
+    }
+
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    BLOCK = 'block'
+
+    DEFAULT_BATCH_SIZE = 100
+    DEFAULT_FLUSH_INTERVAL = 0.05
+    DEFAULT_MAX_QUEUE_SIZE = 10000
+
+    def __init__(self, url, background=False, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_queue_size=DEFAULT_MAX_QUEUE_SIZE, overflow=DROP_OLDEST):
+        self._parsed_url = urlparse(url) if url is not None else None
+        self._connection = None
+        self._shipper = None
+        self._shipped_count = 0
+        if self._parsed_url is None:
+            return
+        self._connection = _LogConnection(self._parsed_url)
+        if background:
+            self._shipper = _LogShipper(self._connection, batch_size, flush_interval, max_queue_size, overflow)
+        self._finalizer = weakref.finalize(self, Logger._close, self._connection, self._shipper)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def shipped_count(self):
+        return self._shipper.shipped_count if self._shipper is not None else self._shipped_count
+
+    @property
+    def dropped_count(self):
+        return self._shipper.dropped_count if self._shipper is not None else 0
+
+    def log(self, log_entry):
+        """Logs the provided log entry.
+
+        log_entry is expected to be a string, without a trailing new line character.
+        """
+        if self._parsed_url is None:
+            return
+        metrics.count('log_lines')
+        with metrics.timer('log'):
+            if self._shipper is not None:
+                self._shipper.put(log_entry)
+                return
+            self._connection.post(json.dumps({'data': log_entry}))
+            self._shipped_count += 1
+
+    def flush(self):
+        """Waits until all the queued log entries have been shipped (or dropped)."""
+        if self._shipper is not None:
+            self._shipper.flush()
+
+    def close(self):
+        """Ships the queued log entries, and closes the connection to the log server.
+
+        A logger which is not in background mode may still be used afterwards, in
+        which case a new connection is opened, and is closed by the next call to
+        close(). Entries logged by a background logger after it was closed are
+        dropped.
+        """
+        if self._parsed_url is None:
+            return
+        if self._finalizer.alive:
+            self._finalizer()
+        else:
+            # The finalizer runs only once, so a connection re-opened since is
+            # closed directly.
+            self._connection.close()
+
+    @staticmethod
+    def _close(connection, shipper):
+        if shipper is not None:
+            shipper.close()
+        connection.close()
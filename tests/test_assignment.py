@@ -0,0 +1,72 @@
+import itertools
+import random
+
+import numpy as np
+
+import assignment
+from common_types import Coordinates, distance
+
+
+def _brute_force_cost(costs):
+    n, m = costs.shape
+    if n > m:
+        return _brute_force_cost(costs.T)
+    return min(sum(costs[row, column] for row, column in enumerate(columns))
+               for columns in itertools.permutations(range(m), n))
+
+
+def _random_coordinates(rng, count, size=20):
+    return [Coordinates(rng.randrange(size), rng.randrange(size)) for _ in range(count)]
+
+
+def _total_cost(pairs, sources, targets, target_costs):
+    return sum(distance(sources[source], targets[target]) + target_costs[target]
+               for source, target in pairs)
+
+
+def test_solve_assignment_is_optimal():
+    rng = np.random.RandomState(0)
+    for _ in range(100):
+        costs = rng.randint(0, 20, size=(rng.randint(1, 6), rng.randint(1, 6)))
+        pairs = assignment.solve_assignment(costs)
+        rows, columns = zip(*pairs)
+        assert len(pairs) == min(costs.shape)
+        assert len(set(rows)) == len(rows) and len(set(columns)) == len(columns)
+        assert sum(costs[row, column] for row, column in pairs) == _brute_force_cost(costs)
+
+
+def test_assign_targets_is_optimal():
+    rng = random.Random(0)
+    for _ in range(50):
+        sources = _random_coordinates(rng, rng.randint(1, 5))
+        targets = _random_coordinates(rng, rng.randint(1, 6))
+        target_costs = [rng.randint(0, 5) for _ in targets]
+        pairs = assignment.assign_targets(sources, targets, target_costs)
+        costs = np.array([[distance(source, target) + target_cost
+                           for target, target_cost in zip(targets, target_costs)] for source in sources])
+        assert len(pairs) == min(len(sources), len(targets))
+        assert len({target for _, target in pairs}) == len(pairs)
+        assert _total_cost(pairs, sources, targets, target_costs) == _brute_force_cost(costs)
+
+
+def test_greedy_assignment_assigns_distinct_targets():
+    rng = random.Random(1)
+    sources = _random_coordinates(rng, 100)
+    targets = _random_coordinates(rng, 60)
+    pairs = assignment.assign_targets(sources, targets, max_exact_size=0)
+    assert len(pairs) == 60
+    assert len({source for source, _ in pairs}) == 60
+    assert len({target for _, target in pairs}) == 60
+
+
+def test_spatial_cheapest_targets_match_the_dense_ones():
+    rng = random.Random(2)
+    sources = np.array([(rng.randrange(50), rng.randrange(50)) for _ in range(30)], dtype=np.int64)
+    targets = np.array([(rng.randrange(50), rng.randrange(50)) for _ in range(200)], dtype=np.int64)
+    extra_costs = np.array([rng.choice([0, 3, 10]) for _ in range(200)], dtype=np.float64)
+    dense = assignment._cheapest_targets_dense(sources, targets, extra_costs, 8)
+    spatial = assignment._cheapest_targets_spatial(sources, targets, extra_costs, 8)
+    for source, dense_targets, spatial_targets in zip(sources, dense, spatial):
+        costs = np.abs(targets - source).sum(axis=1) + extra_costs
+        # Ties may pick different targets of the same cost.
+        assert sorted(costs[dense_targets]) == sorted(costs[spatial_targets])
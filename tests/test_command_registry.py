@@ -0,0 +1,61 @@
+import random
+
+from command_registry import CommandRegistry
+
+
+def _describe(status):
+    if status.is_success():
+        return 'success'
+    if status.is_failed():
+        return 'failed'
+    return ('in progress', status.elapsed_turns, status.estimated_turns)
+
+
+def test_registry_matches_an_unbounded_model():
+    """Runs random commands through the registry, and through a model that never evicts."""
+    rng = random.Random(0)
+    terminal_turns = 3
+    registry = CommandRegistry(terminal_turns)
+    # Maps each command ID to its [description, piece ID, target, finished turn].
+    model = {}
+    piece_ids = ['piece%d' % index for index in range(10)]
+    live_piece_ids = set(piece_ids)
+    for turn in range(1, 100):
+        registry.next_turn(live_piece_ids)
+        for command_id, entry in model.items():
+            if entry[3] is None and entry[1] not in live_piece_ids:
+                entry[0], entry[3] = 'failed', turn
+        live_piece_ids = {piece_id for piece_id in piece_ids if rng.random() < 0.95}
+        for _ in range(5):
+            piece_id = rng.choice(piece_ids)
+            command_id = registry.get_piece_command(piece_id)
+            action = rng.choice(['issue', 'progress', 'succeed', 'fail'])
+            if action == 'issue':
+                if command_id is not None:
+                    model[command_id][0], model[command_id][3] = 'failed', turn
+                estimated_turns = rng.randint(1, 10)
+                command_id = registry.issue('attack', piece_id, estimated_turns, target=turn)
+                model[command_id] = [('in progress', 0, estimated_turns), piece_id, turn, None]
+            elif command_id is not None and action == 'progress':
+                registry.progress(command_id)
+                _, elapsed_turns, estimated_turns = model[command_id][0]
+                model[command_id][0] = ('in progress', elapsed_turns + 1, estimated_turns - 1)
+            elif command_id is not None:
+                getattr(registry, action)(command_id)
+                model[command_id][0] = 'success' if action == 'succeed' else 'failed'
+                model[command_id][3] = turn
+
+        kept_count = 0
+        for command_id, (description, piece_id, target, finished_turn) in model.items():
+            evicted = finished_turn is not None and turn - finished_turn > terminal_turns
+            assert (command_id in registry) == (not evicted)
+            kept_count += not evicted
+            if command_id in registry:
+                assert _describe(registry.get_status(command_id)) == description
+                assert registry.get_target(command_id) == target
+            else:
+                assert registry.get_status(command_id) is None
+        assert registry.get_piece_commands() == {piece_id: command_id
+                                                 for command_id, (_, piece_id, _, finished_turn) in model.items()
+                                                 if finished_turn is None}
+        assert len(registry) == kept_count
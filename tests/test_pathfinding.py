@@ -0,0 +1,182 @@
+import heapq
+import random
+
+import numpy as np
+
+from common_types import Coordinates
+from pathfinding import IMPASSABLE, DistanceField, DistanceFieldService, PathFinder
+
+WIDTH = 12
+HEIGHT = 9
+
+
+def _random_costs(rng, blocked_fraction=0.2):
+    return [[None if rng.random() < blocked_fraction else rng.randint(1, 5) for _ in range(WIDTH)]
+            for _ in range(HEIGHT)]
+
+
+def _cost_function(costs):
+    return lambda x, y: costs[y][x]
+
+
+def _path_cost(path, goal, tile_cost):
+    return sum(tile_cost(x, y) or 1 if (x, y) == goal else tile_cost(x, y) for x, y in path)
+
+
+def _cheapest_cost(start, goal, tile_cost):
+    """Dijkstra over the whole board, as an oracle for A*."""
+    costs = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if node == goal:
+            return cost
+        if cost > costs[node]:
+            continue
+        for offset_x, offset_y in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            x, y = node[0] + offset_x, node[1] + offset_y
+            if not (0 <= x < WIDTH and 0 <= y < HEIGHT):
+                continue
+            step_cost = tile_cost(x, y) or 1 if (x, y) == goal else tile_cost(x, y)
+            if step_cost is not None and cost + step_cost < costs.get((x, y), cost + step_cost + 1):
+                costs[(x, y)] = cost + step_cost
+                heapq.heappush(heap, (cost + step_cost, (x, y)))
+    return None
+
+
+def _random_coordinates(rng):
+    return Coordinates(rng.randrange(WIDTH), rng.randrange(HEIGHT))
+
+
+def _walk(path_finder, start, goal, tile_cost, cost_version):
+    """Returns the tiles visited by following next_step from start, up to the goal."""
+    path = []
+    position = start
+    while True:
+        position = path_finder.next_step(position, goal, WIDTH, HEIGHT, tile_cost, cost_version)
+        if position is None:
+            return path
+        path.append(tuple(position))
+        assert len(path) <= WIDTH * HEIGHT
+
+
+def test_find_path_is_a_cheapest_path():
+    rng = random.Random(0)
+    path_finder = PathFinder()
+    for _ in range(200):
+        tile_cost = _cost_function(_random_costs(rng))
+        start, goal = _random_coordinates(rng), _random_coordinates(rng)
+        path = path_finder.find_path(start, goal, WIDTH, HEIGHT, tile_cost)
+        expected = _cheapest_cost(tuple(start), tuple(goal), tile_cost)
+        if expected is None:
+            assert path is None
+            continue
+        assert path[-1] == goal if path else start == goal
+        for previous, tile in zip([start] + path, path):
+            assert abs(previous.x - tile.x) + abs(previous.y - tile.y) == 1
+        assert _path_cost([tuple(tile) for tile in path], tuple(goal), tile_cost) == expected
+
+
+def test_cached_next_steps_follow_cheapest_paths():
+    rng = random.Random(1)
+    tile_cost = _cost_function(_random_costs(rng))
+    path_finder = PathFinder()
+    goal = _random_coordinates(rng)
+    for _ in range(30):
+        start = _random_coordinates(rng)
+        path = _walk(path_finder, start, goal, tile_cost, cost_version=0)
+        expected = _cheapest_cost(tuple(start), tuple(goal), tile_cost)
+        if expected is None or start == goal:
+            assert path == []
+        else:
+            assert path[-1] == tuple(goal)
+            assert _path_cost(path, tuple(goal), tile_cost) == expected
+    assert path_finder.cache_hits > 0
+
+
+def test_cached_path_is_kept_when_costs_change_elsewhere():
+    costs = [[1] * WIDTH for _ in range(HEIGHT)]
+    tile_cost = _cost_function(costs)
+    path_finder = PathFinder()
+    start, goal = Coordinates(0, 0), Coordinates(WIDTH - 1, 0)
+    path = _walk(path_finder, start, goal, tile_cost, cost_version=0)
+    searches = path_finder.searches
+
+    costs[HEIGHT - 1][0] = 5
+    assert _walk(path_finder, start, goal, tile_cost, cost_version=1) == path
+    assert path_finder.searches == searches
+
+
+def test_cached_path_is_searched_again_when_blocked():
+    costs = [[1] * WIDTH for _ in range(HEIGHT)]
+    tile_cost = _cost_function(costs)
+    path_finder = PathFinder()
+    start, goal = Coordinates(0, 0), Coordinates(WIDTH - 1, 0)
+    path = _walk(path_finder, start, goal, tile_cost, cost_version=0)
+
+    blocked_x, blocked_y = path[len(path) // 2]
+    costs[blocked_y][blocked_x] = None
+    new_path = _walk(path_finder, start, goal, tile_cost, cost_version=1)
+    assert (blocked_x, blocked_y) not in new_path
+    assert _path_cost(new_path, tuple(goal), tile_cost) == _cheapest_cost(tuple(start), tuple(goal), tile_cost)
+
+
+def test_cached_path_is_searched_again_when_much_more_expensive():
+    costs = [[1] * WIDTH for _ in range(HEIGHT)]
+    tile_cost = _cost_function(costs)
+    path_finder = PathFinder(replan_factor=2)
+    start, goal = Coordinates(0, 0), Coordinates(WIDTH - 1, 0)
+    path = _walk(path_finder, start, goal, tile_cost, cost_version=0)
+
+    for x, y in path[:-1]:
+        costs[y][x] = 3
+    new_path = _walk(path_finder, start, goal, tile_cost, cost_version=1)
+    assert _path_cost(new_path, tuple(goal), tile_cost) == _cheapest_cost(tuple(start), tuple(goal), tile_cost)
+
+
+def _random_field_arrays(rng):
+    costs = np.array([[IMPASSABLE if rng.random() < 0.2 else rng.randint(1, 5) for _ in range(WIDTH)]
+                      for _ in range(HEIGHT)], dtype=np.int32)
+    targets = np.array([[rng.random() < 0.03 for _ in range(WIDTH)] for _ in range(HEIGHT)])
+    return costs, targets
+
+
+def _assert_same_distances(field, expected):
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            coordinates = Coordinates(x, y)
+            assert field.distance(coordinates) == expected.distance(coordinates)
+            next_step = field.next_step(coordinates)
+            if next_step is not None:
+                enter_cost = max(field.costs[next_step.y, next_step.x], 1)
+                assert field.distance(coordinates) == enter_cost + field.distance(next_step)
+
+
+def test_distance_field_updates_match_a_recomputation():
+    rng = random.Random(2)
+    costs, targets = _random_field_arrays(rng)
+    field = DistanceField(costs, targets)
+    for _ in range(40):
+        costs, targets = costs.copy(), targets.copy()
+        for _ in range(rng.randint(1, 8)):
+            y, x = rng.randrange(HEIGHT), rng.randrange(WIDTH)
+            costs[y, x] = IMPASSABLE if rng.random() < 0.3 else rng.randint(1, 5)
+        if rng.random() < 0.5:
+            targets[rng.randrange(HEIGHT), rng.randrange(WIDTH)] ^= True
+        field.update(costs, targets)
+        _assert_same_distances(field, DistanceField(costs, targets))
+
+
+def test_distance_field_service_updates_cached_fields():
+    rng = random.Random(3)
+    service = DistanceFieldService()
+    costs, targets = _random_field_arrays(rng)
+    field = service.get('field', costs, targets)
+    costs = costs.copy()
+    costs[0, 0] = 3
+    assert service.get('field', costs, targets) is field
+    assert (service.full_computations, service.incremental_updates) == (1, 1)
+    _assert_same_distances(field, DistanceField(costs, targets))
+
+    service.retain(lambda name: name != 'field')
+    assert service.get('field', costs, targets) is not field
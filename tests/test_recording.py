@@ -0,0 +1,56 @@
+import copy
+import random
+
+from benchmarks.synthetic import make_turns
+from recording import Recorder, Replay
+
+
+def _record(path, turns, keyframe_interval):
+    with Recorder(str(path), keyframe_interval) as recorder:
+        for turn, turn_data in enumerate(turns):
+            recorder.record_turn(turn_data)
+            recorder.record_commands([{'type': 'move', 'pieceId': str(turn)}])
+
+
+def test_replay_returns_the_recorded_turns_in_any_order(tmp_path):
+    turns = make_turns(20, 12, 8, pieces=40)
+    path = tmp_path / 'game.rec'
+    _record(path, copy.deepcopy(turns), keyframe_interval=4)
+
+    order = list(range(len(turns)))
+    random.Random(1).shuffle(order)
+    with Replay(str(path)) as replay:
+        assert len(replay) == len(turns)
+        for turn in order + list(range(len(turns))):
+            assert replay.get_turn_data(turn) == turns[turn]
+            assert replay.get_commands(turn) == [{'type': 'move', 'pieceId': str(turn)}]
+
+
+def test_replay_keeps_integer_piece_ids_and_all_turn_data_fields(tmp_path):
+    turns = make_turns(3, 12, 8, pieces=40)
+    for turn_data in turns:
+        turn_data['_private'] = 'kept'
+        for tile_dict in turn_data['tiles']:
+            for piece_dict in tile_dict['pieces']:
+                piece_dict['id'] = int(piece_dict['id'])
+    path = tmp_path / 'game.rec'
+    _record(path, copy.deepcopy(turns), keyframe_interval=2)
+
+    with Replay(str(path)) as replay:
+        for turn, turn_data in enumerate(turns):
+            assert replay.get_turn_data(turn) == turn_data
+        assert set(replay.get_context(2).all_pieces) == set(range(40))
+
+
+def test_replay_without_an_index_scans_the_blocks(tmp_path):
+    turns = make_turns(5, 12, 8, pieces=40)
+    path = tmp_path / 'game.rec'
+    recorder = Recorder(str(path), keyframe_interval=2)
+    for turn_data in copy.deepcopy(turns):
+        recorder.record_turn(turn_data)
+    # The last turn is written only by close(), as are the index.
+    recorder._file.close()
+
+    with Replay(str(path)) as replay:
+        assert len(replay) == len(turns) - 1
+        assert replay.get_turn_data(3) == turns[3]
@@ -0,0 +1,53 @@
+from benchmarks.synthetic import make_turn_data
+from common_types import Coordinates, distance
+import simple_tactical
+from strategy_state import StrategyState
+from tactical_api import Logger, TurnContext
+
+
+def _make_strategic(turn_data):
+    context = TurnContext(turn_data, Logger(None))
+    return context, simple_tactical.MyStrategicApi(context, StrategyState())
+
+
+def test_tile_danger_follows_tile_country_overrides():
+    context, strategic = _make_strategic(make_turn_data(6, 4, pieces=0, unclaimed_fraction=1.0))
+    coordinates = Coordinates(0, 0)
+    assert strategic.estimate_tile_danger(coordinates) == 1
+
+    context.set_tile_country(coordinates, context.my_country)
+
+    assert strategic.estimate_tile_danger(coordinates) == 0
+    assert strategic.estimate_board_danger()[0, 0] == 0
+
+
+def test_memos_are_dropped_when_the_context_advances():
+    turn_data = make_turn_data(6, 4, pieces=0, unclaimed_fraction=1.0)
+    context, strategic = _make_strategic(turn_data)
+    coordinates = Coordinates(0, 0)
+    assert strategic.estimate_tile_danger(coordinates) == 1
+
+    turn_data = make_turn_data(6, 4, pieces=0, unclaimed_fraction=1.0)
+    turn_data['tiles'][0]['country'] = context.my_country
+    context.advance(turn_data)
+
+    assert strategic.estimate_tile_danger(coordinates) == 0
+
+
+def test_tanks_attacking_the_same_target_share_a_distance_field():
+    turn_data = make_turn_data(12, 8, countries=1, pieces=6, piece_mix={'tank': 1})
+    context, strategic = _make_strategic(turn_data)
+    target = Coordinates(11, 7)
+    tanks = [piece for piece in strategic.report_attacking_pieces() if piece.id != '0']
+    distances = {}
+    for piece in tanks:
+        strategic.attack(piece, target, 1)
+        distances[piece.id] = distance(context.my_pieces[piece.id].tile.coordinates, target)
+
+    strategic.next_turn()
+
+    assert strategic.state.distance_fields.full_computations == 1
+    moves = {command['pieceId']: Coordinates(**command['destination']) for command in context.get_result()}
+    for piece in tanks:
+        if distances[piece.id] > 0:
+            assert distance(moves[piece.id], target) == distances[piece.id] - 1
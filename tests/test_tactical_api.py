@@ -0,0 +1,175 @@
+import copy
+import http.client
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from benchmarks.synthetic import make_turn_data, make_turns
+import commands
+from common_types import Coordinates
+from tactical_api import CommandBuffer, Logger, TurnContext, _LogConnection
+
+
+def _coalesce(command_types, in_air):
+    buffer = CommandBuffer(coalesce=True)
+    for command_type in command_types:
+        buffer.append(command_type('piece'), in_air)
+    return [type(command) for command in buffer], buffer.dropped_count
+
+
+def test_take_off_and_land_cancel_out_only_if_the_first_changes_the_piece():
+    take_off, land = commands.TakeOffCommand, commands.LandCommand
+    assert _coalesce([take_off, land], in_air=False) == ([], 2)
+    assert _coalesce([land, take_off], in_air=True) == ([], 2)
+    assert _coalesce([take_off, land], in_air=True) == ([land], 1)
+    assert _coalesce([land, take_off], in_air=False) == ([take_off], 1)
+
+
+def test_the_last_flight_command_is_kept_if_the_piece_state_is_unknown():
+    take_off, land = commands.TakeOffCommand, commands.LandCommand
+    assert _coalesce([take_off, land], in_air=None) == ([land], 1)
+
+
+def test_advance_rebuilds_the_board_when_the_countries_change():
+    turn_data = make_turn_data(9, 4, countries=3, pieces=0, unclaimed_fraction=0)
+    context = TurnContext(turn_data, Logger(None))
+    assert context.get_tiles_of_country('country2')
+    version = context.board.version
+
+    # country1 is eliminated, and its tiles are taken by country2.
+    turn_data = copy.deepcopy(turn_data)
+    turn_data['all_countries'] = ['country0', 'country2']
+    for tile_dict in turn_data['tiles']:
+        if tile_dict['country'] == 'country1':
+            tile_dict['country'] = 'country2'
+    context.advance(turn_data)
+
+    fresh = TurnContext(turn_data, Logger(None))
+    assert (context.board.owner == fresh.board.owner).all()
+    assert (context.board.country_mask('country2') == fresh.board.country_mask('country2')).all()
+    assert context.get_tiles_of_country('country2') == fresh.get_tiles_of_country('country2')
+    assert context.board.version > version
+
+
+def _describe_tiles(context):
+    return {tuple(coordinates): (tile.country, tile.money, sorted(piece.id for piece in tile.pieces))
+            for coordinates, tile in context.tiles.items()}
+
+
+def _describe_pieces(context):
+    return {piece_id: (piece.type, piece.country, tuple(piece.tile.coordinates))
+            for piece_id, piece in context.all_pieces.items()}
+
+
+def _assert_same_context(context, fresh):
+    for name in ('owner', 'money', 'piece_count', 'piece_type_count'):
+        assert (getattr(context.board, name) == getattr(fresh.board, name)).all(), name
+    for country in fresh.all_countries + [None]:
+        assert context.get_tiles_of_country(country) == fresh.get_tiles_of_country(country)
+        assert context.get_frontier_of_country(country) == fresh.get_frontier_of_country(country)
+    assert _describe_tiles(context) == _describe_tiles(fresh)
+    assert _describe_pieces(context) == _describe_pieces(fresh)
+    assert ({key: set(pieces) for key, pieces in context.pieces_by_country_and_type.items() if pieces} ==
+            {key: set(pieces) for key, pieces in fresh.pieces_by_country_and_type.items() if pieces})
+    for x, y in ((0, 0), (5, 3), (11, 7)):
+        coordinates = Coordinates(x, y)
+        assert ({piece.id for piece in context.get_pieces_within_distance(coordinates, 3)} ==
+                {piece.id for piece in fresh.get_pieces_within_distance(coordinates, 3)})
+
+
+def test_advance_matches_a_fresh_context():
+    turns = make_turns(15, 12, 8, pieces=60)
+    context = TurnContext(turns[0], Logger(None))
+    for turn_data in turns[1:]:
+        # Builds the lazy indexes and objects, so they are updated incrementally.
+        context.get_frontier_of_country(context.my_country)
+        context.get_tiles_of_country(None)
+        list(context.all_pieces.values())
+        context.advance(turn_data)
+        _assert_same_context(context, TurnContext(turn_data, Logger(None)))
+
+
+def test_advance_keeps_the_identity_of_built_pieces():
+    turns = make_turns(2, 12, 8, pieces=60)
+    context = TurnContext(turns[0], Logger(None))
+    pieces = dict(context.all_pieces)
+    context.advance(turns[1])
+    for piece_id, piece in context.all_pieces.items():
+        assert piece is pieces[piece_id]
+
+
+def test_advance_forgets_tile_country_overrides():
+    turns = make_turns(2, 12, 8, pieces=0, changed_tiles=0)
+    context = TurnContext(turns[0], Logger(None))
+    coordinates = Coordinates(0, 0)
+    context.set_tile_country(coordinates, 'country2')
+    context.advance(turns[1])
+    _assert_same_context(context, TurnContext(turns[1], Logger(None)))
+
+
+def _serve_log_posts(respond):
+    """Starts a log server on a local socket, which stores the body of each post.
+
+    respond(body) returns whether to respond to a post, and whether to keep its
+    connection open afterwards. Returns the server URL and the list of bodies.
+    """
+    bodies = []
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+
+    def serve():
+        while True:
+            connection = server.accept()[0]
+            with connection, connection.makefile('rb') as stream:
+                while stream.readline():
+                    headers = iter(stream.readline, b'\r\n')
+                    length = next(int(header.split(b':')[1]) for header in headers
+                                  if header.lower().startswith(b'content-length:'))
+                    for _ in headers:
+                        pass
+                    bodies.append(stream.read(length))
+                    send_response, keep_open = respond(bodies[-1])
+                    if send_response:
+                        connection.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n')
+                    if not keep_open:
+                        break
+                connection.shutdown(socket.SHUT_RDWR)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return urlparse('http://127.0.0.1:%d/' % server.getsockname()[1]), bodies
+
+
+def test_log_posts_reopen_connections_dropped_by_the_server():
+    url, bodies = _serve_log_posts(lambda body: (True, False))
+    connection = _LogConnection(url)
+    connection.post(b'first')
+    # Lets the server close the connection, as it would an idle kept-alive one.
+    time.sleep(0.1)
+    connection.post(b'second')
+    connection.close()
+    assert bodies == [b'first', b'second']
+
+
+def test_log_posts_are_not_retried_after_the_request_was_sent():
+    url, bodies = _serve_log_posts(lambda body: (body != b'second',) * 2)
+    connection = _LogConnection(url)
+    connection.post(b'first')
+    with pytest.raises(http.client.RemoteDisconnected):
+        connection.post(b'second')
+    connection.close()
+    assert bodies == [b'first', b'second']
+
+
+def test_batched_log_entries_keep_their_boundaries():
+    url, bodies = _serve_log_posts(lambda body: (True, True))
+    entries = ['first', 'second\nwith a new line', '']
+    with Logger(url.geturl(), background=True, batch_size=len(entries), flush_interval=1) as logger:
+        for entry in entries:
+            logger.log(entry)
+        logger.flush()
+    assert [json.loads(body) for body in bodies] == [[{'data': entry} for entry in entries]]
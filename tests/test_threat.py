@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+
+from common_types import Coordinates
+import threat
+
+WIDTH = 15
+HEIGHT = 10
+
+
+def _naive_threat(pieces):
+    """Sums the threat of every piece over every tile, as an oracle."""
+    result = np.zeros((HEIGHT, WIDTH), dtype=np.int32)
+    for piece_x, piece_y, piece_type in pieces.values():
+        if piece_type not in threat.DEFAULT_PIECE_THREATS:
+            continue
+        weight, threat_range = threat.DEFAULT_PIECE_THREATS[piece_type]
+        for y in range(HEIGHT):
+            for x in range(WIDTH):
+                distance = abs(x - piece_x) + abs(y - piece_y)
+                if distance <= threat_range:
+                    result[y, x] += weight * (threat_range + 1 - distance)
+    return result
+
+
+def _random_piece(rng):
+    return (rng.randrange(WIDTH), rng.randrange(HEIGHT),
+            rng.choice(list(threat.DEFAULT_PIECE_THREATS) + ['builder']))
+
+
+def test_full_computation_matches_the_naive_threat():
+    rng = random.Random(0)
+    pieces = {str(piece_id): _random_piece(rng) for piece_id in range(30)}
+    threat_map = threat.ThreatMap()
+    threat_map.update(WIDTH, HEIGHT, pieces)
+    assert threat_map.full_computations == 1
+    assert (threat_map.threat == _naive_threat(pieces)).all()
+
+
+def test_incremental_updates_match_the_naive_threat():
+    rng = random.Random(1)
+    pieces = {str(piece_id): _random_piece(rng) for piece_id in range(30)}
+    threat_map = threat.ThreatMap(max_incremental_fraction=1)
+    threat_map.update(WIDTH, HEIGHT, pieces)
+    next_id = len(pieces)
+    for _ in range(30):
+        pieces = dict(pieces)
+        for piece_id in rng.sample(sorted(pieces), 3):
+            x, y, piece_type = pieces[piece_id]
+            pieces[piece_id] = (min(max(x + rng.randint(-1, 1), 0), WIDTH - 1),
+                                min(max(y + rng.randint(-1, 1), 0), HEIGHT - 1), piece_type)
+        del pieces[rng.choice(sorted(pieces))]
+        pieces[str(next_id)] = _random_piece(rng)
+        next_id += 1
+        threat_map.update(WIDTH, HEIGHT, pieces)
+        assert (threat_map.threat == _naive_threat(pieces)).all()
+    assert threat_map.full_computations == 1
+
+
+def test_overrides_expire():
+    threat_map = threat.ThreatMap(override_turns=2)
+    threat_map.update(WIDTH, HEIGHT, {})
+    threat_map.set_override(Coordinates(1, 2), 7)
+    threat_map.update(WIDTH, HEIGHT, {})
+    threat_map.update(WIDTH, HEIGHT, {})
+    assert threat_map.overrides == {(1, 2): 7}
+    threat_map.update(WIDTH, HEIGHT, {})
+    assert threat_map.overrides == {}
@@ -0,0 +1,62 @@
+import copy
+
+from benchmarks.synthetic import make_turn_data, make_turns
+from common_types import Coordinates
+import simple_strategic
+import simple_tactical
+import simulator
+from strategy_state import StrategyState
+from tactical_api import NO_OWNER, Logger, TurnContext
+import world_model
+
+
+def _assert_same_model(model, expected):
+    for name in ('owner', 'money', 'piece_count', 'last_seen'):
+        assert (getattr(model, name) == getattr(expected, name)).all(), name
+    assert model.get_pieces() == expected.get_pieces()
+    assert (model.get_stale_mask(3) == expected.get_stale_mask(3)).all()
+
+
+def _check_incremental_updates(turns):
+    incremental = world_model.WorldModel(max_piece_age=3)
+    full = world_model.WorldModel(max_piece_age=3)
+    context = TurnContext(turns[0], Logger(None))
+    for turn, turn_data in enumerate(turns):
+        if turn:
+            context.advance(turn_data)
+        incremental.update(context, turn)
+        full.update(TurnContext(turn_data, Logger(None)), turn)
+        _assert_same_model(incremental, full)
+
+
+def test_incremental_updates_match_full_merges_on_synthetic_turns():
+    _check_incremental_updates(make_turns(20, 12, 8, pieces=60))
+
+
+def test_incremental_updates_match_full_merges_in_a_game():
+    game = simulator.Simulator(20, 15, ['a', 'b'], seed=3)
+    states = {country: StrategyState() for country in game.countries}
+    turns = []
+    for _ in range(40):
+        turns.append(copy.deepcopy(game.get_turn_data('a')))
+        for country in game.countries:
+            context = TurnContext(game.get_turn_data(country), Logger(None))
+            simple_strategic.do_turn(simple_tactical.get_strategic_implementation(context, states[country]))
+            game.set_commands(country, context.get_result())
+        game.step()
+    _check_incremental_updates(turns)
+
+
+def test_a_tile_out_of_sight_may_lose_its_owner():
+    turn_data = make_turn_data(6, 4, pieces=0, unclaimed_fraction=0, money_fraction=0)
+    context = TurnContext(turn_data, Logger(None))
+    model = world_model.WorldModel()
+    model.update(context, 0)
+    assert model.owner[0, 0] != NO_OWNER
+
+    turn_data = copy.deepcopy(turn_data)
+    turn_data['tiles'][0]['country'] = None
+    context.advance(turn_data)
+    model.update(context, 1)
+    assert model.owner[0, 0] == NO_OWNER
+    assert model.get_age(Coordinates(0, 0)) is None
@@ -0,0 +1,158 @@
+import numpy as np
+
+DEFAULT_PIECE_THREATS = {
+    'tank': (3, 1),
+    'artillery': (3, 3),
+    'helicopter': (2, 2),
+    'airplane': (2, 3),
+    'antitank': (1, 1),
+    'bunker': (1, 1),
+}
+"""Maps a piece type to the (weight, range) of the threat posed by a piece of it.
+
+Pieces of types missing from this dict pose no threat.
+"""
+
+DEFAULT_MAX_INCREMENTAL_FRACTION = 0.25
+"""The default fraction of changed pieces above which a ThreatMap is recomputed."""
+
+DEFAULT_OVERRIDE_TURNS = 5
+"""The default amount of updates for which a danger override is kept."""
+
+
+def _threat_kernel(weight, threat_range):
+    """Returns the (2 * range + 1) square stamp of a single piece's threat."""
+    offsets = np.abs(np.arange(-threat_range, threat_range + 1))
+    distances = offsets[:, None] + offsets[None, :]
+    return np.maximum(threat_range + 1 - distances, 0).astype(np.int32) * weight
+
+
+class ThreatMap(object):
+    """The threat posed by known enemy pieces, over the whole board.
+
+    A piece of weight w and range r adds w * (r + 1 - d) to every tile at L1
+    distance d <= r from it. The map is computed as a convolution of the amount
+    of pieces of each type with its threat stamp, and is then updated
+    incrementally: only pieces that appeared, disappeared or moved since the
+    previous update are stamped in or out. Since all the threats are integers,
+    updating is exact.
+
+    The map also keeps danger overrides (e.g. intelligence from the strategic
+    level), which replace the whole estimated danger of a tile, for a limited
+    amount of updates.
+
+    This class exports the following fields:
+    * threat: A (height, width) int32 array, indexed by [y, x], of the threat of
+              each tile. None before the first update.
+    * version: Incremented whenever the threat or the overrides change.
+    * full_computations: The amount of times the map was computed from scratch.
+    * incremental_updates: The amount of incremental updates so far.
+    """
+
+    def __init__(self, piece_threats=None, max_incremental_fraction=DEFAULT_MAX_INCREMENTAL_FRACTION,
+                 override_turns=DEFAULT_OVERRIDE_TURNS):
+        super(ThreatMap, self).__init__()
+        if piece_threats is None:
+            piece_threats = DEFAULT_PIECE_THREATS
+        self._kernels = {piece_type: _threat_kernel(weight, threat_range)
+                         for piece_type, (weight, threat_range) in piece_threats.items()
+                         if weight and threat_range >= 0}
+        self._max_incremental_fraction = max_incremental_fraction
+        self._override_turns = override_turns
+        # Maps the IDs of the known threatening pieces to their (x, y, type).
+        self._pieces = {}
+        # Maps (x, y) to the (danger, update number) of overridden tiles.
+        self._overrides = {}
+        self._updates = 0
+        self.threat = None
+        self.version = 0
+        self.full_computations = 0
+        self.incremental_updates = 0
+
+    @property
+    def piece_types(self):
+        """The piece types that pose a threat."""
+        return self._kernels.keys()
+
+    def update(self, width, height, pieces):
+        """Updates the map to the currently known enemy pieces.
+
+        pieces maps the ID of each known enemy piece to its (x, y, piece_type).
+        Pieces of types that pose no threat are ignored.
+        """
+        self._updates += 1
+        overrides = {position: override for position, override in self._overrides.items()
+                     if self._updates - override[1] <= self._override_turns}
+        if len(overrides) != len(self._overrides):
+            self._overrides = overrides
+            self.version += 1
+        pieces = {piece_id: piece for piece_id, piece in pieces.items() if piece[2] in self._kernels}
+        if self.threat is None or self.threat.shape != (height, width):
+            self._compute(width, height, pieces)
+            return
+
+        removed = [piece for piece_id, piece in self._pieces.items() if pieces.get(piece_id) != piece]
+        added = [piece for piece_id, piece in pieces.items() if self._pieces.get(piece_id) != piece]
+        if not (removed or added):
+            return
+        if len(removed) + len(added) > self._max_incremental_fraction * max(len(pieces), 1):
+            self._compute(width, height, pieces)
+            return
+        for x, y, piece_type in removed:
+            self._stamp(x, y, piece_type, -1)
+        for x, y, piece_type in added:
+            self._stamp(x, y, piece_type, 1)
+        self._pieces = pieces
+        self.version += 1
+        self.incremental_updates += 1
+
+    @property
+    def overrides(self):
+        """A dict mapping the (x, y) of overridden tiles to their danger."""
+        return {position: danger for position, (danger, _) in self._overrides.items()}
+
+    def set_override(self, coordinates, danger):
+        """Overrides the danger of the tile in coordinates, for the next override_turns updates."""
+        self._overrides[(coordinates.x, coordinates.y)] = (danger, self._updates)
+        self.version += 1
+
+    def _compute(self, width, height, pieces):
+        self.threat = np.zeros((height, width), dtype=np.int32)
+        positions = {piece_type: ([], []) for piece_type in self._kernels}
+        for x, y, piece_type in pieces.values():
+            positions[piece_type][0].append(y)
+            positions[piece_type][1].append(x)
+        for piece_type, (ys, xs) in positions.items():
+            if not ys:
+                continue
+            counts = np.zeros((height, width), dtype=np.int32)
+            np.add.at(counts, (ys, xs), 1)
+            self._convolve(counts, self._kernels[piece_type])
+        self._pieces = pieces
+        self.version += 1
+        self.full_computations += 1
+
+    def _convolve(self, counts, kernel):
+        """Adds the convolution of counts with kernel to the threat array."""
+        height, width = counts.shape
+        threat_range = kernel.shape[0] // 2
+        for offset_y, offset_x in zip(*np.nonzero(kernel)):
+            dy = int(offset_y) - threat_range
+            dx = int(offset_x) - threat_range
+            if abs(dy) >= height or abs(dx) >= width:
+                continue
+            self.threat[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] += (
+                kernel[offset_y, offset_x] * counts[max(-dy, 0):height - max(dy, 0),
+                                                    max(-dx, 0):width - max(dx, 0)])
+
+    def _stamp(self, x, y, piece_type, sign):
+        """Adds (or removes, if sign is -1) the threat of a single piece."""
+        kernel = self._kernels[piece_type]
+        threat_range = kernel.shape[0] // 2
+        height, width = self.threat.shape
+        top = max(y - threat_range, 0)
+        left = max(x - threat_range, 0)
+        bottom = min(y + threat_range + 1, height)
+        right = min(x + threat_range + 1, width)
+        self.threat[top:bottom, left:right] += sign * kernel[top - y + threat_range:bottom - y + threat_range,
+                                                             left - x + threat_range:right - x + threat_range]
@@ -0,0 +1,208 @@
+"""A persistent model of the game board, merged from the partial views of all turns."""
+import weakref
+
+import numpy as np
+
+import tactical_api
+
+NEVER_SEEN = -1
+"""Value of WorldModel.last_seen for tiles that were never seen."""
+
+DEFAULT_MAX_PIECE_AGE = 10
+"""The default amount of turns for which pieces out of sight are remembered."""
+
+
+class WorldModel(object):
+    """The last known state of every tile, across turns.
+
+    A TurnContext only holds what is visible in its turn. The world model keeps
+    the last known owner, money and pieces of every tile, and the turn it was
+    last seen in, so tiles out of sight keep their last known state instead of
+    being unknown. A tile counts as seen in a turn if its amount of money or any
+    of its pieces are known. Tiles that are not seen only update their owner, if
+    the turn data reports one, or reports that a tile lost its owner.
+
+    When the context was advanced (see TurnContext.advance) from the turn of the
+    previous update, only the tiles and pieces of its last_delta are merged.
+    Otherwise the whole board is merged.
+
+    All arrays are indexed by [y, x]. This class exports the following fields:
+    * owner: A (height, width) array of the last known owner of each tile, as in
+             tactical_api.Board.owner.
+    * money: A (height, width) array of the last known amount of money in each
+             tile, or tactical_api.UNKNOWN_MONEY if it was never known.
+    * piece_count: A (height, width) array of the amount of pieces on each tile,
+                   when it was last seen.
+    * last_seen: A (height, width) array of the turn each tile was last seen in,
+                 or NEVER_SEEN. It is built on every access.
+    * turn: The turn of the last update.
+    * version: Incremented whenever the model is updated, for caching values
+               computed from it.
+    Pieces out of sight are remembered in their last known position for
+    max_piece_age turns, or until their tile is seen without them.
+    """
+
+    def __init__(self, max_piece_age=DEFAULT_MAX_PIECE_AGE):
+        super(WorldModel, self).__init__()
+        self._max_piece_age = max_piece_age
+        self.owner = None
+        self.money = None
+        self.piece_count = None
+        self.turn = None
+        self.version = 0
+        # The turn each tile was last seen in, for tiles out of sight, and a mask of
+        # the tiles seen in the last update.
+        self._last_seen = None
+        self._seen = None
+        # The owner of each tile, as reported by the turn data of the last update.
+        self._reported_owner = None
+        self._countries = None
+        # Maps the ID of each known piece to its (x, y, type, country, last seen
+        # turn). The turn is only kept up to date for the pieces out of sight,
+        # whose IDs are in _hidden_piece_ids.
+        self._pieces = {}
+        self._hidden_piece_ids = set()
+        # A weak reference to the context of the last update, and its advance_count.
+        self._context = None
+        self._advance_count = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_context'] = None
+        return state
+
+    @property
+    def last_seen(self):
+        if self._last_seen is None:
+            return None
+        return np.where(self._seen, self.turn, self._last_seen)
+
+    def update(self, context, turn):
+        """Merges the view of the given TurnContext, of the given turn, into the model."""
+        board = context.board
+        shape = (board.height, board.width)
+        if self.owner is None or self.owner.shape != shape:
+            self.owner = np.full(shape, tactical_api.NO_OWNER, dtype=np.int16)
+            self.money = np.full(shape, tactical_api.UNKNOWN_MONEY, dtype=np.int32)
+            self.piece_count = np.zeros(shape, dtype=np.int32)
+            self._last_seen = np.full(shape, NEVER_SEEN, dtype=np.int32)
+            self._seen = np.zeros(shape, dtype=bool)
+            self._reported_owner = np.full(shape, tactical_api.NO_OWNER, dtype=np.int16)
+            self._countries = list(context.all_countries)
+            self._pieces = {}
+            self._hidden_piece_ids = set()
+            self._context = None
+        elif self._countries != list(context.all_countries):
+            self._renumber_countries(context.all_countries)
+            self._context = None
+        incremental = (self._context is not None and self._context() is context and
+                       context.advance_count == self._advance_count + 1 and context.last_delta is not None)
+        previous_turn = self.turn
+        self.turn = turn
+        self.version += 1
+        if incremental:
+            self._merge_delta(context, previous_turn)
+        else:
+            self._merge_all(context, previous_turn)
+        self._context = weakref.ref(context)
+        self._advance_count = context.advance_count
+
+        seen = self._seen
+        oldest_turn = turn - self._max_piece_age
+        pieces = self._pieces
+        for piece_id in list(self._hidden_piece_ids):
+            x, y, _, _, piece_turn = pieces[piece_id]
+            if seen[y, x] or piece_turn < oldest_turn:
+                del pieces[piece_id]
+                self._hidden_piece_ids.discard(piece_id)
+
+    def _renumber_countries(self, countries):
+        """Maps the owners to the indexes of the given countries, when they change between turns."""
+        new_index = {country: index for index, country in enumerate(countries)}
+        # Maps each old owner index (shifted by one, for NO_OWNER) to its new one.
+        table = np.array([tactical_api.NO_OWNER] +
+                         [new_index.get(country, tactical_api.NO_OWNER) for country in self._countries],
+                         dtype=np.int16)
+        self.owner = table[self.owner + 1]
+        self._reported_owner = table[self._reported_owner + 1]
+        self._countries = list(countries)
+
+    def _merge_all(self, context, previous_turn):
+        board = context.board
+        seen = (board.money != tactical_api.UNKNOWN_MONEY) | (board.piece_count > 0)
+        if previous_turn is not None:
+            self._last_seen[self._seen & ~seen] = previous_turn
+        owner_reported = seen | (board.owner != tactical_api.NO_OWNER) | (board.owner != self._reported_owner)
+        np.copyto(self.owner, board.owner, where=owner_reported)
+        np.copyto(self.money, board.money, where=seen)
+        np.copyto(self.piece_count, board.piece_count, where=seen)
+        self._seen = seen
+        self._reported_owner = board.owner.copy()
+
+        turn = self.turn
+        pieces = self._pieces
+        seen_piece_ids = set()
+        for country in context.all_countries:
+            for piece_type in tactical_api.PIECE_TYPES:
+                for piece_id, (x, y) in context.get_piece_positions(country, piece_type).items():
+                    pieces[piece_id] = (x, y, piece_type, country, turn)
+                    seen_piece_ids.add(piece_id)
+        self._hide_pieces(pieces.keys() - seen_piece_ids, previous_turn)
+        self._hidden_piece_ids -= seen_piece_ids
+
+    def _merge_delta(self, context, previous_turn):
+        delta = context.last_delta
+        board = context.board
+        positions = [(coordinates.x, coordinates.y) for coordinates in delta.changed_tiles]
+        if positions:
+            xs, ys = zip(*positions)
+            seen = (board.money[ys, xs] != tactical_api.UNKNOWN_MONEY) | (board.piece_count[ys, xs] > 0)
+            was_seen = self._seen[ys, xs]
+            self._last_seen[ys, xs] = np.where(was_seen & ~seen, previous_turn, self._last_seen[ys, xs])
+            self._seen[ys, xs] = seen
+            # Tiles whose owner the turn data reported, or reported to have changed.
+            owner = board.owner[ys, xs]
+            owner_reported = seen | (owner != tactical_api.NO_OWNER) | (owner != self._reported_owner[ys, xs])
+            self.owner[ys, xs] = np.where(owner_reported, owner, self.owner[ys, xs])
+            self.money[ys, xs] = np.where(seen, board.money[ys, xs], self.money[ys, xs])
+            self.piece_count[ys, xs] = np.where(seen, board.piece_count[ys, xs], self.piece_count[ys, xs])
+            self._reported_owner[ys, xs] = owner
+
+        turn = self.turn
+        pieces = self._pieces
+        for piece_id in delta.added_pieces | delta.changed_pieces:
+            piece = context.all_pieces[piece_id]
+            coordinates = piece.tile.coordinates
+            pieces[piece_id] = (coordinates.x, coordinates.y, piece.type, piece.country, turn)
+            self._hidden_piece_ids.discard(piece_id)
+        self._hide_pieces(delta.removed_pieces & pieces.keys(), previous_turn)
+
+    def _hide_pieces(self, piece_ids, previous_turn):
+        """Marks the given pieces, which were seen in previous_turn, as out of sight."""
+        pieces = self._pieces
+        for piece_id in piece_ids:
+            if piece_id not in self._hidden_piece_ids:
+                x, y, piece_type, country, _ = pieces[piece_id]
+                pieces[piece_id] = (x, y, piece_type, country, previous_turn)
+                self._hidden_piece_ids.add(piece_id)
+
+    def get_age(self, coordinates):
+        """Returns the amount of turns since the given tile was seen, or None if it was never seen."""
+        if self._seen[coordinates.y, coordinates.x]:
+            return 0
+        last_seen = int(self._last_seen[coordinates.y, coordinates.x])
+        return None if last_seen == NEVER_SEEN else self.turn - last_seen
+
+    def get_stale_mask(self, max_age):
+        """Returns a boolean (height, width) mask of tiles not seen in the last max_age turns."""
+        return ~self._seen & ((self._last_seen == NEVER_SEEN) | (self._last_seen < self.turn - max_age))
+
+    def get_pieces(self, countries=None):
+        """Returns a dict mapping the IDs of the known pieces to their (x, y, type).
+
+        If countries is given, only pieces of these countries are returned.
+        Pieces out of sight are in their last known position.
+        """
+        return {piece_id: (x, y, piece_type)
+                for piece_id, (x, y, piece_type, country, _) in self._pieces.items()
+                if countries is None or country in countries}